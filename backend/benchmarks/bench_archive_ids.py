@@ -0,0 +1,94 @@
+"""
+Checkout setelah seluruh isi tabel hot diarsipkan: membuktikan ID transaksi
+dan item baru tidak pernah memakai ulang ID yang sudah diarsip.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_archive_ids.py
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'archive_ids.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Product, Transaction, TransactionItem
+from utils.partitions import archive_closed_months, hot_cutoff, partition_entities
+
+TRANSACTIONS = 50
+CHECKOUTS = 5
+
+
+def archived_rows(db, month):
+    tx_table, item_table, _, _ = partition_entities(month)
+    connection = db.connection()
+    return (
+        connection.execute(tx_table.select().order_by(tx_table.c.id)).all(),
+        connection.execute(item_table.select().order_by(item_table.c.id)).all()
+    )
+
+
+def main():
+    with TestClient(app) as client:
+        token = client.post(
+            "/api/auth/login", json={"username": "kasir", "password": "kasir123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        # One full closed month of sales, then nothing left in the hot tables
+        db = SessionLocal()
+        product = Product(name="Bench Arsip", price=10000, stock=1000, category="Snack")
+        db.add(product)
+        db.commit()
+        product_id = product.id
+        moment = hot_cutoff() - timedelta(days=40)
+        month = moment.strftime("%Y-%m")
+        for n in range(TRANSACTIONS):
+            db.add(Transaction(
+                subtotal=10000, total=10000, paid=10000, change=0, created_at=moment + timedelta(minutes=n),
+                items=[TransactionItem(product_id=product_id, product_name="Bench Arsip", quantity=1, price_at_sale=10000)]
+            ))
+        db.commit()
+        archived = archive_closed_months(db)
+        assert [a["month"] for a in archived] == [month], archived
+        assert db.query(Transaction.id).first() is None
+        before = archived_rows(db, month)
+        max_tx = max(row.id for row in before[0])
+        max_item = max(row.id for row in before[1])
+        db.close()
+
+        new_ids = []
+        for _ in range(CHECKOUTS):
+            response = client.post("/api/transactions", headers=headers, json={
+                "items": [{"product_id": product_id, "quantity": 2}],
+                "paid": 20000
+            })
+            assert response.status_code == 200, response.text
+            new_ids.append(response.json()["id"])
+
+        db = SessionLocal()
+        new_items = [item_id for (item_id,) in db.query(TransactionItem.id)]
+        after = archived_rows(db, month)
+        db.close()
+
+        print(f"archived {TRANSACTIONS} transactions (ids up to {max_tx}), new checkouts got ids {new_ids}")
+        assert min(new_ids) > max_tx, new_ids
+        assert min(new_items) > max_item, new_items
+        assert after == before, "archived rows changed"
+
+        # Archived and new transactions resolve to their own rows
+        first = client.get(f"/api/transactions/{before[0][0].id}", headers=headers).json()
+        assert first["total"] == 10000 and first["items"][0]["quantity"] == 1, first
+        listed = client.get("/api/transactions", headers=headers, params={"limit": 100}).json()
+        assert len({t["id"] for t in listed}) == len(listed), "duplicate ids in transaction list"
+        print("OK: archived ids are never reused")
+
+
+if __name__ == "__main__":
+    main()
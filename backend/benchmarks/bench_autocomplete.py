@@ -0,0 +1,134 @@
+"""
+Benchmark indeks autocomplete: p99 saran pencarian pada 100.000 SKU.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_autocomplete.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'autocomplete.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Product, Transaction, TransactionItem
+from utils.autocomplete import autocomplete_index
+from utils.catalog import catalog_cache
+
+SKUS = 100_000
+QUERIES = 5_000
+TARGET_P99_MS = 2.0
+
+WORDS = [
+    "indomie", "goreng", "kuah", "soto", "ayam", "bawang", "teh", "botol", "kotak", "susu",
+    "coklat", "vanila", "kopi", "kapal", "api", "gula", "pasir", "minyak", "sabun", "cair",
+    "mandi", "sampo", "pasta", "gigi", "roti", "tawar", "keju", "biskuit", "kacang", "garuda",
+    "air", "mineral", "sirup", "jeruk", "mangga", "beras", "pandan", "wangi", "tepung", "terigu",
+]
+SIZES = ["250ml", "500ml", "1l", "75g", "100g", "1kg", "5kg", "isi", "mini", "jumbo"]
+CATEGORIES = ["Makanan", "Minuman", "Snack", "Sembako", "Toiletries", "Rokok"]
+
+
+def seed(count: int):
+    random.seed(5)
+    db = SessionLocal()
+    db.bulk_insert_mappings(Product, [
+        {
+            "barcode": f"899{i:010d}",
+            "name": f"{' '.join(random.sample(WORDS, 3))} {random.choice(SIZES)} {i}",
+            "price": random.randrange(1000, 100000, 500),
+            "stock": 50,
+            "category": random.choice(CATEGORIES)
+        }
+        for i in range(count)
+    ])
+    db.commit()
+    ids = [pid for (pid,) in db.query(Product.id)]
+
+    # Recent sales for a few thousand products so ranking has something to sort by
+    now = datetime.utcnow()
+    transactions = [Transaction(subtotal=0, total=0, paid=0, change=0, created_at=now) for _ in range(200)]
+    db.add_all(transactions)
+    db.flush()
+    db.bulk_insert_mappings(TransactionItem, [
+        {
+            "transaction_id": random.choice(transactions).id,
+            "product_id": random.choice(ids[:5000]),
+            "quantity": random.randint(1, 5),
+            "product_name": "Produk",
+            "price_at_sale": 1000
+        }
+        for _ in range(5000)
+    ])
+    db.commit()
+    db.close()
+    return ids
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    with TestClient(app) as client:
+        token = client.post(
+            "/api/auth/login", json={"username": "admin", "password": "admin123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        ids = seed(SKUS)
+
+        started = time.perf_counter()
+        catalog_cache.load()  # Rebuilds the index through the catalog listener
+        autocomplete_index.refresh_velocity()
+        build_s = time.perf_counter() - started
+
+        # Keystroke-like queries: 1-5 character prefixes, some with a second word
+        random.seed(9)
+        queries = []
+        for _ in range(QUERIES):
+            word = random.choice(WORDS)
+            query = word[:random.randint(1, 5)]
+            if random.random() < 0.3:
+                query = f"{random.choice(WORDS)} {query}"
+            queries.append(query)
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            autocomplete_index.suggest(query, 10)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Incremental update after a product write
+        product_id = random.choice(ids)
+        db = SessionLocal()
+        db.query(Product).filter(Product.id == product_id).update({"name": "Zebra Cola Spesial"})
+        db.commit()
+        db.close()
+        started = time.perf_counter()
+        catalog_cache.invalidate(product_id)
+        update_ms = (time.perf_counter() - started) * 1000
+        assert autocomplete_index.suggest("zebra col")[0]["id"] == product_id
+
+        response = client.get("/api/products/suggest", params={"q": "kop"}, headers=headers)
+        assert response.status_code == 200, response.text
+
+        p50, p99 = percentile(timings, 50), percentile(timings, 99)
+        print(f"{SKUS} SKUs, {autocomplete_index.stats()['tokens']} tokens, build {build_s:.2f} s")
+        print(f"suggest: p50 {p50:.3f} ms, p99 {p99:.3f} ms, max {max(timings):.3f} ms over {QUERIES} queries")
+        print(f"incremental update after product write: {update_ms:.2f} ms")
+        print(f"top for 'kop': {[s['name'] for s in response.json()[:3]]}")
+        assert p99 < TARGET_P99_MS, f"p99 {p99:.3f} ms"
+        print(f"OK: p99 under {TARGET_P99_MS:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark lookup barcode massal: 200 kode per request dibandingkan dengan
+200 request GET /api/products/barcode/{code}.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_barcode_lookup.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'lookup.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Product, ProductBarcode
+
+PRODUCTS = 20_000
+CODES = 200
+ROUNDS = 20
+
+
+def seed_products(count: int):
+    db = SessionLocal()
+    db.bulk_insert_mappings(Product, [
+        {
+            "barcode": f"899{i:010d}",
+            "name": f"Produk Lookup {i}",
+            "price": 10000,
+            "stock": 100,
+            "category": "Snack"
+        }
+        for i in range(count)
+    ])
+    db.commit()
+    ids = [pid for (pid,) in db.query(Product.id).filter(Product.name.like("Produk Lookup %"))]
+    # Every tenth product also has an alternative barcode
+    db.bulk_insert_mappings(ProductBarcode, [
+        {"barcode": f"ALT{pid:08d}", "product_id": pid} for pid in ids[::10]
+    ])
+    db.commit()
+    db.close()
+    return ids
+
+
+def main():
+    random.seed(11)
+    with TestClient(app) as client:
+        ids = seed_products(PRODUCTS)
+
+        # Mostly main barcodes, some alternatives and some unknown codes
+        batches = []
+        for _ in range(ROUNDS):
+            codes = [f"899{random.randrange(PRODUCTS):010d}" for _ in range(CODES - 40)]
+            codes += [f"ALT{pid:08d}" for pid in random.sample(ids[::10], 30)]
+            codes += [f"000{random.randrange(10**9):010d}" for _ in range(10)]
+            batches.append(codes)
+
+        started = time.perf_counter()
+        for codes in batches:
+            response = client.post("/api/products/barcode/lookup", json={"codes": codes})
+            assert response.status_code == 200, response.text
+        batch_ms = (time.perf_counter() - started) / ROUNDS * 1000
+        result = response.json()
+
+        started = time.perf_counter()
+        single_found = 0
+        for code in dict.fromkeys(batches[-1]):
+            single_found += client.get(f"/api/products/barcode/{code}").status_code == 200
+        single_ms = (time.perf_counter() - started) * 1000
+
+        print(f"{CODES} codes, {PRODUCTS} products")
+        print(f"batch lookup:   {batch_ms:.1f} ms per call ({len(result['found'])} found, {len(result['missing'])} missing)")
+        print(f"single lookups: {single_ms:.1f} ms for the same codes")
+        assert len(result["found"]) == single_found
+        print(f"OK: {single_ms / batch_ms:.1f}x faster")
+
+
+if __name__ == "__main__":
+    main()
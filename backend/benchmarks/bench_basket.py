@@ -0,0 +1,108 @@
+"""
+Benchmark "sering dibeli bersama": rebuild matriks ko-okurensi dari 200.000
+transaksi dan latensi GET /api/products/{id}/related.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_basket.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'basket.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Product, Transaction, TransactionItem
+from utils.basket import rebuild_basket_pairs, related_products
+
+SKUS = 20_000
+TRANSACTIONS = 200_000
+ITEMS_PER_TRANSACTION = 5
+LOOKUPS = 2_000
+TARGET_P99_MS = 10.0
+
+
+def seed():
+    rng = np.random.default_rng(7)
+    db = SessionLocal()
+    db.execute(Product.__table__.insert(), [
+        {"barcode": f"899{i:010d}", "name": f"Produk Basket {i}", "price": 10000, "stock": 100,
+         "category": "Snack", "is_active": True}
+        for i in range(SKUS)
+    ])
+    db.commit()
+    ids = np.array([pid for (pid,) in db.query(Product.id).filter(Product.name.like("Produk Basket %")).order_by(Product.id)])
+    popularity = 1.0 / np.arange(1, len(ids) + 1) ** 0.9
+    popularity /= popularity.sum()
+    # Planted affinity: whoever buys the 500th product usually also buys the 900th
+    anchor, partner = int(ids[500]), int(ids[900])
+
+    start = datetime.utcnow() - timedelta(days=60)
+    baskets = rng.choice(ids, size=(TRANSACTIONS, ITEMS_PER_TRANSACTION), p=popularity)
+    db.execute(Transaction.__table__.insert(), [
+        {"id": n + 1, "subtotal": 0, "total": 0, "paid": 0, "change": 0,
+         "created_at": start + timedelta(seconds=n * 25)}
+        for n in range(TRANSACTIONS)
+    ])
+    items = []
+    for n, basket in enumerate(baskets.tolist()):
+        basket = set(basket)
+        if anchor in basket and rng.random() < 0.8:
+            basket.add(partner)
+        items.extend(
+            {"transaction_id": n + 1, "product_id": pid, "product_name": "Produk", "quantity": 1, "price_at_sale": 10000}
+            for pid in basket
+        )
+    db.execute(TransactionItem.__table__.insert(), items)
+    db.commit()
+    db.close()
+    return ids, anchor, partner
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    with TestClient(app) as client:
+        ids, anchor, partner = seed()
+
+        db = SessionLocal()
+        rebuild = rebuild_basket_pairs(db)
+        print(f"rebuild: {rebuild['seconds']:.2f} s for {rebuild['baskets']} baskets, {rebuild['pairs']} pairs")
+
+        # Lookups weighted like real traffic: popular products are asked about most
+        rng = np.random.default_rng(1)
+        targets = rng.choice(ids[:2000], size=LOOKUPS).tolist()
+        timings = []
+        for product_id in targets:
+            started = time.perf_counter()
+            related_products(db, product_id, 10)
+            timings.append((time.perf_counter() - started) * 1000)
+        top = related_products(db, anchor, 5)["related"]
+        db.close()
+
+        started = time.perf_counter()
+        response = client.get(f"/api/products/{int(ids[0])}/related")
+        http_ms = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.text
+
+        p50, p99 = percentile(timings, 50), percentile(timings, 99)
+        print(f"related: p50 {p50:.2f} ms, p99 {p99:.2f} ms over {LOOKUPS} lookups; HTTP {http_ms:.2f} ms")
+        print(f"top for planted anchor: {[(r['id'], r['together'], r['lift']) for r in top[:3]]}")
+        assert top[0]["id"] == partner
+        assert p99 < TARGET_P99_MS, f"p99 {p99:.2f} ms"
+        print(f"OK: p99 under {TARGET_P99_MS:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
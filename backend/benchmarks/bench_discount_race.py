@@ -0,0 +1,73 @@
+"""
+Checkout paralel dengan kode promo terbatas: membuktikan usage_limit tidak
+pernah terlampaui.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_discount_race.py
+"""
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'race.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Discount, Product
+
+USAGE_LIMIT = 100
+CHECKOUTS = 400
+WORKERS = 16
+
+
+def main():
+    with TestClient(app) as client:
+        token = client.post(
+            "/api/auth/login", json={"username": "kasir", "password": "kasir123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        db = SessionLocal()
+        db.add(Product(name="Bench", price=10000, stock=CHECKOUTS * 2, category="Snack"))
+        db.add(Discount(code="FIRST100", name="First 100", discount_type="fixed", value=1000, usage_limit=USAGE_LIMIT))
+        db.commit()
+        product_id = db.query(Product).filter(Product.name == "Bench").first().id
+        db.close()
+
+        from utils.discount_registry import discount_registry
+        discount_registry.load()
+
+        def checkout(_):
+            response = client.post("/api/transactions", headers=headers, json={
+                "items": [{"product_id": product_id, "quantity": 1}],
+                "discount_code": "FIRST100",
+                "paid": 10000
+            })
+            return response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+            statuses = list(pool.map(checkout, range(CHECKOUTS)))
+        elapsed = time.perf_counter() - started
+
+        db = SessionLocal()
+        usage_count = db.query(Discount.usage_count).filter(Discount.code == "FIRST100").scalar()
+        db.close()
+
+        accepted = statuses.count(200)
+        print(f"{CHECKOUTS} checkouts / {WORKERS} threads in {elapsed:.2f} s")
+        print(f"accepted: {accepted}, rejected: {CHECKOUTS - accepted}, usage_count: {usage_count}")
+        print(f"status codes: {dict(Counter(statuses))}")
+        assert accepted == USAGE_LIMIT == usage_count, "usage limit not exact"
+        print("OK: limit is exact")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark forecast permintaan / reorder point: 20.000 SKU x 2 tahun penjualan.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_forecast.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'forecast.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Product, ReorderSuggestion, Transaction, TransactionItem
+from utils.forecast import forecast_job
+from utils.partitions import archive_closed_months
+
+SKUS = 20_000
+DAYS = 730
+TRANSACTIONS_PER_DAY = 400
+ITEMS_PER_TRANSACTION = 5
+STEADY_DAILY = 4  # The check product sells exactly this many every day
+TARGET_S = 10.0
+
+
+def seed():
+    rng = np.random.default_rng(3)
+    db = SessionLocal()
+    start = datetime.combine(datetime.utcnow().date(), datetime.min.time()) - timedelta(days=DAYS)
+    db.execute(Product.__table__.insert(), [
+        {
+            "barcode": f"899{i:010d}", "name": f"Produk Forecast {i}", "price": 10000, "cost_price": 7000,
+            "stock": int(rng.integers(0, 200)), "min_stock": 5, "category": "Snack",
+            "is_active": True, "created_at": start
+        }
+        for i in range(SKUS)
+    ])
+    db.commit()
+    ids = np.array([pid for (pid,) in db.query(Product.id).filter(Product.name.like("Produk Forecast %")).order_by(Product.id)])
+    steady_id = int(ids[0])
+
+    # Long-tail popularity: a few SKUs sell daily, most only now and then
+    popularity = 1.0 / np.arange(1, len(ids) + 1) ** 0.9
+    popularity /= popularity.sum()
+
+    tx_table, item_table = Transaction.__table__, TransactionItem.__table__
+    next_tx = 1
+    for day in range(DAYS):
+        moment = start + timedelta(days=day, hours=10)
+        count = TRANSACTIONS_PER_DAY
+        db.execute(tx_table.insert(), [
+            {"id": next_tx + n, "subtotal": 0, "total": 0, "paid": 0, "change": 0, "created_at": moment}
+            for n in range(count)
+        ])
+        products = rng.choice(ids[1:], size=(count, ITEMS_PER_TRANSACTION), p=popularity[1:] / popularity[1:].sum())
+        quantities = rng.integers(1, 4, size=(count, ITEMS_PER_TRANSACTION))
+        items = [
+            {"transaction_id": next_tx + n, "product_id": int(pid), "product_name": "Produk",
+             "quantity": int(qty), "price_at_sale": 10000}
+            for n in range(count)
+            for pid, qty in zip(products[n], quantities[n])
+        ]
+        items.append({"transaction_id": next_tx, "product_id": steady_id, "product_name": "Produk",
+                      "quantity": STEADY_DAILY, "price_at_sale": 10000})
+        db.execute(item_table.insert(), items)
+        next_tx += count
+    db.commit()
+    # Closed months move to the archive partitions, as they would in production
+    archived = archive_closed_months(db)
+    db.close()
+    return steady_id, len(archived)
+
+
+def main():
+    with TestClient(app):
+        started = time.perf_counter()
+        steady_id, partitions = seed()
+        print(f"seeded {SKUS} SKUs x {DAYS} days in {time.perf_counter() - started:.1f} s ({partitions} archived months)")
+
+        for method in ("ma", "ses"):
+            result = forecast_job.run(method)
+            print(
+                f"{method}: {result['seconds']:.2f} s for {result['products']} products, "
+                f"{result['sales_rows']} product-days, {result['to_reorder']} to reorder"
+            )
+
+        db = SessionLocal()
+        steady = db.query(ReorderSuggestion).filter(ReorderSuggestion.product_id == steady_id).one()
+        db.close()
+        print(f"steady product: forecast {steady.forecast_daily:.3f}/day, std {steady.demand_std:.3f}, reorder point {steady.reorder_point}")
+        assert abs(steady.forecast_daily - STEADY_DAILY) < 0.01
+        assert result["seconds"] < TARGET_S, f"{result['seconds']} s"
+        print(f"OK: under {TARGET_S:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark import produk massal: 50.000 produk dari CSV, lalu import ulang
+file yang sama sebagai update, dan 5.000 baris XLSX.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_product_import.py
+"""
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'import.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from main import app
+from database import SessionLocal
+from models import Product
+
+PRODUCTS = 50_000
+XLSX_ROWS = 5_000
+CATEGORIES = ["Makanan", "Minuman", "Snack", "Rokok", "Sembako"]
+
+
+def build_csv(price_offset: int = 0) -> bytes:
+    output = io.StringIO()
+    writer = csv.writer(output, delimiter=";")
+    writer.writerow(["Barcode", "Nama", "Harga", "Harga Modal", "Stok", "Kategori"])
+    for i in range(PRODUCTS):
+        writer.writerow([
+            f"899{i:010d}", f"Produk Import {i}", f"{5000 + (i % 50) * 500 + price_offset:,}".replace(",", "."),
+            3000 + (i % 50) * 300, 10 + i % 90, CATEGORIES[i % len(CATEGORIES)]
+        ])
+    # A few broken rows to exercise per-row errors
+    writer.writerow(["", "", "1000", "", "", ""])
+    writer.writerow(["8990000000001", "Duplikat", "1000", "", "", ""])
+    writer.writerow(["123", "Harga salah", "abc", "", "", ""])
+    return output.getvalue().encode()
+
+
+def build_xlsx() -> bytes:
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(["barcode", "name", "price", "stock"])
+    for i in range(XLSX_ROWS):
+        ws.append([int(f"777{i:010d}"), f"Produk Excel {i}", 12000, 5])
+    output = io.BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def timed_import(client, headers, filename, content):
+    started = time.perf_counter()
+    response = client.post(
+        "/api/products/import", headers=headers, files={"file": (filename, content)}
+    )
+    elapsed = time.perf_counter() - started
+    assert response.status_code == 200, response.text
+    return response.json(), elapsed
+
+
+def main():
+    with TestClient(app) as client:
+        token = client.post(
+            "/api/auth/login", json={"username": "admin", "password": "admin123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        report, elapsed = timed_import(client, headers, "produk.csv", build_csv())
+        print(f"insert {PRODUCTS} (csv): {elapsed:.2f} s  created={report['created']} errors={report['error_count']}")
+        assert report["created"] == PRODUCTS and report["error_count"] == 3
+
+        report, elapsed = timed_import(client, headers, "produk.csv", build_csv(price_offset=500))
+        print(f"upsert {PRODUCTS} (csv): {elapsed:.2f} s  updated={report['updated']}")
+        assert report["updated"] == PRODUCTS
+
+        report, elapsed = timed_import(client, headers, "produk.xlsx", build_xlsx())
+        print(f"insert {XLSX_ROWS} (xlsx): {elapsed:.2f} s  created={report['created']}")
+        assert report["created"] == XLSX_ROWS
+
+        db = SessionLocal()
+        total = db.query(Product).count()
+        sample = db.query(Product).filter(Product.barcode == "8990000000001").one()
+        db.close()
+        print(f"products in db: {total}, sample price: {sample.price}")
+        assert sample.price == 5500 + 500
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark promotion engine: 1.000 promo aktif, keranjang 50 baris.
+
+Jalankan dari folder backend:
+    python benchmarks/bench_promotions.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Promotion
+from utils.promotions import PromotionEngine
+
+PROMO_COUNT = 1000
+CART_LINES = 50
+PRODUCT_COUNT = 5000
+CATEGORIES = [f"Kategori {i}" for i in range(40)]
+ROUNDS = 2000
+
+
+def make_promotions(rng):
+    promotions = []
+    for i in range(PROMO_COUNT):
+        kind = rng.choice(["percentage", "fixed", "buy_x_get_y"])
+        scope = rng.random()
+        start_hour = rng.randrange(24) if rng.random() < 0.3 else None
+        promotions.append(Promotion(
+            id=i + 1,
+            name=f"Promo {i + 1}",
+            promo_type=kind,
+            value=rng.randint(5, 50) if kind == "percentage" else rng.randint(500, 5000),
+            buy_quantity=rng.randint(1, 3) if kind == "buy_x_get_y" else None,
+            get_quantity=1 if kind == "buy_x_get_y" else None,
+            product_id=rng.randrange(1, PRODUCT_COUNT + 1) if scope < 0.7 else None,
+            category=rng.choice(CATEGORIES) if 0.7 <= scope < 0.97 else None,
+            start_hour=start_hour,
+            end_hour=(start_hour + 3) % 24 if start_hour is not None else None
+        ))
+    return promotions
+
+
+def main():
+    rng = random.Random(42)
+    engine = PromotionEngine()
+
+    started = time.perf_counter()
+    engine.build(make_promotions(rng))
+    print(f"build: {(time.perf_counter() - started) * 1000:.2f} ms for {PROMO_COUNT} promos")
+
+    carts = [
+        [
+            {
+                "product_id": rng.randrange(1, PRODUCT_COUNT + 1),
+                "category": rng.choice(CATEGORIES),
+                "price": rng.randrange(1000, 100000, 500),
+                "quantity": rng.randint(1, 6)
+            }
+            for _ in range(CART_LINES)
+        ]
+        for _ in range(100)
+    ]
+
+    timings = []
+    for i in range(ROUNDS):
+        cart = carts[i % len(carts)]
+        started = time.perf_counter()
+        engine.quote(cart)
+        timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    print(f"quote ({CART_LINES} lines): "
+          f"p50 {timings[len(timings) // 2] * 1e6:.0f} us, "
+          f"p99 {timings[int(len(timings) * 0.99)] * 1e6:.0f} us, "
+          f"max {timings[-1] * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark stock opname massal: 10.000 baris hitung dalam satu request.
+
+Memakai database sementara (bukan kasir.db). Jalankan dari folder backend:
+    python benchmarks/bench_stock_opname.py
+"""
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(DB_DIR, 'opname.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from main import app
+from database import SessionLocal
+from models import Product, StockMovement
+
+LINES = 10_000
+TARGET_SECONDS = 2.0
+
+
+def seed_products(count: int) -> list:
+    db = SessionLocal()
+    db.bulk_insert_mappings(Product, [
+        {
+            "barcode": f"899{i:010d}",
+            "name": f"Produk Opname {i}",
+            "price": 10000,
+            "cost_price": 7000,
+            "stock": 100,
+            "category": "Snack"
+        }
+        for i in range(count)
+    ])
+    db.commit()
+    products = db.query(Product.id, Product.barcode).filter(Product.name.like("Produk Opname %")).all()
+    db.close()
+    return products
+
+
+def main():
+    random.seed(7)
+    with TestClient(app) as client:
+        token = client.post(
+            "/api/auth/login", json={"username": "admin", "password": "admin123"}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        products = seed_products(LINES)
+
+        # Half by id, half by barcode; roughly a third of the counts differ
+        lines = [
+            {"product_id": pid, "counted": random.choice([100, 100, 97, 104])} if i % 2
+            else {"barcode": code, "counted": random.choice([100, 100, 98, 101])}
+            for i, (pid, code) in enumerate(products)
+        ]
+
+        started = time.perf_counter()
+        dry = client.post("/api/products/stock/bulk?dry_run=true", headers=headers, json={"items": lines})
+        dry_elapsed = time.perf_counter() - started
+        assert dry.status_code == 200, dry.text
+
+        started = time.perf_counter()
+        applied = client.post("/api/products/stock/bulk", headers=headers, json={"items": lines})
+        elapsed = time.perf_counter() - started
+        assert applied.status_code == 200, applied.text
+        report = applied.json()
+
+        # Same count again as CSV: nothing left to change
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(["product_id", "barcode", "counted"])
+        for line in lines:
+            writer.writerow([line.get("product_id", ""), line.get("barcode", ""), line["counted"]])
+        started = time.perf_counter()
+        again = client.post(
+            "/api/products/stock/bulk", headers=headers,
+            files={"file": ("opname.csv", output.getvalue().encode(), "text/csv")}
+        )
+        csv_elapsed = time.perf_counter() - started
+        assert again.status_code == 200, again.text
+
+        db = SessionLocal()
+        movements = db.query(StockMovement).filter(StockMovement.movement_type == "opname").count()
+        db.close()
+
+        print(f"{LINES} lines")
+        print(f"dry run: {dry_elapsed:.2f} s")
+        print(f"apply:   {elapsed:.2f} s ({report['changed']} changed, variance value Rp {report['variance_value']:,})")
+        print(f"csv re-count: {csv_elapsed:.2f} s ({again.json()['changed']} changed)")
+        print(f"opname movements: {movements}")
+        assert movements == report["changed"]
+        assert again.json()["changed"] == 0
+        assert elapsed < TARGET_SECONDS, f"apply took {elapsed:.2f} s"
+        print(f"OK: under {TARGET_SECONDS:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
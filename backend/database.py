@@ -1,11 +1,12 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateTable
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
 
-# Database file path
+# Database file path (override with DATABASE_URL, see .env.example)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'kasir.db')}"
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'kasir.db')}")
 
 # Create engine
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
@@ -24,3 +25,71 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def sync_schema():
+    """
+    Create missing tables, columns and indexes.
+    create_all skips tables that already exist, so new columns are added with
+    ALTER TABLE, and tables that now ask for AUTOINCREMENT are rebuilt.
+    Returns the list of (table, column) pairs that were added.
+    """
+    Base.metadata.create_all(bind=engine)
+    added = []
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                default = column.default.arg if column.default is not None and column.default.is_scalar else None
+                if default is not None:
+                    ddl += f" DEFAULT {int(default) if isinstance(default, bool) else repr(default)}"
+                conn.execute(text(ddl))
+                added.append((table.name, column.name))
+        for table in Base.metadata.sorted_tables:
+            if table.dialect_options["sqlite"]["autoincrement"] and not _has_autoincrement(conn, table.name):
+                _rebuild_table(conn, table)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    return added
+
+
+def _has_autoincrement(conn, name: str) -> bool:
+    ddl = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": name}
+    ).scalar()
+    return ddl is None or "AUTOINCREMENT" in ddl.upper()
+
+
+def _rebuild_table(conn, table):
+    """
+    Recreate a table from its model, keeping rows and ids. SQLite can't add
+    AUTOINCREMENT with ALTER TABLE; indexes are recreated by sync_schema.
+    """
+    rebuild = f"{table.name}__rebuild"
+    ddl = str(CreateTable(table).compile(engine)).replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {rebuild} ", 1)
+    columns = ", ".join(c.name for c in table.columns)
+    conn.execute(text(ddl))
+    conn.execute(text(f"INSERT INTO {rebuild} ({columns}) SELECT {columns} FROM {table.name}"))
+    conn.execute(text(f"DROP TABLE {table.name}"))
+    conn.execute(text(f"ALTER TABLE {rebuild} RENAME TO {table.name}"))
+
+
+def reserve_ids(conn, name: str, floor: int):
+    """
+    Never hand out ids <= floor again in an AUTOINCREMENT table, e.g. after
+    its newest rows were moved to an archive.
+    """
+    if not floor:
+        return
+    conn.execute(text(
+        "INSERT INTO sqlite_sequence (name, seq) SELECT :name, 0 "
+        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+    ), {"name": name})
+    conn.execute(text(
+        "UPDATE sqlite_sequence SET seq = :floor WHERE name = :name AND seq < :floor"
+    ), {"name": name, "floor": floor})
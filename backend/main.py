@@ -1,13 +1,29 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from contextlib import asynccontextmanager
 from pathlib import Path
 
-from database import engine, Base, SessionLocal
-from models import Product, User, Discount
+from database import SessionLocal, sync_schema
+from models import Product, User, Discount, StockMovement, PriceHistory, BasketPair
 from auth import get_password_hash
-from routes import products, transactions, auth, discounts, reports, customers, export, users, excel_export
+from routes import products, transactions, cart, auth, discounts, promotions, reports, customers, export, users, excel_export
+from routes.customers import check_debt_balances, open_point_ledger, point_snapshot_job, snapshot_points
+from routes.products import convert_legacy_images
+from utils.discount_registry import discount_registry
+from utils.promotions import promotion_engine
+from utils.catalog import catalog_cache
+from utils.audit import audit_log
+from utils.activity_archive import archive_activity_logs
+from utils.partitions import archive_closed_months, reserve_archived_ids
+from utils.stock_ledger import open_stock_ledger, snapshot_stock, stock_snapshot_job
+from utils.price_history import open_price_history
+from utils.barcode_render import shutdown_label_pool
+from utils.images import UploadFiles
+from utils.gtin import backfill_gtins
+from utils.low_stock import backfill_low_stock
+from utils.forecast import forecast_job
+from utils.basket import rebuild_basket_pairs
+from utils.autocomplete import autocomplete_index
 
 # Create uploads directory
 UPLOAD_DIR = Path(__file__).parent / "uploads"
@@ -18,11 +34,28 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize database and seed data on startup"""
-    # Create tables
-    Base.metadata.create_all(bind=engine)
+    # Create tables, columns and indexes
+    added_columns = sync_schema()
     
     db = SessionLocal()
     try:
+        # Backfill denormalized balances for newly added columns
+        if ("customers", "outstanding_debt") in added_columns:
+            check_debt_balances(db, fix=True)
+        if ("transactions", "points_redeemed") in added_columns:
+            open_point_ledger(db)
+        
+        # Periodic point balance snapshot
+        snapshot_points(db)
+        
+        # Move activity logs past the retention window into archive files
+        archive_activity_logs(db)
+        
+        # Move closed months outside the hot window into per-month tables
+        reserve_archived_ids(db)
+        for partition in archive_closed_months(db):
+            print(f"📦 Transaksi {partition['month']} diarsipkan ({partition['transactions']} transaksi)")
+        
         # Seed admin user if no users exist
         if db.query(User).count() == 0:
             admin = User(
@@ -65,6 +98,9 @@ async def lifespan(app: FastAPI):
             db.commit()
             print("✅ Initial products seeded successfully!")
         
+        # Canonical GTIN for barcodes written before the column existed
+        backfill_gtins(db)
+        
         # Seed sample discounts if empty
         if db.query(Discount).count() == 0:
             sample_discounts = [
@@ -87,11 +123,56 @@ async def lifespan(app: FastAPI):
             db.add_all(sample_discounts)
             db.commit()
             print("✅ Sample discounts created!")
+        
+        # Maintained low-stock flag (new column, or stock changed outside the app)
+        backfill_low_stock(db)
+        
+        # Stock that predates the ledger becomes an opening movement
+        if db.query(StockMovement.id).first() is None:
+            open_stock_ledger(db)
+        
+        # Periodic stock balance snapshot
+        snapshot_stock(db)
+        
+        # Current prices become the opening price history
+        if db.query(PriceHistory.id).first() is None:
+            open_price_history(db)
+        
+        # Frequently-bought-together counts for sales made before checkout kept them.
+        # Reads archived partitions too, so history moved out of the hot tables counts
+        if db.query(BasketPair.id).first() is None:
+            rebuild_basket_pairs(db)
+        
+        # Resized WebP/JPEG variants for images uploaded before the pipeline
+        convert_legacy_images(db)
             
     finally:
         db.close()
     
+    # Load products, active discounts and promotions into the in-memory indexes
+    catalog_cache.load()
+    autocomplete_index.refresh_velocity()
+    discount_registry.load()
+    promotion_engine.load()
+    
+    # Background writer for the audit log
+    audit_log.start()
+    
+    # Nightly demand forecast / reorder suggestions
+    forecast_job.start()
+    
+    # Periodic stock and point balance snapshots while the server stays up
+    stock_snapshot_job.start()
+    point_snapshot_job.start()
+    
     yield
+    
+    # Drain queued audit events before exit
+    audit_log.stop()
+    forecast_job.stop()
+    stock_snapshot_job.stop()
+    point_snapshot_job.stop()
+    shutdown_label_pool()
 
 
 # Create FastAPI app
@@ -115,7 +196,9 @@ app.add_middleware(
 app.include_router(auth.router)
 app.include_router(products.router)
 app.include_router(transactions.router)
+app.include_router(cart.router)
 app.include_router(discounts.router)
+app.include_router(promotions.router)
 app.include_router(reports.router)
 app.include_router(customers.router)
 app.include_router(export.router)
@@ -123,7 +206,7 @@ app.include_router(excel_export.router)
 app.include_router(users.router)
 
 # Mount static files for uploads
-app.mount("/uploads", StaticFiles(directory=str(UPLOAD_DIR)), name="uploads")
+app.mount("/uploads", UploadFiles(directory=str(UPLOAD_DIR)), name="uploads")
 
 
 @app.get("/")
@@ -135,7 +218,9 @@ def root():
             "auth": "/api/auth",
             "products": "/api/products",
             "transactions": "/api/transactions",
+            "cart": "/api/cart",
             "discounts": "/api/discounts",
+            "promotions": "/api/promotions",
             "reports": "/api/reports",
             "customers": "/api/customers",
             "export": "/api/export",
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
+from utils.images import image_variants
 
 
 class User(Base):
@@ -33,17 +34,24 @@ class User(Base):
 class Product(Base):
     """Product model with barcode and stock"""
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ux_products_gtin", "gtin", unique=True),
+        Index("ix_products_low_stock", "is_low_stock", "is_active"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     barcode = Column(String(50), unique=True, nullable=True, index=True)
+    gtin = Column(String(14), nullable=True)  # Canonical GTIN-14 of barcode, see utils.gtin
     name = Column(String(100), nullable=False)
     price = Column(Integer, nullable=False)  # Harga jual
     cost_price = Column(Integer, default=0)  # Harga modal untuk laba rugi
     stock = Column(Integer, default=0)
     min_stock = Column(Integer, default=5)  # Minimum stok untuk alert
+    is_low_stock = Column(Boolean, default=False)  # stock <= min_stock, see utils.low_stock
     category = Column(String(50), default="Makanan")
     emoji = Column(String(10), default="🍽️")
     image_url = Column(String(255), nullable=True)
+    image_key = Column(String(32), nullable=True, index=True)  # Content hash of the variant files
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -65,6 +73,7 @@ class Product(Base):
             "category": self.category,
             "emoji": self.emoji,
             "image_url": self.image_url,
+            "images": image_variants(self.image_key),
             "is_active": self.is_active,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
@@ -75,9 +84,13 @@ class Product(Base):
 class ProductBarcode(Base):
     """Alternative barcodes for a product - allows one product to have multiple barcodes"""
     __tablename__ = "product_barcodes"
+    __table_args__ = (
+        Index("ux_product_barcodes_gtin", "gtin", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     barcode = Column(String(50), unique=True, nullable=False, index=True)
+    gtin = Column(String(14), nullable=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     description = Column(String(100), nullable=True)  # e.g., "Kemasan baru", "Dari supplier B"
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -147,24 +160,79 @@ class Discount(Base):
             return min(self.value, subtotal)
 
 
+class Promotion(Base):
+    """Automatic promotion applied without a code (category, buy X get Y, happy hour)"""
+    __tablename__ = "promotions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False)
+    promo_type = Column(String(20), default="percentage")  # percentage, fixed (per unit), buy_x_get_y
+    value = Column(Integer, default=0)  # percentage value or fixed amount per unit
+    buy_quantity = Column(Integer, nullable=True)  # buy_x_get_y: beli X
+    get_quantity = Column(Integer, nullable=True)  # buy_x_get_y: gratis Y
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=True)  # Scope: produk
+    category = Column(String(50), nullable=True)  # Scope: kategori (kosong + tanpa produk = semua)
+    start_hour = Column(Integer, nullable=True)  # Happy hour (jam lokal), inklusif
+    end_hour = Column(Integer, nullable=True)  # Happy hour (jam lokal), eksklusif
+    is_active = Column(Boolean, default=True)
+    valid_from = Column(DateTime, nullable=True)
+    valid_until = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "promo_type": self.promo_type,
+            "value": self.value,
+            "buy_quantity": self.buy_quantity,
+            "get_quantity": self.get_quantity,
+            "product_id": self.product_id,
+            "category": self.category,
+            "start_hour": self.start_hour,
+            "end_hour": self.end_hour,
+            "is_active": self.is_active,
+            "valid_from": self.valid_from.isoformat() if self.valid_from else None,
+            "valid_until": self.valid_until.isoformat() if self.valid_until else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+    def line_discount(self, price, quantity):
+        """Discount this promotion gives on one cart line"""
+        if self.promo_type == "buy_x_get_y":
+            group = (self.buy_quantity or 0) + (self.get_quantity or 0)
+            if not self.get_quantity or group <= 0:
+                return 0
+            return (quantity // group) * self.get_quantity * price
+        if self.promo_type == "percentage":
+            return int(price * quantity * self.value / 100)
+        # fixed amount off per unit
+        return min(self.value, price) * quantity
+
+
 class Transaction(Base):
     """Transaction model"""
     __tablename__ = "transactions"
+    # Ids stay unique after rows move to the archive partitions
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=True)  # For member/debt
     discount_id = Column(Integer, ForeignKey("discounts.id"), nullable=True)
     subtotal = Column(Integer, nullable=False)
-    discount_amount = Column(Integer, default=0)
+    discount_amount = Column(Integer, default=0)  # Promo otomatis + kode promo
+    promo_amount = Column(Integer, default=0)  # Bagian diskon dari promo otomatis
     total = Column(Integer, nullable=False)
     cost_total = Column(Integer, default=0)  # Total harga modal untuk laba rugi
     paid = Column(Integer, nullable=False)
     change = Column(Integer, nullable=False)
     payment_method = Column(String(20), default="cash")  # cash, qris, debit, credit, debt
     is_debt = Column(Boolean, default=False)  # True jika hutang
+    points_redeemed = Column(Integer, default=0)  # Poin member yang dipakai sebagai pembayaran
+    points_earned = Column(Integer, default=0)  # Poin member yang didapat dari transaksi ini
     notes = Column(Text, nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     user = relationship("User", back_populates="transactions")
@@ -183,6 +251,7 @@ class Transaction(Base):
             "discount_code": self.discount.code if self.discount else None,
             "subtotal": self.subtotal,
             "discount_amount": self.discount_amount,
+            "promo_amount": self.promo_amount or 0,
             "total": self.total,
             "cost_total": self.cost_total,
             "profit": self.total - self.cost_total,
@@ -190,6 +259,8 @@ class Transaction(Base):
             "change": self.change,
             "payment_method": self.payment_method,
             "is_debt": self.is_debt,
+            "points_redeemed": self.points_redeemed or 0,
+            "points_earned": self.points_earned or 0,
             "notes": self.notes,
             "items": [item.to_dict() for item in self.items],
             "created_at": self.created_at.isoformat() if self.created_at else None
@@ -199,9 +270,11 @@ class Transaction(Base):
 class TransactionItem(Base):
     """Transaction item model"""
     __tablename__ = "transaction_items"
+    # Ids stay unique after rows move to the archive partitions
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
     product_name = Column(String(100), nullable=False)  # Store name at time of sale
     quantity = Column(Integer, nullable=False)
@@ -222,6 +295,154 @@ class TransactionItem(Base):
         }
 
 
+class StockMovement(Base):
+    """Stock ledger - every change to Product.stock, in the same DB transaction"""
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        Index("ix_stock_movements_product_created", "product_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    movement_type = Column(String(20), nullable=False)  # opening, sale, void, adjustment, receipt, opname
+    change = Column(Integer, nullable=False)  # Positif masuk, negatif keluar
+    transaction_id = Column(Integer, nullable=True)  # Tidak di-FK agar riwayat tetap ada saat void/arsip
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    notes = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "movement_type": self.movement_type,
+            "change": self.change,
+            "transaction_id": self.transaction_id,
+            "user_id": self.user_id,
+            "notes": self.notes,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class PriceHistory(Base):
+    """Price in effect from effective_at - one row per price/cost change"""
+    __tablename__ = "price_history"
+    __table_args__ = (
+        Index("ix_price_history_product_effective", "product_id", "effective_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    price = Column(Integer, nullable=False)
+    cost_price = Column(Integer, default=0)
+    source = Column(String(20), nullable=False)  # opening, create, edit, import, bulk
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    notes = Column(Text, nullable=True)
+    effective_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "product_id": self.product_id,
+            "price": self.price,
+            "cost_price": self.cost_price,
+            "margin": self.price - (self.cost_price or 0),
+            "source": self.source,
+            "user_id": self.user_id,
+            "notes": self.notes,
+            "effective_at": self.effective_at.isoformat() if self.effective_at else None
+        }
+
+
+class StockSnapshot(Base):
+    """Periodic stock balance snapshot - stock at T = snapshot + movements after it up to T"""
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (
+        Index("ix_stock_snapshots_product_created", "product_id", "created_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    balance = Column(Integer, nullable=False)
+    last_movement_id = Column(Integer, nullable=False)  # Pergerakan terakhir yang sudah dihitung
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ReorderSuggestion(Base):
+    """Demand forecast and reorder point per product - replaced by each forecast run"""
+    __tablename__ = "reorder_suggestions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, unique=True)
+    method = Column(String(10), nullable=False)  # ses (exponential smoothing) or ma (moving average)
+    forecast_daily = Column(Float, default=0)  # Perkiraan unit terjual per hari
+    demand_std = Column(Float, default=0)  # Simpangan baku penjualan harian
+    safety_stock = Column(Integer, default=0)
+    reorder_point = Column(Integer, default=0)  # Usulan min_stock
+    order_up_to = Column(Integer, default=0)
+    stock = Column(Integer, default=0)  # Stok saat perhitungan
+    suggested_qty = Column(Integer, default=0, index=True)  # Jumlah yang perlu dipesan, 0 jika belum perlu
+    days_of_cover = Column(Float, nullable=True)  # Stok cukup untuk berapa hari
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            "product_id": self.product_id,
+            "method": self.method,
+            "forecast_daily": round(self.forecast_daily or 0, 3),
+            "demand_std": round(self.demand_std or 0, 3),
+            "safety_stock": self.safety_stock,
+            "reorder_point": self.reorder_point,
+            "order_up_to": self.order_up_to,
+            "stock": self.stock,
+            "suggested_qty": self.suggested_qty,
+            "days_of_cover": round(self.days_of_cover, 1) if self.days_of_cover is not None else None,
+            "computed_at": self.computed_at.isoformat() if self.computed_at else None
+        }
+
+
+class BasketPair(Base):
+    """
+    Co-occurrence count of two products in the same transaction (product_a <
+    product_b); product_a == product_b holds the number of baskets with the
+    product, and (0, 0) the number of baskets overall
+    """
+    __tablename__ = "basket_pairs"
+    __table_args__ = (
+        Index("ux_basket_pairs_pair", "product_a", "product_b", unique=True),
+        Index("ix_basket_pairs_a", "product_a", "count"),
+        Index("ix_basket_pairs_b", "product_b", "count"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_a = Column(Integer, nullable=False)  # Tidak di-FK: hitungan tetap ada meski produk dihapus
+    product_b = Column(Integer, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class TransactionPartition(Base):
+    """Closed month moved to transactions_YYYY_MM / transaction_items_YYYY_MM"""
+    __tablename__ = "transaction_partitions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(String(7), unique=True, nullable=False)  # YYYY-MM
+    transaction_count = Column(Integer, default=0)
+    total = Column(Integer, default=0)
+    min_id = Column(Integer, nullable=False)
+    max_id = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "month": self.month,
+            "transaction_count": self.transaction_count,
+            "total": self.total,
+            "min_id": self.min_id,
+            "max_id": self.max_id,
+            "archived_at": self.archived_at.isoformat() if self.archived_at else None
+        }
+
+
 # ============ NEW MODELS ============
 
 class Customer(Base):
@@ -236,6 +457,7 @@ class Customer(Base):
     points = Column(Integer, default=0)  # Loyalty points
     member_level = Column(String(20), default="Bronze")  # Bronze, Silver, Gold
     total_spent = Column(Integer, default=0)  # Total pembelian
+    outstanding_debt = Column(Integer, default=0, index=True)  # Sisa hutang, dijaga saat hutang dibuat/dibayar
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
 
@@ -253,7 +475,7 @@ class Customer(Base):
             "points": self.points,
             "member_level": self.member_level,
             "total_spent": self.total_spent,
-            "total_debt": sum(d.amount - d.paid for d in self.debts if not d.is_paid),
+            "total_debt": self.outstanding_debt or 0,
             "is_active": self.is_active,
             "created_at": self.created_at.isoformat() if self.created_at else None
         }
@@ -264,18 +486,19 @@ class CustomerDebt(Base):
     __tablename__ = "customer_debts"
 
     id = Column(Integer, primary_key=True, index=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
     transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True)
     amount = Column(Integer, nullable=False)  # Jumlah hutang
     paid = Column(Integer, default=0)  # Jumlah yang sudah dibayar
-    is_paid = Column(Boolean, default=False)
+    is_paid = Column(Boolean, default=False, index=True)
     notes = Column(Text, nullable=True)
-    due_date = Column(DateTime, nullable=True)
+    due_date = Column(DateTime, nullable=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     paid_at = Column(DateTime, nullable=True)
 
     # Relationships
     customer = relationship("Customer", back_populates="debts")
+    payments = relationship("DebtPayment", back_populates="debt", cascade="all, delete-orphan")
 
     def to_dict(self):
         return {
@@ -294,9 +517,76 @@ class CustomerDebt(Base):
         }
 
 
+class DebtPayment(Base):
+    """Ledger of payments made against a customer debt"""
+    __tablename__ = "debt_payments"
+
+    id = Column(Integer, primary_key=True, index=True)
+    debt_id = Column(Integer, ForeignKey("customer_debts.id"), nullable=False, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    amount = Column(Integer, nullable=False)
+    notes = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    # Relationships
+    debt = relationship("CustomerDebt", back_populates="payments")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "debt_id": self.debt_id,
+            "customer_id": self.customer_id,
+            "user_id": self.user_id,
+            "amount": self.amount,
+            "notes": self.notes,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class PointLedger(Base):
+    """Ledger of loyalty point changes (earn, redeem, adjust, void)"""
+    __tablename__ = "point_ledger"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    transaction_id = Column(Integer, nullable=True)  # Tidak di-FK agar riwayat tetap ada saat void
+    change = Column(Integer, nullable=False)  # Positif = tambah, negatif = kurang
+    reason = Column(String(20), nullable=False)  # opening, earn, redeem, adjust, void
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "customer_id": self.customer_id,
+            "transaction_id": self.transaction_id,
+            "change": self.change,
+            "reason": self.reason,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class PointSnapshot(Base):
+    """Periodic point balance snapshot - balance = snapshot + ledger entries after it"""
+    __tablename__ = "point_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False, index=True)
+    balance = Column(Integer, nullable=False)
+    last_ledger_id = Column(Integer, nullable=False)  # Entri ledger terakhir yang sudah dihitung
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
 class ActivityLog(Base):
     """Activity log for audit trail"""
     __tablename__ = "activity_logs"
+    __table_args__ = (
+        # Online window lookups: filter by user or action, newest first
+        Index("ix_activity_logs_user_created", "user_id", "created_at"),
+        Index("ix_activity_logs_action_created", "action", "created_at"),
+        # Ids stay unique after rows move to the archive files
+        {"sqlite_autoincrement": True},
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -305,7 +595,7 @@ class ActivityLog(Base):
     entity_id = Column(Integer, nullable=True)
     details = Column(Text, nullable=True)  # JSON details
     ip_address = Column(String(50), nullable=True)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
 
     # Relationships
     user = relationship("User")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import timedelta
@@ -13,6 +13,7 @@ from auth import (
     get_current_admin,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from utils.audit import audit_log
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -36,11 +37,18 @@ class TokenResponse(BaseModel):
 
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, db: Session = Depends(get_db)):
+def login(request: LoginRequest, http_request: Request, db: Session = Depends(get_db)):
     """Login and get access token"""
     user = db.query(User).filter(User.username == request.username).first()
+    ip_address = http_request.client.host if http_request.client else None
     
     if not user or not verify_password(request.password, user.password_hash):
+        audit_log.record(
+            "login_failed",
+            user_id=user.id if user else None,
+            details={"username": request.username},
+            ip_address=ip_address
+        )
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Username atau password salah"
@@ -56,6 +64,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
         data={"sub": user.username},
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
+    audit_log.record("login", user_id=user.id, entity_type="user", entity_id=user.id, ip_address=ip_address)
     
     return {
         "access_token": access_token,
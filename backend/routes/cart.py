@@ -0,0 +1,71 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import List, Optional
+
+from database import get_db
+from models import Customer
+from utils.pricing import cart_lines, price_cart, sign_quote, QUOTE_TOKEN_TTL_SECONDS
+
+router = APIRouter(prefix="/api/cart", tags=["cart"])
+
+
+class CartItemInput(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class CartQuoteRequest(BaseModel):
+    items: List[CartItemInput]
+    discount_code: Optional[str] = None
+    customer_id: Optional[int] = None
+    redeem_points: int = 0
+
+
+@router.post("/quote")
+def quote_cart(data: CartQuoteRequest, db: Session = Depends(get_db)):
+    """
+    Price a cart with the same code as checkout, from in-memory product,
+    discount and promotion snapshots. Returns a short-lived signed token
+    that POST /api/transactions accepts to skip repricing.
+    """
+    if not data.items:
+        raise HTTPException(status_code=400, detail="Keranjang kosong")
+    
+    lines, products = cart_lines((item.product_id, item.quantity) for item in data.items)
+    
+    # Points balance is the only input that needs the DB
+    if data.redeem_points:
+        if not data.customer_id:
+            raise HTTPException(status_code=400, detail="Penukaran poin membutuhkan pelanggan member")
+        points = db.query(Customer.points).filter(
+            Customer.id == data.customer_id,
+            Customer.is_active == True
+        ).scalar()
+        if points is None:
+            raise HTTPException(status_code=400, detail="Pelanggan tidak ditemukan")
+        if data.redeem_points > points:
+            raise HTTPException(status_code=400, detail=f"Poin tidak cukup (tersedia: {points})")
+    
+    priced = price_cart(lines, data.discount_code, data.redeem_points)
+    discount = priced["discount"]
+    
+    for line in priced["lines"]:
+        line["product_name"] = products[line["product_id"]].name
+    
+    return {
+        "lines": priced["lines"],
+        "subtotal": priced["subtotal"],
+        "promo_amount": priced["promo_amount"],
+        "discount_code": discount.code if discount else None,
+        "code_discount": priced["code_discount"],
+        "discount_amount": priced["discount_amount"],
+        "total": priced["total"],
+        "points_value": priced["points_value"],
+        "amount_due": priced["amount_due"],
+        "quote_token": sign_quote(
+            [(item.product_id, item.quantity) for item in data.items],
+            data.discount_code, data.redeem_points, data.customer_id, priced
+        ),
+        "expires_in": QUOTE_TOKEN_TTL_SECONDS
+    }
@@ -1,15 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, case
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+import os
 
 from database import get_db
-from models import Customer, CustomerDebt, Transaction
+from models import Customer, CustomerDebt, DebtPayment, PointLedger, PointSnapshot, Transaction
 from auth import get_current_user, get_current_admin
+from utils.scheduler import PeriodicJob
 
 router = APIRouter(prefix="/api/customers", tags=["customers"])
 
+# Snapshot interval; keeps the ledger scan in point_balance bounded to this much history
+POINT_SNAPSHOT_HOURS = float(os.getenv("POINT_SNAPSHOT_HOURS", "6"))
+
 
 # ============ SCHEMAS ============
 
@@ -29,9 +35,184 @@ class CustomerUpdate(BaseModel):
     member_level: Optional[str] = None
 
 
-class DebtPayment(BaseModel):
+class DebtCreate(BaseModel):
     amount: int
     notes: Optional[str] = None
+    due_date: Optional[str] = None
+    transaction_id: Optional[int] = None
+
+
+class DebtPaymentCreate(BaseModel):
+    amount: int
+    notes: Optional[str] = None
+
+
+# ============ DEBT BALANCE HELPERS ============
+
+def adjust_outstanding_debt(db: Session, customer_id: int, delta: int):
+    """Atomically adjust Customer.outstanding_debt inside the caller's transaction"""
+    db.query(Customer).filter(Customer.id == customer_id).update(
+        {Customer.outstanding_debt: func.coalesce(Customer.outstanding_debt, 0) + delta},
+        synchronize_session=False
+    )
+
+
+def check_debt_balances(db: Session, fix: bool = False):
+    """Compare Customer.outstanding_debt with the sum of unpaid debts; optionally repair"""
+    actual = dict(
+        db.query(
+            CustomerDebt.customer_id,
+            func.sum(CustomerDebt.amount - CustomerDebt.paid)
+        ).filter(
+            CustomerDebt.is_paid == False
+        ).group_by(CustomerDebt.customer_id).all()
+    )
+    
+    mismatches = []
+    for customer_id, stored in db.query(Customer.id, Customer.outstanding_debt).all():
+        expected = actual.get(customer_id) or 0
+        if (stored or 0) != expected:
+            mismatches.append({"customer_id": customer_id, "stored": stored or 0, "expected": expected})
+    
+    if fix and mismatches:
+        for m in mismatches:
+            db.query(Customer).filter(Customer.id == m["customer_id"]).update(
+                {Customer.outstanding_debt: m["expected"]},
+                synchronize_session=False
+            )
+        db.commit()
+    
+    return mismatches
+
+
+# ============ LOYALTY HELPERS ============
+
+POINT_VALUE = 100  # 1 poin = Rp 100 saat ditukar
+POINT_EARN_RATE = 1000  # 1 poin per Rp 1.000 yang dibayar
+SILVER_THRESHOLD = 5000000  # 5 juta
+GOLD_THRESHOLD = 10000000  # 10 juta
+
+
+def member_level_expr(total_spent):
+    """SQL expression for member level from a total_spent expression"""
+    return case(
+        (total_spent >= GOLD_THRESHOLD, "Gold"),
+        (total_spent >= SILVER_THRESHOLD, "Silver"),
+        else_="Bronze"
+    )
+
+
+def change_points(
+    db: Session,
+    customer_id: int,
+    change: int,
+    reason: str,
+    transaction_id: int = None,
+    force: bool = False
+) -> bool:
+    """
+    Atomically change Customer.points and append a ledger entry.
+    Deductions only apply when the balance covers them (unless `force`); returns False otherwise.
+    """
+    query = db.query(Customer).filter(Customer.id == customer_id)
+    if change < 0 and not force:
+        query = query.filter(Customer.points >= -change)
+    updated = query.update(
+        {Customer.points: func.coalesce(Customer.points, 0) + change},
+        synchronize_session=False
+    )
+    if not updated:
+        return False
+    db.add(PointLedger(
+        customer_id=customer_id,
+        transaction_id=transaction_id,
+        change=change,
+        reason=reason
+    ))
+    return True
+
+
+def record_sale_loyalty(db: Session, customer_id: int, amount: int, points_earned: int, transaction_id: int):
+    """Update total_spent, points and member_level for a sale (or a void with negative values)"""
+    db.query(Customer).filter(Customer.id == customer_id).update(
+        {
+            Customer.total_spent: func.coalesce(Customer.total_spent, 0) + amount,
+            Customer.member_level: member_level_expr(func.coalesce(Customer.total_spent, 0) + amount)
+        },
+        synchronize_session=False
+    )
+    if points_earned:
+        # A void takes back earned points even if some were already spent
+        change_points(
+            db, customer_id, points_earned,
+            "earn" if points_earned > 0 else "void",
+            transaction_id,
+            force=True
+        )
+
+
+def point_balance(db: Session, customer_id: int) -> int:
+    """Point balance from the latest snapshot plus ledger entries after it"""
+    snapshot = db.query(PointSnapshot).filter(
+        PointSnapshot.customer_id == customer_id
+    ).order_by(PointSnapshot.last_ledger_id.desc()).first()
+    
+    base = snapshot.balance if snapshot else 0
+    last_id = snapshot.last_ledger_id if snapshot else 0
+    delta = db.query(func.coalesce(func.sum(PointLedger.change), 0)).filter(
+        PointLedger.customer_id == customer_id,
+        PointLedger.id > last_id
+    ).scalar()
+    return base + delta
+
+
+def snapshot_points(db: Session) -> int:
+    """Write a snapshot for every customer with ledger entries since their last snapshot"""
+    latest = db.query(
+        PointSnapshot.customer_id,
+        func.max(PointSnapshot.last_ledger_id).label("last_id")
+    ).group_by(PointSnapshot.customer_id).subquery()
+    
+    balances = dict(
+        db.query(PointSnapshot.customer_id, PointSnapshot.balance).join(
+            latest,
+            (PointSnapshot.customer_id == latest.c.customer_id) &
+            (PointSnapshot.last_ledger_id == latest.c.last_id)
+        ).all()
+    )
+    
+    # Ledger entries newer than each customer's snapshot, grouped per customer
+    rows = db.query(
+        PointLedger.customer_id,
+        func.sum(PointLedger.change),
+        func.max(PointLedger.id)
+    ).outerjoin(
+        latest, latest.c.customer_id == PointLedger.customer_id
+    ).filter(
+        PointLedger.id > func.coalesce(latest.c.last_id, 0)
+    ).group_by(PointLedger.customer_id).all()
+    
+    for customer_id, change, last_ledger_id in rows:
+        db.add(PointSnapshot(
+            customer_id=customer_id,
+            balance=balances.get(customer_id, 0) + change,
+            last_ledger_id=last_ledger_id
+        ))
+    db.commit()
+    return len(rows)
+
+
+point_snapshot_job = PeriodicJob("point-snapshot", snapshot_points, POINT_SNAPSHOT_HOURS * 3600)
+
+
+def open_point_ledger(db: Session):
+    """Seed opening ledger entries for point balances that predate the ledger"""
+    customers = db.query(Customer.id, Customer.points).filter(Customer.points != 0).all()
+    db.add_all([
+        PointLedger(customer_id=customer_id, change=points, reason="opening")
+        for customer_id, points in customers
+    ])
+    db.commit()
 
 
 # ============ CUSTOMER ENDPOINTS ============
@@ -40,6 +221,7 @@ class DebtPayment(BaseModel):
 def get_customers(
     search: Optional[str] = None,
     has_debt: Optional[bool] = None,
+    sort: str = "name",  # name or debt
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -52,15 +234,17 @@ def get_customers(
             (Customer.phone.ilike(f"%{search}%"))
         )
     
-    customers = query.order_by(Customer.name).all()
-    result = [c.to_dict() for c in customers]
-    
     if has_debt is True:
-        result = [c for c in result if c["total_debt"] > 0]
+        query = query.filter(Customer.outstanding_debt > 0)
     elif has_debt is False:
-        result = [c for c in result if c["total_debt"] == 0]
+        query = query.filter(func.coalesce(Customer.outstanding_debt, 0) == 0)
     
-    return result
+    if sort == "debt":
+        query = query.order_by(Customer.outstanding_debt.desc(), Customer.name)
+    else:
+        query = query.order_by(Customer.name)
+    
+    return [c.to_dict() for c in query.all()]
 
 
 @router.get("/{customer_id}")
@@ -116,8 +300,11 @@ def update_customer(
         customer.email = data.email
     if data.address is not None:
         customer.address = data.address
-    if data.points is not None:
-        customer.points = data.points
+    if data.points is not None and data.points != (customer.points or 0):
+        if data.points < 0:
+            raise HTTPException(status_code=400, detail="Jumlah poin tidak boleh negatif")
+        if not change_points(db, customer_id, data.points - (customer.points or 0), "adjust"):
+            raise HTTPException(status_code=400, detail="Poin pelanggan berubah, muat ulang data lalu coba lagi")
     if data.member_level is not None:
         customer.member_level = data.member_level
     
@@ -143,17 +330,55 @@ def delete_customer(customer_id: int, db: Session = Depends(get_db), current_use
 @router.get("/{customer_id}/debts")
 def get_customer_debts(customer_id: int, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     """Get all debts for a customer"""
-    debts = db.query(CustomerDebt).filter(
+    debts = db.query(CustomerDebt).options(
+        joinedload(CustomerDebt.customer)
+    ).filter(
         CustomerDebt.customer_id == customer_id
     ).order_by(CustomerDebt.created_at.desc()).all()
     return [d.to_dict() for d in debts]
 
 
+@router.post("/{customer_id}/debts")
+def create_debt(
+    customer_id: int,
+    data: DebtCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Record a new customer debt"""
+    customer = db.query(Customer).filter(Customer.id == customer_id).first()
+    if not customer:
+        raise HTTPException(status_code=404, detail="Pelanggan tidak ditemukan")
+    
+    if data.amount <= 0:
+        raise HTTPException(status_code=400, detail="Jumlah hutang harus lebih dari 0")
+    
+    due_date = None
+    if data.due_date:
+        try:
+            due_date = datetime.fromisoformat(data.due_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Format tanggal tidak valid")
+    
+    debt = CustomerDebt(
+        customer_id=customer_id,
+        transaction_id=data.transaction_id,
+        amount=data.amount,
+        notes=data.notes,
+        due_date=due_date
+    )
+    db.add(debt)
+    adjust_outstanding_debt(db, customer_id, data.amount)
+    db.commit()
+    db.refresh(debt)
+    return debt.to_dict()
+
+
 @router.post("/{customer_id}/debts/{debt_id}/pay")
 def pay_debt(
     customer_id: int,
     debt_id: int,
-    data: DebtPayment,
+    data: DebtPaymentCreate,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -169,23 +394,60 @@ def pay_debt(
     if debt.is_paid:
         raise HTTPException(status_code=400, detail="Hutang sudah lunas")
     
+    if data.amount <= 0:
+        raise HTTPException(status_code=400, detail="Jumlah pembayaran harus lebih dari 0")
+    
     remaining = debt.amount - debt.paid
     if data.amount > remaining:
         raise HTTPException(status_code=400, detail=f"Pembayaran melebihi sisa hutang (Rp {remaining:,})")
     
-    debt.paid += data.amount
+    # Conditional update so concurrent payments can't overpay the debt
+    updated = db.query(CustomerDebt).filter(
+        CustomerDebt.id == debt_id,
+        CustomerDebt.amount - CustomerDebt.paid >= data.amount
+    ).update(
+        {CustomerDebt.paid: CustomerDebt.paid + data.amount},
+        synchronize_session=False
+    )
+    if not updated:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Sisa hutang berubah, silakan coba lagi")
+    adjust_outstanding_debt(db, customer_id, -data.amount)
+    
+    # Record payment in the ledger
+    db.add(DebtPayment(
+        debt_id=debt_id,
+        customer_id=customer_id,
+        user_id=current_user.id,
+        amount=data.amount,
+        notes=data.notes
+    ))
+    
+    db.refresh(debt)
     if debt.paid >= debt.amount:
         debt.is_paid = True
         debt.paid_at = datetime.utcnow()
     
-    if data.notes:
-        debt.notes = (debt.notes or "") + f"\n[Bayar Rp {data.amount:,}] {data.notes}"
-    
     db.commit()
     db.refresh(debt)
     return debt.to_dict()
 
 
+@router.get("/{customer_id}/debts/{debt_id}/payments")
+def get_debt_payments(
+    customer_id: int,
+    debt_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Get payment history of a debt"""
+    payments = db.query(DebtPayment).filter(
+        DebtPayment.debt_id == debt_id,
+        DebtPayment.customer_id == customer_id
+    ).order_by(DebtPayment.created_at).all()
+    return [p.to_dict() for p in payments]
+
+
 # ============ ALL DEBTS ============
 
 @router.get("/debts/all")
@@ -195,7 +457,7 @@ def get_all_debts(
     current_user = Depends(get_current_user)
 ):
     """Get all debts across all customers"""
-    query = db.query(CustomerDebt)
+    query = db.query(CustomerDebt).options(joinedload(CustomerDebt.customer))
     if unpaid_only:
         query = query.filter(CustomerDebt.is_paid == False)
     
@@ -203,6 +465,81 @@ def get_all_debts(
     return [d.to_dict() for d in debts]
 
 
+AGING_BUCKETS = ["current", "1_30", "31_60", "61_90", "over_90"]
+
+
+@router.get("/debts/aging")
+def get_debt_aging(
+    by_customer: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Receivables aging by due_date (current, 1-30, 31-60, 61-90, 90+ days overdue)"""
+    now = datetime.utcnow()
+    bucket = case(
+        (CustomerDebt.due_date.is_(None), "current"),
+        (CustomerDebt.due_date >= now, "current"),
+        (CustomerDebt.due_date >= now - timedelta(days=30), "1_30"),
+        (CustomerDebt.due_date >= now - timedelta(days=60), "31_60"),
+        (CustomerDebt.due_date >= now - timedelta(days=90), "61_90"),
+        else_="over_90"
+    ).label("bucket")
+    
+    columns = [bucket, func.count(CustomerDebt.id), func.sum(CustomerDebt.amount - CustomerDebt.paid)]
+    group_by = [bucket]
+    if by_customer:
+        columns = [CustomerDebt.customer_id, Customer.name] + columns
+        group_by = [CustomerDebt.customer_id, Customer.name, bucket]
+    
+    query = db.query(*columns).filter(CustomerDebt.is_paid == False)
+    if by_customer:
+        query = query.join(Customer, Customer.id == CustomerDebt.customer_id)
+    rows = query.group_by(*group_by).all()
+    
+    def empty():
+        return {name: {"count": 0, "amount": 0} for name in AGING_BUCKETS}
+    
+    totals = empty()
+    customers = {}
+    for row in rows:
+        name, count, amount = row[-3], row[-2], row[-1] or 0
+        totals[name]["count"] += count
+        totals[name]["amount"] += amount
+        if by_customer:
+            entry = customers.setdefault(row[0], {
+                "customer_id": row[0],
+                "customer_name": row[1],
+                "buckets": empty(),
+                "total": 0
+            })
+            entry["buckets"][name] = {"count": count, "amount": amount}
+            entry["total"] += amount
+    
+    result = {
+        "as_of": now.isoformat(),
+        "buckets": totals,
+        "total": sum(b["amount"] for b in totals.values())
+    }
+    if by_customer:
+        result["customers"] = sorted(customers.values(), key=lambda c: c["total"], reverse=True)
+    return result
+
+
+@router.get("/debts/consistency")
+def check_debt_consistency(
+    fix: bool = False,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin)
+):
+    """Check outstanding_debt balances against unpaid debts (admin only)"""
+    mismatches = check_debt_balances(db, fix=fix)
+    return {
+        "consistent": not mismatches,
+        "fixed": fix and bool(mismatches),
+        "mismatches": mismatches
+    }
+
+
 # ============ MEMBERSHIP POINTS ============
 
 @router.post("/{customer_id}/points/add")
@@ -217,16 +554,10 @@ def add_points(
     if not customer:
         raise HTTPException(status_code=404, detail="Pelanggan tidak ditemukan")
     
-    customer.points += points
-    
-    # Update member level based on total spent
-    if customer.total_spent >= 10000000:  # 10 juta
-        customer.member_level = "Gold"
-    elif customer.total_spent >= 5000000:  # 5 juta
-        customer.member_level = "Silver"
-    else:
-        customer.member_level = "Bronze"
+    if points <= 0:
+        raise HTTPException(status_code=400, detail="Jumlah poin harus lebih dari 0")
     
+    change_points(db, customer_id, points, "adjust")
     db.commit()
     db.refresh(customer)
     return customer.to_dict()
@@ -244,17 +575,46 @@ def redeem_points(
     if not customer:
         raise HTTPException(status_code=404, detail="Pelanggan tidak ditemukan")
     
-    if points > customer.points:
+    if points <= 0:
+        raise HTTPException(status_code=400, detail="Jumlah poin harus lebih dari 0")
+    
+    if not change_points(db, customer_id, -points, "redeem"):
         raise HTTPException(status_code=400, detail=f"Poin tidak cukup (tersedia: {customer.points})")
     
-    customer.points -= points
     db.commit()
     db.refresh(customer)
     
     # 1 point = Rp 100 discount
-    discount_value = points * 100
+    discount_value = points * POINT_VALUE
     return {
         "message": f"Berhasil tukar {points} poin",
         "discount_value": discount_value,
         "remaining_points": customer.points
     }
+
+
+@router.get("/{customer_id}/points/history")
+def get_point_history(
+    customer_id: int,
+    limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Get point ledger of a customer with the snapshot-derived balance"""
+    entries = db.query(PointLedger).filter(
+        PointLedger.customer_id == customer_id
+    ).order_by(PointLedger.id.desc()).limit(limit).all()
+    return {
+        "balance": point_balance(db, customer_id),
+        "entries": [e.to_dict() for e in entries]
+    }
+
+
+@router.post("/points/snapshot")
+def create_point_snapshots(
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin)
+):
+    """Snapshot point balances of customers with new ledger entries (admin only)"""
+    count = snapshot_points(db)
+    return {"message": f"Snapshot poin dibuat untuk {count} pelanggan", "count": count}
@@ -7,6 +7,7 @@ from datetime import datetime
 from database import get_db
 from models import Discount
 from auth import get_current_admin, User
+from utils.discount_registry import discount_registry, LOOKUP_ERRORS
 
 router = APIRouter(prefix="/api/discounts", tags=["discounts"])
 
@@ -61,25 +62,15 @@ def get_discount(discount_id: int, db: Session = Depends(get_db)):
 @router.get("/validate/{code}")
 def validate_discount_code(
     code: str, 
-    subtotal: int = 0,
-    db: Session = Depends(get_db)
+    subtotal: int = 0
 ):
-    """Validate a promo code and return discount info"""
-    discount = db.query(Discount).filter(
-        Discount.code == code.upper(),
-        Discount.is_active == True
-    ).first()
-    
-    if not discount:
-        raise HTTPException(status_code=404, detail="Kode promo tidak valid")
-    
-    # Check validity
-    now = datetime.utcnow()
-    if discount.valid_until and discount.valid_until < now:
-        raise HTTPException(status_code=400, detail="Kode promo sudah kadaluarsa")
+    """Validate a promo code and return discount info (served from the in-memory registry)"""
+    discount, error = discount_registry.lookup(code)
     
-    if discount.usage_limit and discount.usage_count >= discount.usage_limit:
-        raise HTTPException(status_code=400, detail="Kode promo sudah habis")
+    if error == "not_found":
+        raise HTTPException(status_code=404, detail=LOOKUP_ERRORS[error])
+    if error:
+        raise HTTPException(status_code=400, detail=LOOKUP_ERRORS[error])
     
     if subtotal < discount.min_purchase:
         raise HTTPException(
@@ -137,6 +128,7 @@ def create_discount(
     db.add(discount)
     db.commit()
     db.refresh(discount)
+    discount_registry.load()
     
     return discount.to_dict()
 
@@ -184,6 +176,7 @@ def update_discount(
     
     db.commit()
     db.refresh(discount)
+    discount_registry.load()
     
     return discount.to_dict()
 
@@ -201,5 +194,6 @@ def delete_discount(
     
     db.delete(discount)
     db.commit()
+    discount_registry.load()
     
     return {"message": "Diskon berhasil dihapus"}
@@ -13,8 +13,9 @@ from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 
 from database import get_db
-from models import Product, Transaction, User
+from models import Product, User
 from auth import get_current_admin
+from utils.partitions import load_transactions
 
 router = APIRouter(prefix="/api/export/excel", tags=["excel-export"])
 
@@ -104,13 +105,11 @@ async def export_transactions_excel(
     """Export transaksi ke Excel dengan analitik lengkap"""
     
     # Query data
-    query = db.query(Transaction)
-    if start_date:
-        query = query.filter(Transaction.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Transaction.created_at <= datetime.fromisoformat(end_date))
-    
-    transactions = query.order_by(Transaction.created_at.desc()).all()
+    transactions = load_transactions(
+        db,
+        datetime.fromisoformat(start_date) if start_date else None,
+        datetime.fromisoformat(end_date) if end_date else None
+    )
     
     # Create workbook
     wb = Workbook()
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Response
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
@@ -7,8 +7,12 @@ import csv
 import io
 
 from database import get_db
-from models import Product, Transaction, TransactionItem, ActivityLog, User
+from models import Product, User
 from auth import get_current_user, get_current_admin
+from utils.report_cache import range_bucket
+from utils.audit import audit_log
+from utils.partitions import load_transactions
+from utils.activity_archive import archive_activity_logs, list_archives, query_activity_logs
 
 router = APIRouter(prefix="/api/export", tags=["export"])
 
@@ -54,14 +58,11 @@ def export_transactions_csv(
     current_user = Depends(get_current_admin)
 ):
     """Export transactions to CSV"""
-    query = db.query(Transaction)
-    
-    if start_date:
-        query = query.filter(Transaction.created_at >= datetime.fromisoformat(start_date))
-    if end_date:
-        query = query.filter(Transaction.created_at <= datetime.fromisoformat(end_date))
-    
-    transactions = query.order_by(Transaction.created_at.desc()).all()
+    transactions = load_transactions(
+        db,
+        datetime.fromisoformat(start_date) if start_date else None,
+        datetime.fromisoformat(end_date) if end_date else None
+    )
     
     output = io.StringIO()
     writer = csv.writer(output)
@@ -143,30 +144,22 @@ def get_profit_report(
     else:
         start = now - timedelta(days=1)
     
-    transactions = db.query(Transaction).filter(
-        Transaction.created_at >= start
-    ).all()
+    # Closed days come from the per-day report cache
+    bucket = range_bucket(db, start, now)
     
-    total_revenue = sum(t.total for t in transactions)
-    total_cost = sum(t.cost_total for t in transactions)
+    total_revenue = bucket["total"]
+    total_cost = bucket["cost"]
     total_profit = total_revenue - total_cost
-    total_discount = sum(t.discount_amount for t in transactions)
+    total_discount = bucket["discount"]
     
     # By payment method
-    by_method = {}
-    for t in transactions:
-        method = t.payment_method
-        if method not in by_method:
-            by_method[method] = {"count": 0, "total": 0, "profit": 0}
-        by_method[method]["count"] += 1
-        by_method[method]["total"] += t.total
-        by_method[method]["profit"] += t.total - t.cost_total
+    by_method = bucket["payment_methods"]
     
     return {
         "period": period,
         "start_date": start.isoformat(),
         "end_date": now.isoformat(),
-        "transaction_count": len(transactions),
+        "transaction_count": bucket["count"],
         "total_revenue": total_revenue,
         "total_cost": total_cost,
         "total_profit": total_profit,
@@ -182,8 +175,8 @@ def get_profit_report(
 def get_low_stock_products(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
     """Get products with low stock"""
     products = db.query(Product).filter(
-        Product.is_active == True,
-        Product.stock <= Product.min_stock
+        Product.is_low_stock == True,
+        Product.is_active == True
     ).order_by(Product.stock).all()
     
     return [p.to_dict() for p in products]
@@ -195,20 +188,49 @@ def get_low_stock_products(db: Session = Depends(get_db), current_user = Depends
 def get_activity_log(
     user_id: Optional[int] = None,
     action: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
     limit: int = 100,
+    include_archived: bool = True,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_admin)
 ):
-    """Get activity log (admin only)"""
-    query = db.query(ActivityLog)
-    
-    if user_id:
-        query = query.filter(ActivityLog.user_id == user_id)
-    if action:
-        query = query.filter(ActivityLog.action == action)
-    
-    logs = query.order_by(ActivityLog.created_at.desc()).limit(limit).all()
-    return [log.to_dict() for log in logs]
+    """Get activity log (admin only), continuing into archives for older ranges"""
+    try:
+        from_date = datetime.fromisoformat(date_from) if date_from else None
+        to_date = datetime.fromisoformat(date_to) if date_to else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format tanggal tidak valid")
+    
+    return query_activity_logs(
+        db, user_id=user_id, action=action, date_from=from_date, date_to=to_date,
+        limit=limit, include_archived=include_archived
+    )
+
+
+@router.get("/activity-log/archives")
+def get_activity_log_archives(current_user = Depends(get_current_admin)):
+    """List monthly activity log archive files (admin only)"""
+    return list_archives()
+
+
+@router.post("/activity-log/archive")
+def run_activity_log_archive(
+    retention_days: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_admin)
+):
+    """Archive activity logs older than the retention window (admin only)"""
+    if retention_days is not None and retention_days < 0:
+        raise HTTPException(status_code=400, detail="Masa retensi tidak valid")
+    audit_log.flush()
+    return archive_activity_logs(db, retention_days)
+
+
+@router.get("/activity-log/stats")
+def get_activity_log_stats(current_user = Depends(get_current_admin)):
+    """Audit pipeline queue and flush counters (admin only)"""
+    return audit_log.stats()
 
 
 def log_activity(
@@ -220,17 +242,15 @@ def log_activity(
     details: str = None,
     ip_address: str = None
 ):
-    """Helper function to log activity"""
-    log = ActivityLog(
+    """Helper function to log activity (queued, written in batches by utils.audit)"""
+    audit_log.record(
+        action,
         user_id=user_id,
-        action=action,
         entity_type=entity_type,
         entity_id=entity_id,
         details=details,
         ip_address=ip_address
     )
-    db.add(log)
-    db.commit()
 
 
 # ============ PROFESSIONAL EXCEL EXPORT ============
@@ -245,9 +265,7 @@ def export_transactions_excel(
     
     # Get recent transactions (last 30 days)
     start_date = datetime.now() - timedelta(days=30)
-    transactions = db.query(Transaction).filter(
-        Transaction.created_at >= start_date
-    ).order_by(Transaction.created_at.desc()).all()
+    transactions = load_transactions(db, start_date)
     
     # Calculate summary data
     total_revenue = sum(t.total for t in transactions)
@@ -1,21 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
 from pydantic import BaseModel
-from typing import Optional
-import io
+from typing import List, Optional
+from datetime import datetime
 import os
-import uuid
 import shutil
 from pathlib import Path
-import barcode
-from barcode.writer import ImageWriter
 
 from database import get_db
-from models import Product, ProductBarcode
+from models import Product, ProductBarcode, StockMovement, PriceHistory, ReorderSuggestion
 from auth import get_current_user, get_current_admin, get_optional_user, User
+from utils.catalog import catalog_cache, category_facets
+from utils.autocomplete import MAX_SUGGESTIONS, autocomplete_index
+from utils.audit import audit_log
+from utils.stock_ledger import record_movements, stock_at, snapshot_stock
+from utils.low_stock import low_stock_events, refresh_low_stock
+from utils.forecast import FORECAST_METHODS, forecast_job
+from utils.basket import BASKET_MIN_COUNT, SORT_ORDERS, rebuild_basket_pairs, related_products
+from utils.stock_opname import apply_stock_count
+from utils.tabular import read_table
+from utils.product_import import ProductImporter
+from utils.price_history import PRICE_FIELDS, ROUNDING_MODES, apply_price_changes, price_at, record_prices
+from utils.gtin import canonical_gtin, gtin_owner, resolve_codes
+from utils.images import delete_image, image_variants, store_image
+from utils.barcode_render import FORMATS as BARCODE_FORMATS, SIZES as BARCODE_SIZES, barcode_cache, render_label_sheet
 
 router = APIRouter(prefix="/api/products", tags=["products"])
 
+MAX_LABELS = 2000
+MAX_LOOKUP_CODES = 500
+
 # Create uploads directory
 UPLOAD_DIR = Path(__file__).parent.parent / "uploads" / "products"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -44,9 +59,44 @@ class ProductUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class PriceRule(BaseModel):
+    category: Optional[str] = None
+    product_ids: Optional[List[int]] = None
+    field: str = "price"  # price or cost_price
+    percent: float = 0  # mis. 5 untuk +5%, -10 untuk -10%
+    amount: int = 0  # Tambahan tetap dalam Rupiah
+    round_to: int = 1  # mis. 500 untuk pembulatan ke Rp 500
+    rounding: str = "nearest"  # nearest, up, down
+
+
+class PriceItem(BaseModel):
+    product_id: int
+    price: Optional[int] = None
+    cost_price: Optional[int] = None
+
+
+class BulkPriceUpdate(BaseModel):
+    rules: List[PriceRule] = []
+    items: List[PriceItem] = []
+    notes: Optional[str] = None
+
+
+class BarcodeLookup(BaseModel):
+    codes: List[str]
+
+
+class LabelSheetRequest(BaseModel):
+    product_ids: List[int]
+    copies: int = 1
+    format: str = "pdf"  # pdf (all pages) or png (one page)
+    page: int = 1
+    show_price: bool = True
+
+
 class StockAdjust(BaseModel):
     quantity: int  # positive to add, negative to subtract
     reason: Optional[str] = None
+    movement_type: str = "adjustment"  # adjustment or receipt (barang masuk)
 
 
 @router.get("")
@@ -69,29 +119,127 @@ def get_products(
         query = query.filter(Product.category == category)
     
     if low_stock:
-        query = query.filter(Product.stock <= 5)
+        query = query.filter(Product.is_low_stock == True)
     
     products = query.order_by(Product.name).all()
     return [p.to_dict() for p in products]
 
 
+@router.get("/suggest")
+def suggest_products(
+    q: str = "",
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS),
+    current_user: User = Depends(get_current_user)
+):
+    """Search-as-you-type suggestions from the in-memory index, best sellers first"""
+    return autocomplete_index.suggest(q, limit)
+
+
+@router.get("/suggest/stats")
+def suggest_stats(current_user: User = Depends(get_current_admin)):
+    """Autocomplete index size and ranking window"""
+    return autocomplete_index.stats()
+
+
 @router.get("/categories")
 def get_categories(db: Session = Depends(get_db)):
-    """Get all unique categories"""
-    categories = db.query(Product.category).distinct().all()
+    """Get unique categories of active products"""
+    categories = db.query(Product.category).filter(
+        Product.is_active == True
+    ).distinct().order_by(Product.category).all()
     return [c[0] for c in categories if c[0]]
 
 
+@router.get("/categories/facets")
+def get_category_facets(db: Session = Depends(get_db)):
+    """Per-category product, low-stock and stock value counts (cached)"""
+    return category_facets(db)
+
+
 @router.get("/low-stock")
 def get_low_stock_products(db: Session = Depends(get_db)):
     """Get products with low stock (stock <= min_stock)"""
     products = db.query(Product).filter(
-        Product.is_active == True,
-        Product.stock <= Product.min_stock
+        Product.is_low_stock == True,
+        Product.is_active == True
     ).all()
     return [p.to_dict() for p in products]
 
 
+@router.get("/low-stock/events")
+def get_low_stock_events(
+    after: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(get_current_user)
+):
+    """Threshold crossings newer than `after` (poll with the last seq seen)"""
+    events = low_stock_events.since(after, limit)
+    last_seq = events[-1]["seq"] if events else low_stock_events.last_seq
+    return {"last_seq": last_seq, "events": events}
+
+
+@router.get("/reorder")
+def get_reorder_suggestions(
+    due_only: bool = True,
+    category: Optional[str] = None,
+    limit: int = Query(200, ge=1, le=5000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Forecast-based reorder suggestions from the last nightly run, most urgent first"""
+    query = db.query(ReorderSuggestion, Product).join(
+        Product, Product.id == ReorderSuggestion.product_id
+    ).filter(Product.is_active == True)
+    if due_only:
+        query = query.filter(ReorderSuggestion.suggested_qty > 0)
+    if category:
+        query = query.filter(Product.category == category)
+    rows = query.order_by(
+        ReorderSuggestion.days_of_cover.is_(None),
+        ReorderSuggestion.days_of_cover,
+        ReorderSuggestion.suggested_qty.desc()
+    ).limit(limit).all()
+    return [
+        {
+            **suggestion.to_dict(),
+            "name": product.name,
+            "category": product.category,
+            "current_stock": product.stock,
+            "min_stock": product.min_stock
+        }
+        for suggestion, product in rows
+    ]
+
+
+@router.post("/reorder/run")
+async def run_reorder_forecast(method: Optional[str] = None, current_user: User = Depends(get_current_admin)):
+    """Recompute demand forecasts and reorder suggestions now (admin only)"""
+    if method and method not in FORECAST_METHODS:
+        raise HTTPException(status_code=400, detail=f"Metode harus salah satu dari: {', '.join(FORECAST_METHODS)}")
+    # Vectorized but still seconds of work on a large catalog: keep it off the event loop
+    return await run_in_threadpool(forecast_job.run, method)
+
+
+@router.post("/related/rebuild")
+def rebuild_related(db: Session = Depends(get_db), current_user: User = Depends(get_current_admin)):
+    """Recount frequently-bought-together pairs from all transaction history (admin only)"""
+    return rebuild_basket_pairs(db)
+
+
+@router.get("/{product_id}/related")
+def get_related_products(
+    product_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    sort: str = "confidence",
+    min_count: int = Query(BASKET_MIN_COUNT, ge=1),
+    db: Session = Depends(get_db)
+):
+    """Products frequently bought together with this one"""
+    if sort not in SORT_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Urutan harus salah satu dari: {', '.join(SORT_ORDERS)}")
+    return related_products(db, product_id, limit, sort, min_count)
+
+
 @router.get("/{product_id}")
 def get_product(product_id: int, db: Session = Depends(get_db)):
     """Get single product by ID"""
@@ -103,29 +251,40 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
 
 @router.get("/barcode/{code}")
 def get_product_by_barcode(code: str, db: Session = Depends(get_db)):
-    """Get product by barcode - checks both main barcode and alternative barcodes"""
-    # First, check main product barcode
-    product = db.query(Product).filter(
-        Product.barcode == code,
-        Product.is_active == True
-    ).first()
-    
-    # If not found, check alternative barcodes
-    if not product:
-        alt_barcode = db.query(ProductBarcode).filter(
-            ProductBarcode.barcode == code
-        ).first()
-        if alt_barcode:
-            product = db.query(Product).filter(
-                Product.id == alt_barcode.product_id,
-                Product.is_active == True
-            ).first()
-    
+    """
+    Get product by barcode - main barcode, then alternative barcodes, then any
+    GTIN-equivalent form (UPC-A vs EAN-13, missing check digit)
+    """
+    product_id = resolve_codes(db, [code]).get(code)
+    product = db.query(Product).filter(Product.id == product_id).first() if product_id else None
     if not product:
         raise HTTPException(status_code=404, detail="Produk tidak ditemukan")
     return product.to_dict()
 
 
+@router.post("/barcode/lookup")
+def lookup_barcodes(data: BarcodeLookup, db: Session = Depends(get_db)):
+    """
+    Resolve many barcodes at once (scan bursts, held-cart restore) with one
+    query. Same rules as GET /barcode/{code}.
+    """
+    codes = list(dict.fromkeys(code for code in data.codes if code))
+    if len(codes) > MAX_LOOKUP_CODES:
+        raise HTTPException(status_code=400, detail=f"Maksimal {MAX_LOOKUP_CODES} barcode per permintaan")
+    if not codes:
+        return {"found": {}, "missing": []}
+    
+    resolved = resolve_codes(db, codes)
+    products = {
+        p.id: p.to_dict() for p in db.query(Product).filter(
+            Product.id.in_(set(resolved.values()))
+        ).options(selectinload(Product.barcodes))
+    } if resolved else {}
+    
+    found = {code: products[resolved[code]] for code in codes if code in resolved}
+    return {"found": found, "missing": [code for code in codes if code not in resolved]}
+
+
 @router.post("")
 def create_product(
     product: ProductCreate, 
@@ -141,20 +300,27 @@ def create_product(
                 status_code=400, 
                 detail="Barcode sudah digunakan"
             )
+    gtin = _check_gtin_free(db, product.barcode)
     
     db_product = Product(
         barcode=product.barcode,
+        gtin=gtin,
         name=product.name,
         price=product.price,
         cost_price=product.cost_price,
         stock=product.stock,
         min_stock=product.min_stock,
+        is_low_stock=product.stock <= product.min_stock,
         category=product.category,
         emoji=product.emoji
     )
     db.add(db_product)
+    db.flush()
+    record_movements(db, [(db_product.id, db_product.stock)], "opening", user_id=current_user.id)
+    record_prices(db, [(db_product.id, db_product.price, db_product.cost_price)], "create", user_id=current_user.id)
     db.commit()
     db.refresh(db_product)
+    catalog_cache.invalidate(db_product.id)
     return db_product.to_dict()
 
 
@@ -175,13 +341,35 @@ def update_product(
         existing = db.query(Product).filter(Product.barcode == product.barcode).first()
         if existing:
             raise HTTPException(status_code=400, detail="Barcode sudah digunakan")
+    if "barcode" in product.dict(exclude_unset=True) and product.barcode != db_product.barcode:
+        db_product.gtin = _check_gtin_free(db, product.barcode, product_id)
     
     update_data = product.dict(exclude_unset=True)
+    price_changes = {
+        key: [getattr(db_product, key), value]
+        for key, value in update_data.items()
+        if key in ("price", "cost_price") and getattr(db_product, key) != value
+    }
+    if update_data.get("stock") is not None:
+        record_movements(
+            db, [(product_id, update_data["stock"] - db_product.stock)], "adjustment",
+            user_id=current_user.id, notes="Edit produk"
+        )
     for key, value in update_data.items():
         setattr(db_product, key, value)
+    if "stock" in update_data or "min_stock" in update_data:
+        refresh_low_stock(db, [product_id])
+    if price_changes:
+        record_prices(db, [(product_id, db_product.price, db_product.cost_price)], "edit", user_id=current_user.id)
     
     db.commit()
     db.refresh(db_product)
+    catalog_cache.invalidate(product_id)
+    if price_changes:
+        audit_log.record(
+            "price_edit", user_id=current_user.id, entity_type="product",
+            entity_id=product_id, details=price_changes
+        )
     return db_product.to_dict()
 
 
@@ -193,6 +381,9 @@ def adjust_stock(
     current_user: User = Depends(get_current_admin)
 ):
     """Adjust product stock (admin only)"""
+    if adjustment.movement_type not in ("adjustment", "receipt"):
+        raise HTTPException(status_code=400, detail="Jenis pergerakan harus adjustment atau receipt")
+    
     db_product = db.query(Product).filter(Product.id == product_id).first()
     if not db_product:
         raise HTTPException(status_code=404, detail="Produk tidak ditemukan")
@@ -204,9 +395,19 @@ def adjust_stock(
             detail=f"Stok tidak cukup. Stok saat ini: {db_product.stock}"
         )
     
+    old_stock = db_product.stock
     db_product.stock = new_stock
+    record_movements(
+        db, [(product_id, adjustment.quantity)], adjustment.movement_type,
+        user_id=current_user.id, notes=adjustment.reason
+    )
+    refresh_low_stock(db, [product_id])
     db.commit()
     db.refresh(db_product)
+    audit_log.record(
+        "stock_adjust", user_id=current_user.id, entity_type="product", entity_id=product_id,
+        details={"from": old_stock, "to": new_stock, "reason": adjustment.reason}
+    )
     
     return {
         "product": db_product.to_dict(),
@@ -215,6 +416,262 @@ def adjust_stock(
     }
 
 
+@router.get("/{product_id}/stock/movements")
+def get_stock_movements(
+    product_id: int,
+    movement_type: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stock movement history for a product, newest first (cursor = last seen ID)"""
+    query = db.query(StockMovement).filter(StockMovement.product_id == product_id)
+    if movement_type:
+        query = query.filter(StockMovement.movement_type == movement_type)
+    try:
+        if date_from:
+            query = query.filter(StockMovement.created_at >= datetime.fromisoformat(date_from))
+        if date_to:
+            query = query.filter(StockMovement.created_at <= datetime.fromisoformat(date_to))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format tanggal tidak valid")
+    if cursor:
+        query = query.filter(StockMovement.id < cursor)
+    
+    movements = query.order_by(StockMovement.id.desc()).limit(limit + 1).all()
+    has_more = len(movements) > limit
+    movements = movements[:limit]
+    return {
+        "items": [m.to_dict() for m in movements],
+        "next_cursor": movements[-1].id if has_more else None
+    }
+
+
+@router.get("/{product_id}/stock/at")
+def get_stock_at(
+    product_id: int,
+    at: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Stock of a product at a point in time (ISO datetime, UTC)"""
+    try:
+        moment = datetime.fromisoformat(at)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format tanggal tidak valid")
+    if not db.query(Product.id).filter(Product.id == product_id).first():
+        raise HTTPException(status_code=404, detail="Produk tidak ditemukan")
+    return {"product_id": product_id, "at": moment.isoformat(), "stock": stock_at(db, product_id, moment)}
+
+
+@router.post("/stock/snapshot")
+def create_stock_snapshot(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Snapshot stock balances for products with new movements (admin only)"""
+    return {"snapshots": snapshot_stock(db)}
+
+
+@router.post("/import")
+async def import_products(
+    file: UploadFile = File(...),
+    update_existing: bool = True,
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Bulk import products from CSV/XLSX (admin only). Rows are matched by
+    barcode (main or extra) or, without a barcode, by exact name; matches are
+    updated, the rest inserted. Invalid rows are skipped and reported.
+    """
+    content = await file.read()
+    importer = ProductImporter(db, current_user.id, update_existing, dry_run)
+    report = await run_in_threadpool(importer.run, content, file.filename)
+    
+    if not dry_run and (report["created"] or report["updated"]):
+        catalog_cache.load()
+        audit_log.record(
+            "product_import", user_id=current_user.id, entity_type="product",
+            details={k: report[k] for k in ("rows", "created", "updated", "skipped", "error_count")}
+        )
+    return report
+
+
+@router.post("/prices/bulk")
+def bulk_update_prices(
+    data: BulkPriceUpdate,
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Bulk repricing (admin only). Rules (e.g. category Minuman +5% rounded up
+    to Rp 500) run as one UPDATE each, in order; explicit items as one
+    executemany. dry_run returns the same preview without saving.
+    """
+    if not data.rules and not data.items:
+        raise HTTPException(status_code=400, detail="Aturan harga atau daftar produk wajib diisi")
+    for rule in data.rules:
+        if not rule.category and not rule.product_ids:
+            raise HTTPException(status_code=400, detail="Setiap aturan harus punya kategori atau product_ids")
+        if rule.field not in PRICE_FIELDS:
+            raise HTTPException(status_code=400, detail="Field harus price atau cost_price")
+        if rule.rounding not in ROUNDING_MODES:
+            raise HTTPException(status_code=400, detail="Pembulatan harus nearest, up, atau down")
+        if rule.round_to < 1 or rule.percent <= -100:
+            raise HTTPException(status_code=400, detail="Aturan harga tidak valid")
+    for item in data.items:
+        if (item.price is not None and item.price < 0) or (item.cost_price is not None and item.cost_price < 0):
+            raise HTTPException(status_code=400, detail="Harga tidak boleh negatif")
+    
+    report = apply_price_changes(
+        db,
+        [rule.dict() for rule in data.rules],
+        [item.dict() for item in data.items],
+        current_user.id, data.notes, dry_run
+    )
+    if report["applied"]:
+        catalog_cache.load()
+        audit_log.record(
+            "price_edit", user_id=current_user.id, entity_type="product",
+            details={"bulk": True, "changed": report["changed"], "notes": data.notes}
+        )
+    return report
+
+
+@router.get("/{product_id}/prices")
+def get_price_history(
+    product_id: int,
+    at: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Price history for a product, newest first; with `at`, only the price in effect then"""
+    if at:
+        try:
+            moment = datetime.fromisoformat(at)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Format tanggal tidak valid")
+        entry = price_at(db, product_id, moment)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Harga pada waktu tersebut tidak ditemukan")
+        return entry.to_dict()
+    
+    history = db.query(PriceHistory).filter(PriceHistory.product_id == product_id).order_by(
+        PriceHistory.effective_at.desc(), PriceHistory.id.desc()
+    ).limit(limit).all()
+    return [h.to_dict() for h in history]
+
+
+@router.post("/labels")
+async def print_label_sheet(
+    data: LabelSheetRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    A4 barcode label sheet (3 x 8 per page) for the given products, in the
+    given order (admin only). Uncached barcodes render in a process pool.
+    """
+    if data.format not in ("pdf", "png"):
+        raise HTTPException(status_code=400, detail="Format harus pdf atau png")
+    if not data.product_ids or data.copies < 1:
+        raise HTTPException(status_code=400, detail="Daftar produk wajib diisi")
+    if len(data.product_ids) * data.copies > MAX_LABELS:
+        raise HTTPException(status_code=400, detail=f"Maksimal {MAX_LABELS} label per lembar cetak")
+    
+    products = {
+        p.id: p for p in db.query(Product.id, Product.name, Product.price, Product.barcode).filter(
+            Product.id.in_(data.product_ids)
+        )
+    }
+    missing = [pid for pid in data.product_ids if pid not in products]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Produk tidak ditemukan: {missing[:20]}")
+    
+    labels = []
+    for pid in data.product_ids:
+        product = products[pid]
+        label = {
+            "name": product.name,
+            "price": product.price if data.show_price else None,
+            "barcode": _barcode_value(product)
+        }
+        labels.extend([label] * data.copies)
+    
+    try:
+        content, pages = await run_in_threadpool(render_label_sheet, labels, data.format, data.page)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Barcode tidak dapat dibuat untuk sebagian produk")
+    media_type = "application/pdf" if data.format == "pdf" else "image/png"
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"inline; filename=label-barcode.{data.format}",
+            "X-Total-Pages": str(pages)
+        }
+    )
+
+
+@router.post("/stock/bulk")
+async def bulk_stock_opname(
+    request: Request,
+    dry_run: bool = False,
+    notes: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Bulk stock opname (admin only). Body is JSON ({"items": [...]} or a list)
+    or a multipart CSV/XLSX upload in field `file`. Each line has product_id
+    or barcode plus counted. Applies all variances in one transaction, or
+    none if any line is invalid; dry_run only returns the variance report.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or not hasattr(upload, "read"):
+            raise HTTPException(status_code=400, detail="File hasil hitung wajib diupload")
+        lines = read_table(await upload.read(), upload.filename)
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body harus JSON atau file CSV/XLSX")
+        lines = body.get("items") if isinstance(body, dict) else body
+        if not isinstance(lines, list) or not all(isinstance(line, dict) for line in lines):
+            raise HTTPException(status_code=400, detail="Format data opname tidak valid")
+    
+    if not lines:
+        raise HTTPException(status_code=400, detail="Data opname kosong")
+    
+    report = await run_in_threadpool(
+        apply_stock_count, db, lines, current_user.id, dry_run, notes or "Stock opname"
+    )
+    if report["errors"] and not dry_run:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": f"{len(report['errors'])} baris tidak valid, tidak ada stok yang diubah",
+                "errors": report["errors"][:100]
+            }
+        )
+    if report["applied"]:
+        audit_log.record(
+            "stock_opname", user_id=current_user.id, entity_type="product",
+            details={k: report[k] for k in ("lines", "products", "changed", "surplus", "shortage", "variance_value")}
+        )
+    return report
+
+
 @router.delete("/{product_id}")
 def delete_product(
     product_id: int, 
@@ -228,52 +685,86 @@ def delete_product(
     
     db_product.is_active = False
     db.commit()
+    catalog_cache.invalidate(product_id)
     return {"message": "Produk berhasil dihapus"}
 
 
+def _check_gtin_free(db: Session, barcode: Optional[str], product_id: Optional[int] = None) -> Optional[str]:
+    """Canonical GTIN for a new barcode; 400 if an equivalent barcode belongs to another product"""
+    gtin = canonical_gtin(barcode)
+    owner = gtin_owner(db, gtin)
+    if owner is not None and owner != product_id:
+        other = db.query(Product.name).filter(Product.id == owner).scalar()
+        raise HTTPException(
+            status_code=400,
+            detail=f"Barcode setara (GTIN {gtin}) sudah digunakan oleh produk: {other}"
+        )
+    return gtin
+
+
+def _barcode_value(product: Product) -> str:
+    # Use barcode or generate from product ID
+    return product.barcode or f"P{product.id:012d}"
+
+
+def _barcode_response(request: Request, value: str, size: str, fmt: str) -> Response:
+    if size not in BARCODE_SIZES:
+        raise HTTPException(status_code=400, detail="Ukuran barcode harus small, medium, atau large")
+    etag = f'"{barcode_cache.key(value, size, fmt)[0]}"'
+    # The URL is per product and its barcode can change, so clients revalidate
+    headers = {"ETag": etag, "Cache-Control": "public, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    try:
+        content, _ = barcode_cache.get(value, size, fmt)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Barcode tidak dapat dibuat dari nilai ini")
+    return Response(content=content, media_type=BARCODE_FORMATS[fmt], headers=headers)
+
+
 @router.get("/{product_id}/barcode-image")
-def get_product_barcode_image(product_id: int, db: Session = Depends(get_db)):
-    """Generate barcode image for product"""
+def get_product_barcode_image(
+    product_id: int,
+    request: Request,
+    size: str = "medium",
+    db: Session = Depends(get_db)
+):
+    """Barcode PNG for product (EAN-13/UPC-A/EAN-8 when valid, else Code128)"""
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Produk tidak ditemukan")
-    
-    # Use barcode or generate from product ID
-    barcode_value = product.barcode or f"P{product_id:012d}"
-    
-    # Generate EAN13 barcode
-    try:
-        ean = barcode.get('ean13', barcode_value, writer=ImageWriter())
-        buffer = io.BytesIO()
-        ean.write(buffer)
-        buffer.seek(0)
-        return Response(content=buffer.getvalue(), media_type="image/png")
-    except Exception:
-        # Fallback to Code128 for non-EAN barcodes
-        code128 = barcode.get('code128', barcode_value, writer=ImageWriter())
-        buffer = io.BytesIO()
-        code128.write(buffer)
-        buffer.seek(0)
-        return Response(content=buffer.getvalue(), media_type="image/png")
+    return _barcode_response(request, _barcode_value(product), size, "png")
 
 
 @router.get("/{product_id}/barcode-svg")
-def get_product_barcode_svg(product_id: int, db: Session = Depends(get_db)):
-    """Generate barcode SVG for product"""
+def get_product_barcode_svg(
+    product_id: int,
+    request: Request,
+    size: str = "medium",
+    db: Session = Depends(get_db)
+):
+    """Barcode SVG for product"""
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Produk tidak ditemukan")
-    
-    barcode_value = product.barcode or f"P{product_id:012d}"
-    
-    try:
-        code128 = barcode.get('code128', barcode_value)
-        buffer = io.BytesIO()
-        code128.write(buffer)
-        buffer.seek(0)
-        return Response(content=buffer.getvalue(), media_type="image/svg+xml")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return _barcode_response(request, _barcode_value(product), size, "svg")
+
+
+def _release_image(db: Session, product: Product):
+    """Detach the product's image and delete files no other product uses"""
+    if product.image_key:
+        shared = db.query(Product.id).filter(
+            Product.image_key == product.image_key, Product.id != product.id
+        ).first()
+        if not shared:
+            delete_image(product.image_key, UPLOAD_DIR)
+    elif product.image_url:
+        # Legacy single-file upload
+        old_path = UPLOAD_DIR / product.image_url.split('/')[-1]
+        if old_path.exists():
+            old_path.unlink()
+    product.image_key = None
+    product.image_url = None
 
 
 @router.post("/{product_id}/upload-image")
@@ -283,7 +774,7 @@ async def upload_product_image(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
-    """Upload product image (admin only)"""
+    """Upload product image (admin only); stored as thumb/grid/full variants in WebP and JPEG"""
     # Validate product exists
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
@@ -302,29 +793,24 @@ async def upload_product_image(
     if len(file_content) > 5 * 1024 * 1024:
         raise HTTPException(status_code=400, detail="Ukuran file maksimal 5MB")
     
-    # Generate unique filename
-    ext = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-    filename = f"{product_id}_{uuid.uuid4().hex[:8]}.{ext}"
-    filepath = UPLOAD_DIR / filename
-    
-    # Delete old image if exists
-    if product.image_url:
-        old_path = UPLOAD_DIR / product.image_url.split('/')[-1]
-        if old_path.exists():
-            old_path.unlink()
-    
-    # Save new image
-    with open(filepath, "wb") as f:
-        f.write(file_content)
-    
-    # Update product
-    product.image_url = f"/uploads/products/{filename}"
+    # Decode and resize in a worker thread; identical images are stored once
+    try:
+        key = await run_in_threadpool(store_image, file_content, UPLOAD_DIR)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if key != product.image_key:
+        _release_image(db, product)
+        product.image_key = key
+    # image_url stays the universally supported full-size JPEG
+    product.image_url = image_variants(key)["full"]["jpeg"]
     db.commit()
     db.refresh(product)
     
     return {
         "message": "Gambar berhasil diupload",
         "image_url": product.image_url,
+        "images": image_variants(product.image_key),
         "product": product.to_dict()
     }
 
@@ -340,19 +826,32 @@ def delete_product_image(
     if not product:
         raise HTTPException(status_code=404, detail="Produk tidak ditemukan")
     
-    if product.image_url:
-        # Delete file
-        filepath = UPLOAD_DIR / product.image_url.split('/')[-1]
-        if filepath.exists():
-            filepath.unlink()
-        
-        # Update product
-        product.image_url = None
+    if product.image_url or product.image_key:
+        _release_image(db, product)
         db.commit()
     
     return {"message": "Gambar berhasil dihapus"}
 
 
+def convert_legacy_images(db: Session) -> int:
+    """Build variants for images uploaded before the pipeline existed"""
+    converted = 0
+    for product in db.query(Product).filter(Product.image_url.isnot(None), Product.image_key.is_(None)):
+        path = UPLOAD_DIR / product.image_url.split('/')[-1]
+        if not path.exists():
+            continue
+        try:
+            key = store_image(path.read_bytes(), UPLOAD_DIR)
+        except ValueError:
+            continue
+        # The original file is left in place; only the URL moves to the variant
+        product.image_key = key
+        product.image_url = image_variants(key)["full"]["jpeg"]
+        converted += 1
+    db.commit()
+    return converted
+
+
 # ============ MULTI-BARCODE ENDPOINTS ============
 
 class BarcodeAliasCreate(BaseModel):
@@ -423,9 +922,14 @@ def add_barcode_alias(
             detail=f"Barcode sudah digunakan oleh produk: {existing_product.name if existing_product else 'Unknown'}"
         )
     
+    gtin = _check_gtin_free(db, data.barcode, product_id)
+    if gtin and gtin_owner(db, gtin) == product_id:
+        gtin = None  # Same item as a barcode this product already has
+    
     # Add new barcode alias
     new_alias = ProductBarcode(
         barcode=data.barcode,
+        gtin=gtin,
         product_id=product_id,
         description=data.description
     )
@@ -0,0 +1,193 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+
+from database import get_db
+from models import Promotion
+from auth import get_current_admin, User
+from utils.pricing import cart_lines, price_cart
+from utils.promotions import promotion_engine
+
+router = APIRouter(prefix="/api/promotions", tags=["promotions"])
+
+PROMO_TYPES = ["percentage", "fixed", "buy_x_get_y"]
+
+
+class PromotionCreate(BaseModel):
+    name: str
+    promo_type: str = "percentage"  # percentage, fixed, buy_x_get_y
+    value: int = 0
+    buy_quantity: Optional[int] = None
+    get_quantity: Optional[int] = None
+    product_id: Optional[int] = None
+    category: Optional[str] = None
+    start_hour: Optional[int] = None
+    end_hour: Optional[int] = None
+    valid_from: Optional[str] = None
+    valid_until: Optional[str] = None
+
+
+class PromotionUpdate(BaseModel):
+    name: Optional[str] = None
+    promo_type: Optional[str] = None
+    value: Optional[int] = None
+    buy_quantity: Optional[int] = None
+    get_quantity: Optional[int] = None
+    product_id: Optional[int] = None
+    category: Optional[str] = None
+    start_hour: Optional[int] = None
+    end_hour: Optional[int] = None
+    is_active: Optional[bool] = None
+    valid_from: Optional[str] = None
+    valid_until: Optional[str] = None
+
+
+class QuoteItem(BaseModel):
+    product_id: int
+    quantity: int
+
+
+class QuoteRequest(BaseModel):
+    items: List[QuoteItem]
+
+
+def _parse_date(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Format tanggal tidak valid")
+
+
+def _validate(promo: Promotion):
+    if promo.promo_type not in PROMO_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tipe promo harus salah satu dari: {', '.join(PROMO_TYPES)}"
+        )
+    if promo.promo_type == "buy_x_get_y" and not (promo.buy_quantity and promo.get_quantity):
+        raise HTTPException(status_code=400, detail="Promo beli X gratis Y membutuhkan buy_quantity dan get_quantity")
+    if (promo.start_hour is None) != (promo.end_hour is None):
+        raise HTTPException(status_code=400, detail="Jam mulai dan jam selesai promo harus diisi keduanya atau dikosongkan")
+    if promo.start_hour is not None:
+        if not 0 <= promo.start_hour <= 23:
+            raise HTTPException(status_code=400, detail="Jam mulai promo harus antara 0 dan 23")
+        if not 0 <= promo.end_hour <= 24:
+            raise HTTPException(status_code=400, detail="Jam selesai promo harus antara 0 dan 24")
+        if promo.start_hour == promo.end_hour:
+            raise HTTPException(status_code=400, detail="Jam mulai dan jam selesai promo tidak boleh sama")
+
+
+@router.get("")
+def get_promotions(
+    active_only: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Get all automatic promotions"""
+    query = db.query(Promotion)
+    
+    if active_only:
+        query = query.filter(Promotion.is_active == True)
+    
+    promotions = query.order_by(Promotion.created_at.desc()).all()
+    return [p.to_dict() for p in promotions]
+
+
+@router.post("/quote")
+def quote_cart(data: QuoteRequest):
+    """Apply the best automatic promotions to a cart (promotions-only view of POST /api/cart/quote)"""
+    lines, _ = cart_lines((item.product_id, item.quantity) for item in data.items)
+    priced = price_cart(lines)
+    return {
+        "lines": priced["lines"],
+        "subtotal": priced["subtotal"],
+        "promo_amount": priced["promo_amount"],
+        "total": priced["total"]
+    }
+
+
+@router.get("/{promotion_id}")
+def get_promotion(promotion_id: int, db: Session = Depends(get_db)):
+    """Get single promotion by ID"""
+    promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if not promotion:
+        raise HTTPException(status_code=404, detail="Promo tidak ditemukan")
+    return promotion.to_dict()
+
+
+@router.post("")
+def create_promotion(
+    data: PromotionCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Create new automatic promotion (admin only)"""
+    promotion = Promotion(
+        name=data.name,
+        promo_type=data.promo_type,
+        value=data.value,
+        buy_quantity=data.buy_quantity,
+        get_quantity=data.get_quantity,
+        product_id=data.product_id,
+        category=data.category,
+        start_hour=data.start_hour,
+        end_hour=data.end_hour,
+        valid_from=_parse_date(data.valid_from),
+        valid_until=_parse_date(data.valid_until)
+    )
+    _validate(promotion)
+    
+    db.add(promotion)
+    db.commit()
+    db.refresh(promotion)
+    promotion_engine.load()
+    
+    return promotion.to_dict()
+
+
+@router.put("/{promotion_id}")
+def update_promotion(
+    promotion_id: int,
+    data: PromotionUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Update promotion (admin only)"""
+    promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if not promotion:
+        raise HTTPException(status_code=404, detail="Promo tidak ditemukan")
+    
+    update_data = data.dict(exclude_unset=True)
+    for key in ("valid_from", "valid_until"):
+        if key in update_data:
+            update_data[key] = _parse_date(update_data[key])
+    for key, value in update_data.items():
+        setattr(promotion, key, value)
+    _validate(promotion)
+    
+    db.commit()
+    db.refresh(promotion)
+    promotion_engine.load()
+    
+    return promotion.to_dict()
+
+
+@router.delete("/{promotion_id}")
+def delete_promotion(
+    promotion_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Delete promotion (admin only)"""
+    promotion = db.query(Promotion).filter(Promotion.id == promotion_id).first()
+    if not promotion:
+        raise HTTPException(status_code=404, detail="Promo tidak ditemukan")
+    
+    db.delete(promotion)
+    db.commit()
+    promotion_engine.load()
+    
+    return {"message": "Promo berhasil dihapus"}
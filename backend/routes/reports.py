@@ -1,23 +1,91 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import func
 from datetime import datetime, timedelta
 from typing import Optional
 
 from database import get_db
-from models import Transaction, TransactionItem, Product, Discount
+from models import Transaction, Product, Discount
 from auth import get_current_admin, User
+from utils.report_cache import report_cache, day_bucket, day_range, range_bucket
+from utils.partitions import transaction_sources
 
 router = APIRouter(prefix="/api/reports", tags=["reports"])
 
 
+DAILY_SECTIONS = ["summary", "hourly", "payments", "transactions"]
+
+
+def _daily_transactions_page(db: Session, report_date, cursor: Optional[int], limit: int) -> dict:
+    """Slim, cursor-paged transaction list for a day (no nested items)"""
+    start, end = day_range(report_date)
+    rows = []
+    # Oldest partition first so IDs stay ascending for the cursor
+    for tx, item in reversed(transaction_sources(db, start, end)):
+        item_count = db.query(
+            func.coalesce(func.sum(item.quantity), 0)
+        ).filter(
+            item.transaction_id == tx.id
+        ).correlate(tx).scalar_subquery()
+        
+        query = db.query(
+            tx.id,
+            tx.created_at,
+            tx.subtotal,
+            tx.discount_amount,
+            tx.total,
+            tx.payment_method,
+            tx.is_debt,
+            User.full_name.label("user_name"),
+            item_count.label("item_count")
+        ).outerjoin(User, User.id == tx.user_id).filter(
+            tx.created_at >= start,
+            tx.created_at < end
+        )
+        if cursor:
+            query = query.filter(tx.id > cursor)
+        
+        rows.extend(query.order_by(tx.id).limit(limit + 1 - len(rows)).all())
+        if len(rows) > limit:
+            break
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "created_at": r.created_at.isoformat() if r.created_at else None,
+                "user_name": r.user_name,
+                "subtotal": r.subtotal,
+                "discount_amount": r.discount_amount,
+                "total": r.total,
+                "payment_method": r.payment_method,
+                "is_debt": r.is_debt,
+                "item_count": r.item_count
+            }
+            for r in rows
+        ],
+        "next_cursor": rows[-1].id if has_more else None
+    }
+
+
 @router.get("/daily")
 def get_daily_report(
     date: Optional[str] = None,
+    include: str = "summary,hourly,payments",
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
-    """Get daily sales report"""
+    """
+    Get daily sales report
+    
+    `include` selects sections (summary, hourly, payments, transactions).
+    Transactions are slim rows paged with `cursor` (last seen ID) and `limit`.
+    """
     # Parse date or use today
     if date:
         try:
@@ -27,58 +95,45 @@ def get_daily_report(
     else:
         report_date = datetime.utcnow().date()
     
-    # Get transactions for the day
-    start = datetime.combine(report_date, datetime.min.time())
-    end = datetime.combine(report_date, datetime.max.time())
+    sections = {s.strip() for s in include.split(",") if s.strip()}
+    unknown = sections - set(DAILY_SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Bagian laporan tidak dikenal: {', '.join(sorted(unknown))}. Pilihan: {', '.join(DAILY_SECTIONS)}"
+        )
     
-    transactions = db.query(Transaction).filter(
-        Transaction.created_at >= start,
-        Transaction.created_at <= end
-    ).all()
+    result = {"date": report_date.isoformat()}
     
-    # Calculate totals
-    total_sales = sum(t.total for t in transactions)
-    total_transactions = len(transactions)
-    total_items = sum(sum(item.quantity for item in t.items) for t in transactions)
-    total_discount = sum(t.discount_amount for t in transactions)
+    if sections & {"summary", "hourly", "payments"}:
+        bucket = day_bucket(db, report_date)
+        
+        if "summary" in sections:
+            result["summary"] = {
+                "total_sales": bucket["total"],
+                "total_transactions": bucket["count"],
+                "total_items_sold": bucket["items"],
+                "total_discount": bucket["discount"],
+                "average_transaction": bucket["total"] // bucket["count"] if bucket["count"] > 0 else 0
+            }
+        if "payments" in sections:
+            result["payment_methods"] = {
+                method: {"count": data["count"], "total": data["total"]}
+                for method, data in bucket["payment_methods"].items()
+            }
+        if "hourly" in sections:
+            result["hourly_sales"] = bucket["hourly"]
     
-    # Payment method breakdown
-    payment_breakdown = {}
-    for t in transactions:
-        method = t.payment_method
-        if method not in payment_breakdown:
-            payment_breakdown[method] = {"count": 0, "total": 0}
-        payment_breakdown[method]["count"] += 1
-        payment_breakdown[method]["total"] += t.total
-    
-    # Hourly breakdown
-    hourly_sales = {}
-    for t in transactions:
-        hour = t.created_at.hour
-        if hour not in hourly_sales:
-            hourly_sales[hour] = {"count": 0, "total": 0}
-        hourly_sales[hour]["count"] += 1
-        hourly_sales[hour]["total"] += t.total
+    if "transactions" in sections:
+        result["transactions"] = _daily_transactions_page(db, report_date, cursor, limit)
     
-    return {
-        "date": report_date.isoformat(),
-        "summary": {
-            "total_sales": total_sales,
-            "total_transactions": total_transactions,
-            "total_items_sold": total_items,
-            "total_discount": total_discount,
-            "average_transaction": total_sales // total_transactions if total_transactions > 0 else 0
-        },
-        "payment_methods": payment_breakdown,
-        "hourly_sales": hourly_sales,
-        "transactions": [t.to_dict() for t in transactions]
-    }
+    return result
 
 
 @router.get("/monthly")
 def get_monthly_report(
-    year: Optional[int] = None,
-    month: Optional[int] = None,
+    year: Optional[int] = Query(None, ge=1, le=9998),
+    month: Optional[int] = Query(None, ge=1, le=12),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin)
 ):
@@ -87,34 +142,24 @@ def get_monthly_report(
     report_year = year or now.year
     report_month = month or now.month
     
-    # Get transactions for the month
-    transactions = db.query(Transaction).filter(
-        extract('year', Transaction.created_at) == report_year,
-        extract('month', Transaction.created_at) == report_month
-    ).all()
+    # Combine per-day buckets (closed days come from cache)
+    month_start = datetime(report_year, report_month, 1)
+    month_end = datetime(report_year + report_month // 12, report_month % 12 + 1, 1)
+    bucket = range_bucket(db, month_start, min(month_end, now))
     
-    # Calculate totals
-    total_sales = sum(t.total for t in transactions)
-    total_transactions = len(transactions)
-    total_discount = sum(t.discount_amount for t in transactions)
+    total_sales = bucket["total"]
+    total_transactions = bucket["count"]
     
     # Daily breakdown
-    daily_sales = {}
-    for t in transactions:
-        day = t.created_at.day
-        if day not in daily_sales:
-            daily_sales[day] = {"count": 0, "total": 0}
-        daily_sales[day]["count"] += 1
-        daily_sales[day]["total"] += t.total
+    daily_sales = {
+        int(day[-2:]): data for day, data in sorted(bucket["daily"].items())
+    }
     
     # Payment method breakdown
-    payment_breakdown = {}
-    for t in transactions:
-        method = t.payment_method
-        if method not in payment_breakdown:
-            payment_breakdown[method] = {"count": 0, "total": 0}
-        payment_breakdown[method]["count"] += 1
-        payment_breakdown[method]["total"] += t.total
+    payment_breakdown = {
+        method: {"count": data["count"], "total": data["total"]}
+        for method, data in bucket["payment_methods"].items()
+    }
     
     return {
         "year": report_year,
@@ -122,7 +167,7 @@ def get_monthly_report(
         "summary": {
             "total_sales": total_sales,
             "total_transactions": total_transactions,
-            "total_discount": total_discount,
+            "total_discount": bucket["discount"],
             "average_daily": total_sales // 30 if total_sales > 0 else 0,
             "average_transaction": total_sales // total_transactions if total_transactions > 0 else 0
         },
@@ -143,30 +188,25 @@ def get_best_sellers(
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
     
-    # Query best sellers
-    results = db.query(
-        TransactionItem.product_id,
-        TransactionItem.product_name,
-        func.sum(TransactionItem.quantity).label('total_quantity'),
-        func.sum(TransactionItem.quantity * TransactionItem.price_at_sale).label('total_revenue')
-    ).join(Transaction).filter(
-        Transaction.created_at >= start_date
-    ).group_by(
-        TransactionItem.product_id,
-        TransactionItem.product_name
-    ).order_by(
-        func.sum(TransactionItem.quantity).desc()
-    ).limit(limit).all()
+    # Aggregate per-day buckets (closed days come from cache)
+    bucket = range_bucket(db, start_date, end_date)
+    results = sorted(bucket["products"], key=lambda p: p[2], reverse=True)[:limit]
+    
+    # Load current product info in one query
+    product_ids = [r[0] for r in results]
+    products = {
+        p.id: p for p in db.query(Product).filter(Product.id.in_(product_ids)).all()
+    } if product_ids else {}
     
     best_sellers = []
-    for r in results:
-        product = db.query(Product).filter(Product.id == r.product_id).first()
+    for product_id, product_name, total_quantity, total_revenue in results:
+        product = products.get(product_id)
         best_sellers.append({
-            "product_id": r.product_id,
-            "product_name": r.product_name,
+            "product_id": product_id,
+            "product_name": product_name,
             "emoji": product.emoji if product else "🍽️",
-            "total_quantity": r.total_quantity,
-            "total_revenue": r.total_revenue,
+            "total_quantity": total_quantity,
+            "total_revenue": total_revenue,
             "current_stock": product.stock if product else 0
         })
     
@@ -178,6 +218,12 @@ def get_best_sellers(
     }
 
 
+@router.get("/cache-stats")
+def get_report_cache_stats(current_user: User = Depends(get_current_admin)):
+    """Get report cache hit/miss metrics (admin only)"""
+    return report_cache.stats()
+
+
 @router.get("/summary")
 def get_summary(
     db: Session = Depends(get_db),
@@ -205,8 +251,8 @@ def get_summary(
     # Product stats
     total_products = db.query(Product).filter(Product.is_active == True).count()
     low_stock = db.query(Product).filter(
-        Product.is_active == True,
-        Product.stock <= 5
+        Product.is_low_stock == True,
+        Product.is_active == True
     ).count()
     
     # Active discounts
@@ -5,8 +5,17 @@ from typing import List, Optional
 from datetime import datetime
 
 from database import get_db
-from models import Transaction, TransactionItem, Product, Discount
-from auth import get_current_user, get_optional_user, User
+from models import Transaction, TransactionItem, TransactionPartition, Product, Customer
+from auth import get_current_user, get_current_admin, get_optional_user, User
+from routes.customers import POINT_VALUE, POINT_EARN_RATE, change_points, record_sale_loyalty
+from utils.report_cache import bump_data_version
+from utils.discount_registry import discount_registry, claim_usage, release_usage, LOOKUP_ERRORS
+from utils.pricing import price_cart, verify_quote
+from utils.audit import audit_log
+from utils.stock_ledger import record_movements
+from utils.low_stock import refresh_low_stock
+from utils.basket import record_basket
+from utils.partitions import archive_closed_months, find_archived_transaction, load_transactions
 
 router = APIRouter(prefix="/api/transactions", tags=["transactions"])
 
@@ -19,9 +28,12 @@ class CartItemInput(BaseModel):
 class TransactionCreate(BaseModel):
     items: List[CartItemInput]
     discount_code: Optional[str] = None
+    customer_id: Optional[int] = None
+    redeem_points: int = 0  # Poin member yang dipakai sebagai pembayaran
     payment_method: str = "cash"
     paid: int
     notes: Optional[str] = None
+    quote_token: Optional[str] = None  # Dari POST /api/cart/quote
 
 
 @router.get("")
@@ -32,34 +44,50 @@ def get_transactions(
     payment_method: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get all transactions with optional filters"""
-    query = db.query(Transaction).order_by(Transaction.created_at.desc())
-    
+    """Get all transactions with optional filters (hot and archived months)"""
+    from_date = None
     if date_from:
         try:
             from_date = datetime.fromisoformat(date_from)
-            query = query.filter(Transaction.created_at >= from_date)
         except ValueError:
             pass
     
+    to_date = None
     if date_to:
         try:
             to_date = datetime.fromisoformat(date_to)
-            query = query.filter(Transaction.created_at <= to_date)
         except ValueError:
             pass
     
-    if payment_method:
-        query = query.filter(Transaction.payment_method == payment_method)
-    
-    transactions = query.limit(limit).all()
+    transactions = load_transactions(db, from_date, to_date, payment_method, limit)
     return [t.to_dict() for t in transactions]
 
 
+@router.get("/partitions")
+def get_partitions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """List archived transaction months (admin only)"""
+    partitions = db.query(TransactionPartition).order_by(TransactionPartition.month.desc()).all()
+    return [p.to_dict() for p in partitions]
+
+
+@router.post("/partitions/archive")
+def archive_partitions(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """Move closed months outside the hot window into archive tables (admin only)"""
+    return {"archived": archive_closed_months(db)}
+
+
 @router.get("/{transaction_id}")
 def get_transaction(transaction_id: int, db: Session = Depends(get_db)):
     """Get single transaction by ID"""
     transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    if not transaction:
+        transaction = find_archived_transaction(db, transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaksi tidak ditemukan")
     return transaction.to_dict()
@@ -83,15 +111,33 @@ def create_transaction(
             detail=f"Metode pembayaran harus salah satu dari: {', '.join(valid_methods)}"
         )
     
-    # Calculate subtotal and validate products
-    subtotal = 0
+    # Validate member customer
+    customer = None
+    if data.customer_id:
+        customer = db.query(Customer).filter(
+            Customer.id == data.customer_id,
+            Customer.is_active == True
+        ).first()
+        if not customer:
+            raise HTTPException(status_code=400, detail="Pelanggan tidak ditemukan")
+    
+    if data.redeem_points < 0:
+        raise HTTPException(status_code=400, detail="Jumlah poin tidak valid")
+    if data.redeem_points and not customer:
+        raise HTTPException(status_code=400, detail="Penukaran poin membutuhkan pelanggan member")
+    
+    # Validate products (one IN query)
+    product_ids = [item.product_id for item in data.items]
+    products = {
+        p.id: p for p in db.query(Product).filter(
+            Product.id.in_(product_ids),
+            Product.is_active == True
+        ).all()
+    }
     items_data = []
     
     for item in data.items:
-        product = db.query(Product).filter(
-            Product.id == item.product_id,
-            Product.is_active == True
-        ).first()
+        product = products.get(item.product_id)
         
         if not product:
             raise HTTPException(
@@ -105,70 +151,103 @@ def create_transaction(
                 detail=f"Stok {product.name} tidak cukup. Tersedia: {product.stock}"
             )
         
-        item_subtotal = product.price * item.quantity
-        subtotal += item_subtotal
-        
         items_data.append({
             "product": product,
             "quantity": item.quantity,
             "price": product.price
         })
     
-    # Apply discount if provided
-    discount = None
-    discount_amount = 0
-    
-    if data.discount_code:
-        discount = db.query(Discount).filter(
-            Discount.code == data.discount_code.upper(),
-            Discount.is_active == True
-        ).first()
-        
-        if not discount:
-            raise HTTPException(status_code=400, detail="Kode promo tidak valid")
-        
-        # Check validity
-        now = datetime.utcnow()
-        if discount.valid_until and discount.valid_until < now:
-            raise HTTPException(status_code=400, detail="Kode promo sudah kadaluarsa")
-        
-        if discount.usage_limit and discount.usage_count >= discount.usage_limit:
-            raise HTTPException(status_code=400, detail="Kode promo sudah habis")
-        
-        if subtotal < discount.min_purchase:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Minimum pembelian Rp {discount.min_purchase:,} untuk promo ini"
-            )
-        
-        discount_amount = discount.calculate_discount(subtotal)
+    # A valid quote token for the same cart and pricing versions skips repricing
+    quote = None
+    if data.quote_token:
+        quote = verify_quote(
+            data.quote_token,
+            [(item.product_id, item.quantity) for item in data.items],
+            data.discount_code, data.redeem_points, data.customer_id
+        )
+        if quote and any(
+            quote["prices"].get(str(item_data["product"].id)) != item_data["price"]
+            for item_data in items_data
+        ):
+            quote = None
     
-    total = subtotal - discount_amount
+    discount = None
+    if quote:
+        subtotal = sum(item_data["price"] * item_data["quantity"] for item_data in items_data)
+        promo_amount = quote["promo"]
+        discount_amount = quote["disc"]
+        total = quote["total"]
+        amount_due = total - data.redeem_points * POINT_VALUE
+        if data.discount_code:
+            discount, error = discount_registry.lookup(data.discount_code)
+            if error:
+                raise HTTPException(status_code=400, detail=LOOKUP_ERRORS[error])
+    else:
+        priced = price_cart(
+            [
+                {
+                    "product_id": item_data["product"].id,
+                    "category": item_data["product"].category,
+                    "price": item_data["price"],
+                    "quantity": item_data["quantity"]
+                }
+                for item_data in items_data
+            ],
+            data.discount_code,
+            data.redeem_points
+        )
+        subtotal = priced["subtotal"]
+        promo_amount = priced["promo_amount"]
+        discount = priced["discount"]
+        discount_amount = priced["discount_amount"]
+        total = priced["total"]
+        amount_due = priced["amount_due"]
     
     # Validate payment
-    if data.paid < total:
+    if data.paid < amount_due:
         raise HTTPException(
             status_code=400, 
-            detail=f"Pembayaran kurang Rp {total - data.paid:,}"
+            detail=f"Pembayaran kurang Rp {amount_due - data.paid:,}"
         )
     
-    change = data.paid - total
+    change = data.paid - amount_due
+    points_earned = amount_due // POINT_EARN_RATE if customer else 0
+    
+    # Claim discount usage first with a conditional UPDATE so a limited promo
+    # can never be over-redeemed, however many checkouts run in parallel
+    if discount and not claim_usage(db, discount.id):
+        db.rollback()
+        discount_registry.mark_exhausted(discount.code)
+        raise HTTPException(status_code=400, detail=LOOKUP_ERRORS["exhausted"])
     
     # Create transaction
     transaction = Transaction(
         user_id=current_user.id if current_user else None,
+        customer_id=customer.id if customer else None,
         discount_id=discount.id if discount else None,
         subtotal=subtotal,
         discount_amount=discount_amount,
+        promo_amount=promo_amount,
         total=total,
         paid=data.paid,
         change=change,
         payment_method=data.payment_method,
+        points_redeemed=data.redeem_points,
+        points_earned=points_earned,
         notes=data.notes
     )
     db.add(transaction)
     db.flush()  # Get transaction ID
     
+    # Loyalty: atomic point redemption, then spend/points/level in the same DB transaction
+    if customer:
+        if data.redeem_points and not change_points(
+            db, customer.id, -data.redeem_points, "redeem", transaction.id
+        ):
+            db.rollback()
+            raise HTTPException(status_code=400, detail="Poin pelanggan tidak cukup")
+        record_sale_loyalty(db, customer.id, total, points_earned, transaction.id)
+    
     # Create transaction items and update stock
     for item_data in items_data:
         product = item_data["product"]
@@ -183,15 +262,45 @@ def create_transaction(
         )
         db.add(trans_item)
         
-        # Reduce stock
-        product.stock -= item_data["quantity"]
+        # Reduce stock atomically so parallel checkouts can't oversell
+        reduced = db.query(Product).filter(
+            Product.id == product.id,
+            Product.stock >= item_data["quantity"]
+        ).update(
+            {Product.stock: Product.stock - item_data["quantity"]},
+            synchronize_session=False
+        )
+        if not reduced:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Stok {product.name} tidak cukup")
     
-    # Update discount usage
-    if discount:
-        discount.usage_count += 1
+    record_movements(
+        db,
+        [(item_data["product"].id, -item_data["quantity"]) for item_data in items_data],
+        "sale",
+        transaction_id=transaction.id,
+        user_id=current_user.id if current_user else None
+    )
+    refresh_low_stock(db, [item_data["product"].id for item_data in items_data])
+    record_basket(db, [item_data["product"].id for item_data in items_data])
     
     db.commit()
     db.refresh(transaction)
+    bump_data_version(transaction.created_at)
+    if discount:
+        discount_registry.note_usage(discount.code, 1)
+    audit_log.record(
+        "sale",
+        user_id=current_user.id if current_user else None,
+        entity_type="transaction",
+        entity_id=transaction.id,
+        details={
+            "total": transaction.total,
+            "payment_method": transaction.payment_method,
+            "items": len(items_data),
+            "customer_id": transaction.customer_id
+        }
+    )
     
     return transaction.to_dict()
 
@@ -211,20 +320,55 @@ def void_transaction(
     
     transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
     if not transaction:
+        if find_archived_transaction(db, transaction_id):
+            raise HTTPException(status_code=400, detail="Transaksi sudah diarsipkan dan tidak bisa dibatalkan")
         raise HTTPException(status_code=404, detail="Transaksi tidak ditemukan")
     
     # Restore stock
     for item in transaction.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        if product:
-            product.stock += item.quantity
+        db.query(Product).filter(Product.id == item.product_id).update(
+            {Product.stock: Product.stock + item.quantity},
+            synchronize_session=False
+        )
+    record_movements(
+        db,
+        [(item.product_id, item.quantity) for item in transaction.items if item.product_id],
+        "void",
+        transaction_id=transaction.id,
+        user_id=current_user.id
+    )
+    refresh_low_stock(db, [item.product_id for item in transaction.items if item.product_id])
+    record_basket(db, [item.product_id for item in transaction.items], sign=-1)
     
     # Restore discount usage
-    if transaction.discount:
-        transaction.discount.usage_count -= 1
+    discount_code = transaction.discount.code if transaction.discount else None
+    if transaction.discount_id:
+        release_usage(db, transaction.discount_id)
+    
+    # Reverse loyalty accounting
+    if transaction.customer_id:
+        record_sale_loyalty(
+            db, transaction.customer_id, -transaction.total,
+            -(transaction.points_earned or 0), transaction.id
+        )
+        if transaction.points_redeemed:
+            change_points(db, transaction.customer_id, transaction.points_redeemed, "void", transaction.id)
     
     # Delete transaction
+    created_at = transaction.created_at
+    voided = {
+        "total": transaction.total,
+        "created_at": created_at,
+        "items": [[item.product_id, item.quantity] for item in transaction.items]
+    }
     db.delete(transaction)
     db.commit()
+    bump_data_version(created_at)
+    if discount_code:
+        discount_registry.note_usage(discount_code, -1)
+    audit_log.record(
+        "void", user_id=current_user.id, entity_type="transaction",
+        entity_id=transaction_id, details=voided
+    )
     
     return {"message": "Transaksi berhasil dibatalkan"}
@@ -0,0 +1,167 @@
+"""
+Retensi dan arsip ActivityLog.
+
+Log yang lebih tua dari ACTIVITY_RETENTION_DAYS dipindahkan ke file arsip
+bulanan NDJSON terkompresi (activity-YYYY-MM.ndjson.gz) lalu dihapus dari
+tabel, sehingga tabel hanya berisi jendela online yang terindeks. Setiap
+proses arsip menambahkan satu member gzip ke file bulan tersebut; pembaca
+membuang duplikat berdasarkan (id, created_at) jika proses sebelumnya
+terhenti di antara tulis file dan hapus baris. Tabel memakai AUTOINCREMENT
+dan urutan ID dinaikkan di atas ID yang diarsip, jadi ID tidak dipakai ulang
+meskipun tabel kosong; created_at ikut menjadi kunci untuk arsip lama yang
+dibuat sebelum itu.
+
+query_activity_logs() membaca DB terlebih dahulu lalu melanjutkan ke arsip
+(bulan terbaru lebih dulu) untuk rentang yang lebih lama.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Optional
+import gzip
+import json
+import os
+
+from sqlalchemy.orm import Session, joinedload
+
+from database import reserve_ids
+from models import ActivityLog
+
+ARCHIVE_DIR = Path(os.getenv(
+    "ACTIVITY_ARCHIVE_DIR",
+    Path(__file__).resolve().parent.parent / "archives" / "activity_logs"
+))
+ACTIVITY_RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "90"))
+ARCHIVE_CHUNK_SIZE = 5000
+
+
+def _archive_path(month: str) -> Path:
+    return ARCHIVE_DIR / f"activity-{month}.ndjson.gz"
+
+
+def _record(log: ActivityLog) -> dict:
+    # Same shape as ActivityLog.to_dict so archived and online rows look alike
+    return log.to_dict()
+
+
+def _key(record: dict) -> tuple:
+    # Archives written before AUTOINCREMENT can share an id with a newer row
+    return record["id"], record["created_at"]
+
+
+def archive_activity_logs(db: Session, retention_days: Optional[int] = None) -> dict:
+    """Move logs older than the retention window into monthly archive files"""
+    retention_days = ACTIVITY_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=retention_days)
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+
+    archived = 0
+    months = set()
+    while True:
+        logs = db.query(ActivityLog).options(joinedload(ActivityLog.user)).filter(
+            ActivityLog.created_at < cutoff
+        ).order_by(ActivityLog.created_at, ActivityLog.id).limit(ARCHIVE_CHUNK_SIZE).all()
+        if not logs:
+            break
+
+        by_month = {}
+        for log in logs:
+            by_month.setdefault(log.created_at.strftime("%Y-%m"), []).append(_record(log))
+        for month, records in by_month.items():
+            with gzip.open(_archive_path(month), "at", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            months.add(month)
+
+        # Delete only after the archive file is written
+        ids = [log.id for log in logs]
+        reserve_ids(db.connection(), ActivityLog.__tablename__, max(ids))
+        db.query(ActivityLog).filter(ActivityLog.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        archived += len(ids)
+
+    return {
+        "archived": archived,
+        "cutoff": cutoff.isoformat(),
+        "months": sorted(months)
+    }
+
+
+def list_archives() -> List[dict]:
+    if not ARCHIVE_DIR.exists():
+        return []
+    return [
+        {
+            "month": path.name[len("activity-"):-len(".ndjson.gz")],
+            "file": path.name,
+            "size_bytes": path.stat().st_size
+        }
+        for path in sorted(ARCHIVE_DIR.glob("activity-*.ndjson.gz"))
+    ]
+
+
+def _read_archive(month: str) -> List[dict]:
+    """All records of one month, newest first, without duplicates"""
+    records = {}
+    with gzip.open(_archive_path(month), "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                records[_key(record)] = record
+    return sorted(records.values(), key=lambda r: (r["created_at"] or "", r["id"]), reverse=True)
+
+
+def query_activity_logs(
+    db: Session,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 100,
+    include_archived: bool = True
+) -> List[dict]:
+    """
+    Newest-first activity log across the online table and the archives.
+    Archives are only opened when the online window can't fill `limit`.
+    """
+    query = db.query(ActivityLog).options(joinedload(ActivityLog.user))
+    if user_id:
+        query = query.filter(ActivityLog.user_id == user_id)
+    if action:
+        query = query.filter(ActivityLog.action == action)
+    if date_from:
+        query = query.filter(ActivityLog.created_at >= date_from)
+    if date_to:
+        query = query.filter(ActivityLog.created_at <= date_to)
+    results = [log.to_dict() for log in query.order_by(ActivityLog.created_at.desc()).limit(limit).all()]
+
+    if not include_archived or len(results) >= limit:
+        return results
+
+    # Archived rows are always older than online rows, so they continue the order
+    seen = {_key(r) for r in results}
+    first_month = date_from.strftime("%Y-%m") if date_from else None
+    last_month = date_to.strftime("%Y-%m") if date_to else None
+    start = date_from.isoformat() if date_from else None
+    end = date_to.isoformat() if date_to else None
+    for archive in reversed(list_archives()):
+        month = archive["month"]
+        if last_month and month > last_month:
+            continue
+        if first_month and month < first_month:
+            break
+        for record in _read_archive(month):
+            if _key(record) in seen:
+                continue
+            if user_id and record["user_id"] != user_id:
+                continue
+            if action and record["action"] != action:
+                continue
+            if start and record["created_at"] < start:
+                continue
+            if end and record["created_at"] > end:
+                continue
+            record["archived"] = True
+            results.append(record)
+            if len(results) >= limit:
+                return results
+    return results
@@ -0,0 +1,154 @@
+"""
+Pipeline audit log asinkron untuk ActivityLog.
+
+Request hanya memasukkan event ke antrean di memori (tanpa akses DB), lalu
+thread latar belakang menulisnya sebagai bulk insert setiap AUDIT_BATCH_SIZE
+event atau setiap AUDIT_FLUSH_SECONDS, mana yang lebih dulu. Saat shutdown
+antrean dikuras sampai habis. Jika antrean penuh, event tertua dibuang dan
+dihitung di stats() supaya kasir tidak pernah menunggu audit log.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Optional
+import json
+import os
+import threading
+
+from database import SessionLocal
+from models import ActivityLog
+
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "200"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1.0"))
+
+
+class AuditLogger:
+    """Bounded in-process queue flushed to activity_logs by a background thread"""
+
+    def __init__(
+        self,
+        max_size: int = AUDIT_QUEUE_SIZE,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_seconds: float = AUDIT_FLUSH_SECONDS
+    ):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._written = 0
+        self._dropped = 0
+        self._failed = 0
+        self._batches = 0
+
+    # ---------- producer side ----------
+
+    def record(
+        self,
+        action: str,
+        user_id: Optional[int] = None,
+        entity_type: Optional[str] = None,
+        entity_id: Optional[int] = None,
+        details=None,
+        ip_address: Optional[str] = None
+    ):
+        """Queue one event; never blocks and never touches the DB"""
+        if details is not None and not isinstance(details, str):
+            details = json.dumps(details, ensure_ascii=False, default=str)
+        event = {
+            "user_id": user_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+            "ip_address": ip_address,
+            "created_at": datetime.utcnow()
+        }
+        with self._cond:
+            if len(self._queue) >= self.max_size:
+                # Overflow: keep the newest events
+                self._queue.popleft()
+                self._dropped += 1
+            self._queue.append(event)
+            if len(self._queue) >= self.batch_size or not self._running:
+                self._cond.notify()
+        if not self._running:
+            # No background writer (scripts, tests): write through
+            self.flush()
+
+    # ---------- consumer side ----------
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop the writer and drain everything still queued"""
+        with self._cond:
+            if not self._running:
+                return
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._running and len(self._queue) < self.batch_size:
+                    self._cond.wait(self.flush_seconds)
+                running = self._running
+            self.flush()
+            if not running:
+                return
+
+    def _take_batch(self) -> list:
+        with self._cond:
+            count = min(len(self._queue), self.batch_size)
+            return [self._queue.popleft() for _ in range(count)]
+
+    def flush(self):
+        """Write all queued events in bulk inserts of at most batch_size rows"""
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return
+            db = SessionLocal()
+            try:
+                db.bulk_insert_mappings(ActivityLog, batch)
+                db.commit()
+                self._written += len(batch)
+                self._batches += 1
+            except Exception as exc:
+                db.rollback()
+                self._failed += len(batch)
+                print(f"⚠️ Gagal menulis {len(batch)} audit log: {exc}")
+                return
+            finally:
+                db.close()
+
+    def stats(self) -> dict:
+        with self._cond:
+            queued = len(self._queue)
+        return {
+            "running": self._running,
+            "queued": queued,
+            "written": self._written,
+            "batches": self._batches,
+            "dropped": self._dropped,
+            "failed": self._failed,
+            "max_size": self.max_size,
+            "batch_size": self.batch_size,
+            "flush_seconds": self.flush_seconds
+        }
+
+
+audit_log = AuditLogger()
@@ -0,0 +1,239 @@
+"""
+Indeks autocomplete produk di memori untuk kotak pencarian kasir.
+
+Setiap produk aktif dipecah menjadi token (kata pada nama, kategori, dan
+barcode) yang disimpan dalam dua array paralel terurut (token dan id produk);
+pencarian prefix cukup dua bisect, dan himpunan id untuk prefix pendek yang
+sering diketik disimpan.
+Indeks berlangganan ke catalog_cache, jadi setiap penulisan produk
+hanya memperbarui token produk itu. Hasil diurutkan berdasarkan kecepatan
+penjualan (unit terjual per hari dalam VELOCITY_DAYS terakhir), yang dihitung
+ulang di background thread paling lama tiap VELOCITY_REFRESH_SECONDS.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import heapq
+import os
+import re
+import threading
+import time
+
+from sqlalchemy import func
+
+from database import SessionLocal
+from utils.catalog import ProductSnapshot, catalog_cache
+from utils.partitions import transaction_sources
+
+VELOCITY_DAYS = int(os.getenv("AUTOCOMPLETE_VELOCITY_DAYS", 14))
+VELOCITY_REFRESH_SECONDS = int(os.getenv("AUTOCOMPLETE_REFRESH_SECONDS", 600))
+MAX_SUGGESTIONS = 50
+# Prefixes matching more tokens than this keep their id set between queries
+WIDE_PREFIX = 500
+MAX_CACHED_PREFIXES = 1024
+# A set-membership test is roughly this many times cheaper than a keyed heap push
+WALK_COST_RATIO = 20
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    return _WORD.findall((text or "").lower())
+
+
+def _product_tokens(product: ProductSnapshot) -> Tuple[str, ...]:
+    tokens = set(tokenize(product.name)) | set(tokenize(product.category))
+    if product.barcode:
+        tokens.add(product.barcode.lower())
+    return tuple(sorted(tokens))
+
+
+class AutocompleteIndex:
+    """Sorted token/product_id arrays plus products in sales-velocity order"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Parallel arrays sorted by (token, product_id); slicing _pids is C speed
+        self._keys: List[str] = []
+        self._pids: List[int] = []
+        self._tokens: Dict[int, Tuple[str, ...]] = {}
+        self._products: Dict[int, ProductSnapshot] = {}
+        self._velocity: Dict[int, float] = {}
+        self._score: Dict[int, Tuple[float, str]] = {}  # (-velocity, name), smaller ranks first
+        self._ranked: List[Tuple[float, str, int]] = []  # Every product, best first
+        self._prefix_ids: Dict[str, Set[int]] = {}  # Id sets of wide prefixes, kept up to date
+        self._refreshed_at = 0.0
+        self._refreshing = False
+        self._built = False
+
+    # ---------- maintenance ----------
+
+    def _score_of(self, product: ProductSnapshot) -> Tuple[float, str]:
+        return (-self._velocity.get(product.id, 0.0), product.name.lower())
+
+    def _rerank(self):
+        self._score = {pid: self._score_of(p) for pid, p in self._products.items()}
+        self._ranked = sorted(score + (pid,) for pid, score in self._score.items())
+
+    def rebuild(self):
+        """Full rebuild from the catalog snapshot"""
+        products = {p.id: p for p in catalog_cache.all() if p.is_active}
+        tokens = {pid: _product_tokens(p) for pid, p in products.items()}
+        entries = sorted((token, pid) for pid, toks in tokens.items() for token in toks)
+        # One- and two-letter prefixes are the widest and the most typed: precompute them
+        short: Dict[str, Set[int]] = {}
+        for token, pid in entries:
+            short.setdefault(token[:1], set()).add(pid)
+            if len(token) > 1:
+                short.setdefault(token[:2], set()).add(pid)
+        prefix_ids = {prefix: ids for prefix, ids in short.items() if len(ids) > WIDE_PREFIX}
+        with self._lock:
+            self._products = products
+            self._tokens = tokens
+            self._keys = [token for token, _ in entries]
+            self._pids = [pid for _, pid in entries]
+            self._prefix_ids = prefix_ids
+            self._rerank()
+            self._built = True
+
+    def _position(self, token: str, product_id: int) -> int:
+        # Ids are ascending within a run of equal tokens
+        lo = bisect_left(self._keys, token)
+        hi = bisect_right(self._keys, token, lo)
+        return bisect_left(self._pids, product_id, lo, hi)
+
+    def _remove(self, product_id: int):
+        self._products.pop(product_id, None)
+        for token in self._tokens.pop(product_id, ()):
+            i = self._position(token, product_id)
+            if i < len(self._pids) and self._keys[i] == token and self._pids[i] == product_id:
+                del self._keys[i]
+                del self._pids[i]
+        score = self._score.pop(product_id, None)
+        if score is not None:
+            i = bisect_left(self._ranked, score + (product_id,))
+            if i < len(self._ranked) and self._ranked[i][2] == product_id:
+                del self._ranked[i]
+        for ids in self._prefix_ids.values():
+            ids.discard(product_id)
+
+    def on_catalog_change(self, product_id: Optional[int], snapshot: Optional[ProductSnapshot]):
+        """catalog_cache listener: update one product, or rebuild after a full reload"""
+        if product_id is None or not self._built:
+            self.rebuild()
+            return
+        with self._lock:
+            self._remove(product_id)
+            if snapshot is None or not snapshot.is_active:
+                return
+            tokens = _product_tokens(snapshot)
+            self._products[product_id] = snapshot
+            self._tokens[product_id] = tokens
+            for token in tokens:
+                i = self._position(token, product_id)
+                self._keys.insert(i, token)
+                self._pids.insert(i, product_id)
+            score = self._score[product_id] = self._score_of(snapshot)
+            insort(self._ranked, score + (product_id,))
+            for prefix, ids in self._prefix_ids.items():
+                if any(token.startswith(prefix) for token in tokens):
+                    ids.add(product_id)
+
+    def refresh_velocity(self):
+        """Units sold per day over the last VELOCITY_DAYS, then re-rank"""
+        since = datetime.utcnow() - timedelta(days=VELOCITY_DAYS)
+        velocity: Dict[int, float] = {}
+        db = SessionLocal()
+        try:
+            for tx, item in transaction_sources(db, since, datetime.utcnow()):
+                rows = db.query(item.product_id, func.sum(item.quantity)).join(
+                    tx, tx.id == item.transaction_id
+                ).filter(tx.created_at >= since).group_by(item.product_id)
+                for product_id, quantity in rows:
+                    velocity[product_id] = velocity.get(product_id, 0.0) + (quantity or 0) / VELOCITY_DAYS
+        finally:
+            db.close()
+        with self._lock:
+            self._velocity = velocity
+            self._rerank()
+            self._refreshed_at = time.monotonic()
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh_velocity()
+        finally:
+            self._refreshing = False
+
+    def _maybe_refresh(self):
+        # Never on the request path: a stale ranking is fine for a few seconds
+        if self._refreshing or time.monotonic() - self._refreshed_at < VELOCITY_REFRESH_SECONDS:
+            return
+        self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    # ---------- queries ----------
+
+    def _ids(self, prefix: str) -> Set[int]:
+        """Ids of products with a token starting with prefix (caller holds the lock)"""
+        ids = self._prefix_ids.get(prefix)
+        if ids is not None:
+            return ids
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        ids = set(self._pids[lo:hi])
+        # Wide prefixes (short keystrokes) repeat constantly: keep their sets
+        if hi - lo > WIDE_PREFIX and len(self._prefix_ids) < MAX_CACHED_PREFIXES:
+            self._prefix_ids[prefix] = ids
+        return ids
+
+    def suggest(self, query: str, limit: int = 10) -> List[dict]:
+        """Top `limit` active products whose tokens start with every query term"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+        if not self._built:
+            self.rebuild()
+        self._maybe_refresh()
+
+        with self._lock:
+            sets = sorted((self._ids(term) for term in set(terms)), key=len)
+            candidates = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+            # Walking all products best-first needs about limit * N / |candidates|
+            # steps; ranking the candidates costs |candidates| keyed pushes
+            if len(candidates) ** 2 * WALK_COST_RATIO > limit * len(self._ranked):
+                hits = []
+                for _, _, pid in self._ranked:
+                    if pid in candidates:
+                        hits.append(pid)
+                        if len(hits) >= limit:
+                            break
+            else:
+                hits = heapq.nsmallest(limit, candidates, key=self._score.__getitem__)
+
+            products = self._products
+            return [
+                {
+                    "id": pid,
+                    "name": products[pid].name,
+                    "barcode": products[pid].barcode,
+                    "price": products[pid].price,
+                    "category": products[pid].category,
+                    "emoji": products[pid].emoji,
+                    "velocity": round(self._velocity.get(pid, 0.0), 2)
+                }
+                for pid in hits
+            ]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "products": len(self._products),
+                "tokens": len(self._keys),
+                "cached_prefixes": len(self._prefix_ids),
+                "ranked_by_sales": len(self._velocity),
+                "velocity_days": VELOCITY_DAYS
+            }
+
+
+autocomplete_index = AutocompleteIndex()
+catalog_cache.subscribe(autocomplete_index.on_catalog_change)
@@ -0,0 +1,319 @@
+"""
+Render barcode (PNG / SVG) dengan cache dan lembar label A4.
+
+Simbologi dipilih di depan dengan memvalidasi nilai barcode: EAN-13, UPC-A
+dan EAN-8 hanya dipakai bila panjang dan check digit-nya benar, selain itu
+Code128. Hasil render disimpan di LRU memori (dibatasi total byte) dan di
+disk, dengan kunci (simbologi, nilai, ukuran, format). Kunci yang sama
+dipakai sebagai ETag, jadi request bersyarat bisa dijawab 304 tanpa render.
+
+Lembar label untuk ratusan produk merender barcode yang belum ada di cache
+lewat process pool, lalu menyusunnya menjadi halaman A4 (PDF atau PNG).
+"""
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from pathlib import Path
+
+import barcode
+from barcode.writer import ImageWriter, SVGWriter
+from PIL import Image, ImageDraw, ImageFont
+
+CACHE_DIR = Path(os.getenv(
+    "BARCODE_CACHE_DIR",
+    Path(__file__).resolve().parent.parent / "cache" / "barcodes"
+))
+CACHE_MAX_BYTES = int(os.getenv("BARCODE_CACHE_BYTES", 32 * 1024 * 1024))
+LABEL_WORKERS = int(os.getenv("LABEL_WORKERS", min(4, os.cpu_count() or 1)))
+# Below this many uncached barcodes a sheet renders in-process
+POOL_MIN_JOBS = 32
+
+FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+SIZES = {
+    "small": {"module_width": 0.2, "module_height": 8.0, "font_size": 8, "text_distance": 3.0, "quiet_zone": 2.0},
+    "medium": {"module_width": 0.2, "module_height": 15.0, "font_size": 10, "text_distance": 5.0, "quiet_zone": 6.5},
+    "large": {"module_width": 0.33, "module_height": 25.0, "font_size": 14, "text_distance": 5.0, "quiet_zone": 6.5},
+}
+
+# A4 at 200 dpi, 3 x 8 labels of 70 x 37 mm
+DPI = 200
+PAGE_SIZE = (1654, 2339)
+GRID = (3, 8)
+MARGIN = (0, 23)
+
+
+def _check_digit_ok(digits: str) -> bool:
+    """GS1 mod-10 check digit (EAN-8, UPC-A, EAN-13)"""
+    body, check = digits[:-1], int(digits[-1])
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10 == check
+
+
+def pick_symbology(value: str) -> Tuple[str, str]:
+    """(symbology, data) for python-barcode; data excludes the check digit where the library adds it"""
+    if value.isdigit() and len(value) in (8, 12, 13) and _check_digit_ok(value):
+        if len(value) == 13:
+            return "ean13", value[:12]
+        if len(value) == 12:
+            return "upca", value[:11]
+        return "ean8", value[:7]
+    return "code128", value
+
+
+def render_barcode(symbology: str, data: str, size: str = "medium", fmt: str = "png") -> bytes:
+    """Render one barcode; pure function so it can run in a worker process"""
+    writer = ImageWriter() if fmt == "png" else SVGWriter()
+    code = barcode.get(symbology, data, writer=writer)
+    buffer = io.BytesIO()
+    code.write(buffer, options=SIZES[size])
+    return buffer.getvalue()
+
+
+def render_barcodes(jobs: List[tuple]) -> List[bytes]:
+    """Worker entry point: render a chunk of (symbology, data, size, fmt) jobs"""
+    return [render_barcode(*job) for job in jobs]
+
+
+class BarcodeCache:
+    """Size-bounded in-memory LRU in front of an on-disk cache"""
+
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.renders = 0
+
+    @staticmethod
+    def key(value: str, size: str = "medium", fmt: str = "png") -> Tuple[str, tuple]:
+        """Cache key (also the ETag) and the render job for a barcode value"""
+        symbology, data = pick_symbology(value)
+        digest = hashlib.sha1(f"{symbology}\0{data}\0{size}\0{fmt}".encode()).hexdigest()
+        return digest, (symbology, data, size, fmt)
+
+    def _path(self, key: str, fmt: str) -> Path:
+        return self.directory / key[:2] / f"{key}.{fmt}"
+
+    def _remember(self, key: str, content: bytes):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return
+            self._items[key] = content
+            self._bytes += len(content)
+            while self._bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _store(self, key: str, fmt: str, content: bytes):
+        self._remember(key, content)
+        path = self._path(key, fmt)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(content)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # The disk cache is best effort
+
+    def lookup(self, key: str, fmt: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._items.get(key)
+            if content is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return content
+        path = self._path(key, fmt)
+        try:
+            content = path.read_bytes()
+        except OSError:
+            return None
+        self.disk_hits += 1
+        self._remember(key, content)
+        return content
+
+    def get(self, value: str, size: str = "medium", fmt: str = "png") -> Tuple[bytes, str]:
+        """Rendered barcode and its ETag"""
+        key, job = self.key(value, size, fmt)
+        content = self.lookup(key, fmt)
+        if content is None:
+            content = render_barcode(*job)
+            self.renders += 1
+            self._store(key, fmt, content)
+        return content, key
+
+    def get_many(self, values: List[str], size: str = "small", fmt: str = "png") -> dict:
+        """value -> rendered barcode; misses are rendered in the process pool when there are many"""
+        result, misses = {}, {}
+        for value in set(values):
+            key, job = self.key(value, size, fmt)
+            content = self.lookup(key, fmt)
+            if content is None:
+                misses[value] = (key, job)
+            else:
+                result[value] = content
+        if not misses:
+            return result
+
+        items = list(misses.items())
+        jobs = [job for _, (_, job) in items]
+        if len(jobs) < POOL_MIN_JOBS or LABEL_WORKERS < 2:
+            rendered = render_barcodes(jobs)
+        else:
+            chunk = -(-len(jobs) // (LABEL_WORKERS * 4))
+            chunks = [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]
+            rendered = _pool_map(render_barcodes, chunks)
+        self.renders += len(rendered)
+        for (value, (key, _)), content in zip(items, rendered):
+            self._store(key, fmt, content)
+            result[value] = content
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "renders": self.renders
+            }
+
+
+barcode_cache = BarcodeCache()
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _label_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the server process has background threads, fork is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=LABEL_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pool
+
+
+def _pool_map(fn, parts: List[list]) -> list:
+    """Run fn over parts in the pool and flatten; falls back to in-process if the pool dies"""
+    try:
+        return [item for result in _label_pool().map(fn, parts) for item in result]
+    except BrokenProcessPool:
+        shutdown_label_pool()
+        return [item for part in parts for item in fn(part)]
+
+
+def shutdown_label_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+# ============ LABEL SHEET ============
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:  # Pillow < 10.1
+        return ImageFont.load_default()
+
+
+def _fit_text(draw: ImageDraw.ImageDraw, text: str, font, width: int) -> str:
+    if draw.textlength(text, font=font) <= width:
+        return text
+    while text and draw.textlength(text + "…", font=font) > width:
+        text = text[:-1]
+    return text + "…"
+
+
+def _format_rupiah(amount: int) -> str:
+    return "Rp " + f"{amount:,}".replace(",", ".")
+
+
+def compose_page(labels: List[dict], barcodes: dict) -> bytes:
+    """
+    Worker entry point: draw one A4 page of labels, with barcodes given as
+    value -> PNG bytes. Returns the raw 1-bit page (small to send back).
+    """
+    columns, _ = GRID
+    cell_w = (PAGE_SIZE[0] - 2 * MARGIN[0]) // columns
+    cell_h = (PAGE_SIZE[1] - 2 * MARGIN[1]) // GRID[1]
+    padding = 16
+    inner_w = cell_w - 2 * padding
+    name_font, price_font = _font(26), _font(30)
+
+    sheet = Image.new("L", PAGE_SIZE, 255)
+    draw = ImageDraw.Draw(sheet)
+    scaled = {}
+    for index, label in enumerate(labels):
+        x = MARGIN[0] + (index % columns) * cell_w + padding
+        y = MARGIN[1] + (index // columns) * cell_h + padding
+        draw.text((x, y), _fit_text(draw, label["name"], name_font, inner_w), font=name_font, fill=0)
+        y += 34
+        if label.get("price") is not None:
+            draw.text((x, y), _format_rupiah(label["price"]), font=price_font, fill=0)
+            y += 38
+        max_h = MARGIN[1] + (index // columns + 1) * cell_h - padding - y
+        code = scaled.get((label["barcode"], max_h))
+        if code is None:
+            code = Image.open(io.BytesIO(barcodes[label["barcode"]])).convert("L")
+            factor = min(inner_w / code.width, max_h / code.height, 1.0)
+            if factor < 1.0:
+                code = code.resize((int(code.width * factor), int(code.height * factor)), Image.LANCZOS)
+            scaled[(label["barcode"], max_h)] = code
+        sheet.paste(code, (x + (inner_w - code.width) // 2, y))
+    # Hard threshold, no dithering: bars and text stay crisp on label printers
+    return sheet.point(lambda v: 255 if v > 127 else 0, "1").tobytes()
+
+
+def _compose_chunk(pages: List[tuple]) -> List[bytes]:
+    return [compose_page(labels, barcodes) for labels, barcodes in pages]
+
+
+def render_label_sheet(labels: List[dict], fmt: str = "pdf", page: int = 1) -> Tuple[bytes, int]:
+    """
+    Lay labels ({name, price, barcode}) out on A4 pages. PDF contains every
+    page; PNG returns only `page` (1-based). Returns (content, total pages).
+    """
+    per_page = GRID[0] * GRID[1]
+    total_pages = max(1, -(-len(labels) // per_page))
+    if fmt == "png":
+        page = min(max(page, 1), total_pages)
+        labels = labels[(page - 1) * per_page:page * per_page]
+
+    images = barcode_cache.get_many([label["barcode"] for label in labels], size="small")
+    jobs = []
+    for start in range(0, max(len(labels), 1), per_page):
+        chunk = labels[start:start + per_page]
+        jobs.append((chunk, {label["barcode"]: images[label["barcode"]] for label in chunk}))
+
+    if len(jobs) < 2 or LABEL_WORKERS < 2:
+        raw_pages = _compose_chunk(jobs)
+    else:
+        # Pages are independent: compose them in parallel
+        size = -(-len(jobs) // LABEL_WORKERS)
+        parts = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+        raw_pages = _pool_map(_compose_chunk, parts)
+    pages = [Image.frombytes("1", PAGE_SIZE, raw) for raw in raw_pages]
+
+    buffer = io.BytesIO()
+    if fmt == "pdf":
+        pages[0].save(buffer, "PDF", save_all=True, append_images=pages[1:], resolution=DPI)
+    else:
+        pages[0].save(buffer, "PNG", optimize=True)
+    return buffer.getvalue(), total_pages
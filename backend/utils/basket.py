@@ -0,0 +1,199 @@
+"""
+Analisis keranjang belanja: produk yang sering dibeli bersama.
+
+Tabel basket_pairs menyimpan segitiga atas matriks ko-okurensi C = X^T X
+(X = matriks transaksi x produk): satu baris per pasangan produk yang pernah
+ada di transaksi yang sama, dan diagonal (product_a == product_b) berisi
+jumlah transaksi yang memuat produk itu; sel (0, 0) menyimpan jumlah seluruh
+transaksi. Checkout dan void memperbarui
+hitungan pasangan transaksinya di transaksi DB yang sama (upsert), jadi
+tabel selalu sinkron tanpa job ulang. rebuild_basket_pairs() menghitung
+ulang seluruh matriks dari riwayat (termasuk partisi arsip) dengan NumPy,
+dipakai untuk backfill awal.
+
+Rekomendasi untuk produk X diambil dari RELATED_CANDIDATES pasangan dengan
+hitungan terbesar (dua range scan indeks, berapa pun jumlah pasangannya),
+lalu diurutkan berdasarkan confidence (P(Y | X) = C[X, Y] / C[X, X]) atau
+lift (confidence / P(Y)).
+"""
+from itertools import chain
+from typing import Dict, Iterable, List
+import os
+import time
+
+import numpy as np
+from sqlalchemy import and_, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, aliased
+
+from models import BasketPair, Product
+from utils.partitions import transaction_sources
+
+# Baskets with more distinct products than this only count toward product support
+BASKET_MAX_ITEMS = int(os.getenv("BASKET_MAX_ITEMS", "50"))
+# Pairs seen fewer times than this are noise, not affinities
+BASKET_MIN_COUNT = int(os.getenv("BASKET_MIN_COUNT", "2"))
+# Most frequent partners considered per lookup; lift ranks within these
+RELATED_CANDIDATES = 200
+SORT_ORDERS = ("confidence", "lift")
+
+
+def basket_pairs(product_ids: Iterable[int]) -> List[tuple]:
+    """Upper-triangle (a <= b) cells of the co-occurrence matrix touched by one basket"""
+    ids = sorted(set(pid for pid in product_ids if pid))
+    if not ids:
+        return []
+    cells = [(0, 0)] + [(pid, pid) for pid in ids]
+    if len(ids) <= BASKET_MAX_ITEMS:
+        cells += [(a, b) for i, a in enumerate(ids) for b in ids[i + 1:]]
+    return cells
+
+
+def record_basket(db: Session, product_ids: Iterable[int], sign: int = 1):
+    """
+    Add (sign=1, checkout) or remove (sign=-1, void) one basket inside the
+    caller's DB transaction. Nothing is committed here.
+    """
+    cells = basket_pairs(product_ids)
+    if not cells:
+        return
+    table = BasketPair.__table__
+    statement = insert(table)
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[table.c.product_a, table.c.product_b],
+            set_={"count": table.c.count + statement.excluded.count}
+        ),
+        [{"product_a": a, "product_b": b, "count": sign} for a, b in cells]
+    )
+    if sign < 0:
+        db.execute(table.delete().where(
+            table.c.count <= 0,
+            table.c.product_a.in_({a for a, _ in cells})
+        ))
+
+
+def load_baskets(db: Session):
+    """Distinct (transaction_id, product_id) of all history as two sorted arrays"""
+    connection = db.connection()
+    transaction_ids, product_ids = [], []
+    for tx, item in transaction_sources(db):
+        rows = connection.execute(
+            select(item.transaction_id, item.product_id).where(item.product_id.isnot(None)).distinct()
+        ).all()
+        if rows:
+            array = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+            transaction_ids.append(array[:, 0])
+            product_ids.append(array[:, 1])
+    if not transaction_ids:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    transaction_ids = np.concatenate(transaction_ids)
+    product_ids = np.concatenate(product_ids)
+    order = np.lexsort((product_ids, transaction_ids))
+    return transaction_ids[order], product_ids[order]
+
+
+def co_occurrence(transaction_ids: np.ndarray, product_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Sparse upper triangle of X^T X in COO form (a, b, count), vectorized.
+    Input must be sorted by transaction, then product, without duplicates.
+    """
+    if not len(product_ids):
+        empty = np.zeros(0, dtype=np.int64)
+        return {"a": empty, "b": empty, "count": empty}
+
+    starts = np.flatnonzero(np.r_[True, transaction_ids[1:] != transaction_ids[:-1]])
+    sizes = np.diff(np.r_[starts, len(transaction_ids)])
+    pairable = np.repeat(sizes <= BASKET_MAX_ITEMS, sizes)
+
+    width = int(product_ids.max()) + 1
+    keys = [
+        np.zeros(len(starts), dtype=np.int64),  # Cell (0, 0): one per basket
+        product_ids * width + product_ids  # Diagonal: baskets per product
+    ]
+    # Pair every item with the one `offset` places later in the same basket
+    for offset in range(1, int(sizes[sizes <= BASKET_MAX_ITEMS].max(initial=1))):
+        same = (transaction_ids[offset:] == transaction_ids[:-offset]) & pairable[offset:]
+        if not same.any():
+            break
+        keys.append(product_ids[:-offset][same] * width + product_ids[offset:][same])
+    cells, counts = np.unique(np.concatenate(keys), return_counts=True)
+    return {"a": cells // width, "b": cells % width, "count": counts}
+
+
+def rebuild_basket_pairs(db: Session) -> dict:
+    """Recompute every pair count from transaction history (backfill / repair)"""
+    started = time.perf_counter()
+    transaction_ids, product_ids = load_baskets(db)
+    matrix = co_occurrence(transaction_ids, product_ids)
+    db.query(BasketPair).delete(synchronize_session=False)
+    rows = [
+        {"product_a": a, "product_b": b, "count": count}
+        for a, b, count in zip(matrix["a"].tolist(), matrix["b"].tolist(), matrix["count"].tolist())
+    ]
+    if rows:
+        db.execute(BasketPair.__table__.insert(), rows)
+    db.commit()
+    return {
+        "baskets": int(len(np.unique(transaction_ids))),
+        "products": int(np.count_nonzero((matrix["a"] == matrix["b"]) & (matrix["a"] > 0))),
+        "pairs": int(np.count_nonzero(matrix["a"] != matrix["b"])),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def _cell(db: Session, a: int, b: int) -> int:
+    return db.query(BasketPair.count).filter(BasketPair.product_a == a, BasketPair.product_b == b).scalar() or 0
+
+
+def related_products(
+    db: Session,
+    product_id: int,
+    limit: int = 10,
+    sort: str = "confidence",
+    min_count: int = BASKET_MIN_COUNT
+) -> dict:
+    """Active products most often bought together with product_id"""
+    support = _cell(db, product_id, product_id)
+    if not support or product_id <= 0:
+        return {"product_id": product_id, "baskets": 0, "related": []}
+
+    # Neighbours sit on both sides of the triangle: the top counts of each side
+    # come straight off the (product, count) indexes
+    sides = [
+        select(BasketPair.product_b.label("other"), BasketPair.count.label("together")).where(
+            BasketPair.product_a == product_id, BasketPair.product_b != product_id, BasketPair.count >= min_count
+        ).order_by(BasketPair.count.desc()).limit(RELATED_CANDIDATES).subquery(),
+        select(BasketPair.product_a.label("other"), BasketPair.count.label("together")).where(
+            BasketPair.product_b == product_id, BasketPair.product_a != product_id, BasketPair.count >= min_count
+        ).order_by(BasketPair.count.desc()).limit(RELATED_CANDIDATES).subquery()
+    ]
+    neighbours = union_all(*[select(side.c.other, side.c.together) for side in sides]).subquery()
+    diagonal = aliased(BasketPair)
+    total = _cell(db, 0, 0)
+    query = db.query(Product, neighbours.c.together, diagonal.count).join(
+        neighbours, neighbours.c.other == Product.id
+    ).join(
+        diagonal, and_(diagonal.product_a == Product.id, diagonal.product_b == Product.id)
+    ).filter(Product.is_active == True)
+    if sort == "lift":
+        query = query.order_by((neighbours.c.together * 1.0 / diagonal.count).desc(), Product.id)
+    else:
+        query = query.order_by(neighbours.c.together.desc(), Product.id)
+
+    related = []
+    for product, together, other_support in query.limit(limit):
+        confidence = together / support
+        related.append({
+            "id": product.id,
+            "name": product.name,
+            "price": product.price,
+            "category": product.category,
+            "emoji": product.emoji,
+            "stock": product.stock,
+            "together": together,
+            "confidence": round(confidence, 4),
+            "lift": round(confidence / (other_support / total), 3) if total and other_support else None
+        })
+    return {"product_id": product_id, "baskets": support, "related": related}
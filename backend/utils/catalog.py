@@ -0,0 +1,163 @@
+"""
+Snapshot katalog produk di memori untuk harga, nama, dan kategori.
+
+Stok sengaja tidak disimpan karena berubah di setiap penjualan; stok tetap
+dicek di DB saat checkout. Setiap penulisan produk memanggil invalidate()
+yang menaikkan versi katalog, sehingga hasil yang di-cache terhadap versi ini
+(quote token, facet, dll.) otomatis kadaluarsa. Facet kategori yang memuat
+stok juga memakai id StockMovement terbaru sebagai bagian dari kuncinya.
+"""
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional
+import threading
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Product, StockMovement
+
+ProductSnapshot = namedtuple(
+    "ProductSnapshot",
+    ["id", "barcode", "name", "price", "cost_price", "category", "emoji", "is_active"]
+)
+
+_COLUMNS = (
+    Product.id, Product.barcode, Product.name, Product.price,
+    Product.cost_price, Product.category, Product.emoji, Product.is_active
+)
+
+
+def _snapshot(row) -> ProductSnapshot:
+    return ProductSnapshot(
+        row.id, row.barcode, row.name, row.price,
+        row.cost_price or 0, row.category, row.emoji, bool(row.is_active)
+    )
+
+
+class CatalogCache:
+    """Snapshot produk per ID dengan nomor versi katalog"""
+
+    def __init__(self):
+        self._products: Dict[int, ProductSnapshot] = {}
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._listeners: List[Callable] = []
+        self.version = 0
+
+    def subscribe(self, listener: Callable):
+        """
+        Call listener(product_id, snapshot) after each write: snapshot is None
+        when the product is gone; product_id is None after a full reload.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, product_id: Optional[int], snapshot: Optional[ProductSnapshot]):
+        for listener in self._listeners:
+            listener(product_id, snapshot)
+
+    def load(self):
+        """(Re)load all products with a column-only query"""
+        db = SessionLocal()
+        try:
+            rows = db.query(*_COLUMNS).all()
+        finally:
+            db.close()
+        with self._lock:
+            self._products = {row.id: _snapshot(row) for row in rows}
+            self._loaded = True
+            self.version += 1
+        self._notify(None, None)
+
+    def invalidate(self, product_id: Optional[int] = None):
+        """Refresh one product (or everything) after a write and bump the version"""
+        if product_id is None or not self._loaded:
+            self.load()
+            return
+        db = SessionLocal()
+        try:
+            row = db.query(*_COLUMNS).filter(Product.id == product_id).first()
+        finally:
+            db.close()
+        with self._lock:
+            snapshot = _snapshot(row) if row is not None else None
+            if snapshot is None:
+                self._products.pop(product_id, None)
+            else:
+                self._products[product_id] = snapshot
+            self.version += 1
+        self._notify(product_id, snapshot)
+
+    def get(self, product_id: int) -> Optional[ProductSnapshot]:
+        if not self._loaded:
+            self.load()
+        return self._products.get(product_id)
+
+    def get_many(self, product_ids: Iterable[int]) -> Dict[int, ProductSnapshot]:
+        if not self._loaded:
+            self.load()
+        products = self._products
+        return {pid: products[pid] for pid in product_ids if pid in products}
+
+    def all(self):
+        if not self._loaded:
+            self.load()
+        return list(self._products.values())
+
+
+catalog_cache = CatalogCache()
+
+
+# ============ CATEGORY FACETS ============
+
+_facets_lock = threading.Lock()
+_facets: Dict[str, object] = {"key": None, "value": None}
+
+
+def _facet_key(db: Session) -> tuple:
+    # Stock changes do not touch the catalog version, but every one of them
+    # writes a ledger row, so the newest movement id covers them
+    head = db.query(func.max(StockMovement.id)).scalar() or 0
+    return (catalog_cache.version, head)
+
+
+def category_facets(db: Session) -> dict:
+    """
+    Active product count, low-stock count and stock value per category, from
+    one grouped query; cached until the catalog or any stock changes.
+    """
+    key = _facet_key(db)
+    with _facets_lock:
+        if _facets["key"] == key:
+            return _facets["value"]
+
+    low = case((Product.is_low_stock == True, 1), else_=0)
+    rows = db.query(
+        Product.category,
+        func.count(Product.id),
+        func.sum(low),
+        func.sum(Product.stock * Product.price),
+        func.sum(Product.stock * func.coalesce(Product.cost_price, 0))
+    ).filter(Product.is_active == True).group_by(Product.category).order_by(Product.category)
+
+    categories = [
+        {
+            "category": category,
+            "products": count,
+            "low_stock": low_stock or 0,
+            "stock_value": stock_value or 0,
+            "cost_value": cost_value or 0
+        }
+        for category, count, low_stock, stock_value, cost_value in rows
+        if category
+    ]
+    value = {
+        "categories": categories,
+        "total": {
+            field: sum(c[field] for c in categories)
+            for field in ("products", "low_stock", "stock_value", "cost_value")
+        }
+    }
+    with _facets_lock:
+        _facets["key"], _facets["value"] = key, value
+    return value
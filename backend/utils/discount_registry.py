@@ -0,0 +1,163 @@
+"""
+Registry diskon aktif di memori, dikunci berdasarkan kode promo.
+
+Dimuat sekali saat startup dan di-refresh setiap kali routes/discounts.py
+menulis. Kadaluarsa ditangani oleh timer wheel (slot per menit) sehingga
+validasi tidak perlu akses DB. Batas pemakaian tetap dijaga oleh counter
+atomik di DB saat commit (lihat claim_usage).
+"""
+from datetime import datetime
+from typing import Dict, Optional, Set
+import threading
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Discount
+
+WHEEL_TICK_SECONDS = 60
+EPOCH = datetime(1970, 1, 1)
+
+
+def _slot(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds() // WHEEL_TICK_SECONDS)
+
+
+class DiscountRegistry:
+    """Snapshot diskon aktif (objek Discount yang sudah di-expunge) per kode"""
+
+    def __init__(self):
+        self._by_code: Dict[str, Discount] = {}
+        self._expired: Set[str] = set()
+        self._wheel: Dict[int, Set[str]] = {}
+        self._cursor: Optional[int] = None
+        self._loaded = False
+        self._lock = threading.RLock()
+        self.version = 0
+
+    # ---------- loading ----------
+
+    def load(self):
+        """(Re)load all active discounts from the database"""
+        db = SessionLocal()
+        try:
+            discounts = db.query(Discount).filter(Discount.is_active == True).all()
+            db.expunge_all()
+        finally:
+            db.close()
+
+        now = datetime.utcnow()
+        with self._lock:
+            self._by_code = {}
+            self._expired = set()
+            self._wheel = {}
+            self._cursor = _slot(now)
+            for d in discounts:
+                self._add(d, now)
+            self._loaded = True
+            self.version += 1
+
+    def _add(self, discount: Discount, now: datetime):
+        self._by_code[discount.code] = discount
+        if discount.valid_until is None:
+            return
+        if discount.valid_until < now:
+            self._expired.add(discount.code)
+        else:
+            self._wheel.setdefault(_slot(discount.valid_until), set()).add(discount.code)
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    # ---------- timer wheel ----------
+
+    def _advance(self, now: datetime):
+        """Move codes whose expiry slot has passed into the expired set"""
+        current = _slot(now)
+        while self._cursor < current:
+            for code in self._wheel.pop(self._cursor, ()):
+                self._expire(code, now)
+            self._cursor += 1
+        # Codes expiring within the current tick
+        for code in list(self._wheel.get(current, ())):
+            self._expire(code, now)
+
+    def _expire(self, code: str, now: datetime):
+        discount = self._by_code.get(code)
+        if discount and discount.valid_until and discount.valid_until < now:
+            self._expired.add(code)
+            slot = self._wheel.get(_slot(discount.valid_until))
+            if slot:
+                slot.discard(code)
+
+    # ---------- lookups ----------
+
+    def lookup(self, code: str, now: Optional[datetime] = None):
+        """
+        Return (discount, error) for a promo code without touching the DB.
+        error is one of None, "not_found", "expired", "exhausted".
+        """
+        self.ensure_loaded()
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._advance(now)
+            discount = self._by_code.get(code.upper())
+            if discount is None:
+                return None, "not_found"
+            if discount.code in self._expired:
+                return discount, "expired"
+            if discount.usage_limit and discount.usage_count >= discount.usage_limit:
+                return discount, "exhausted"
+            return discount, None
+
+    def note_usage(self, code: str, delta: int):
+        """Mirror a committed usage_count change into the snapshot"""
+        with self._lock:
+            discount = self._by_code.get(code)
+            if discount is not None:
+                discount.usage_count = max((discount.usage_count or 0) + delta, 0)
+
+    def mark_exhausted(self, code: str):
+        """Record that the DB refused a claim, so later lookups fail fast"""
+        with self._lock:
+            discount = self._by_code.get(code)
+            if discount is not None and discount.usage_limit:
+                discount.usage_count = max(discount.usage_count or 0, discount.usage_limit)
+
+
+discount_registry = DiscountRegistry()
+
+LOOKUP_ERRORS = {
+    "not_found": "Kode promo tidak valid",
+    "expired": "Kode promo sudah kadaluarsa",
+    "exhausted": "Kode promo sudah habis"
+}
+
+
+def claim_usage(db: Session, discount_id: int) -> bool:
+    """
+    Atomically increment usage_count if the usage limit allows it.
+    Runs inside the caller's transaction; returns False when the promo is exhausted.
+    """
+    updated = db.query(Discount).filter(
+        Discount.id == discount_id,
+        (Discount.usage_limit.is_(None)) |
+        (Discount.usage_limit == 0) |
+        (Discount.usage_count < Discount.usage_limit)
+    ).update(
+        {Discount.usage_count: Discount.usage_count + 1},
+        synchronize_session=False
+    )
+    return updated == 1
+
+
+def release_usage(db: Session, discount_id: int):
+    """Atomically give back one usage (e.g. on void)"""
+    db.query(Discount).filter(
+        Discount.id == discount_id,
+        Discount.usage_count > 0
+    ).update(
+        {Discount.usage_count: Discount.usage_count - 1},
+        synchronize_session=False
+    )
@@ -0,0 +1,272 @@
+"""
+Perkiraan permintaan dan titik pemesanan ulang (reorder point) per produk.
+
+Job batch malam hari menarik penjualan harian per produk dari
+transaction_items (termasuk partisi arsip) dalam FORECAST_HISTORY_DAYS
+terakhir sebagai array NumPy jarang (produk, hari, unit), lalu menghitung
+semua SKU sekaligus dengan np.bincount tanpa matriks produk x hari:
+
+- forecast harian: exponential smoothing (ses) atau moving average (ma)
+- safety stock = z(service level) x simpangan baku harian x sqrt(lead time)
+- reorder point = forecast x lead time + safety stock (usulan min_stock)
+- jumlah pesan = order-up-to (lead time + periode review) dikurangi stok,
+  hanya jika stok sudah di bawah reorder point
+
+Hasil menggantikan isi tabel reorder_suggestions dalam satu transaksi DB.
+"""
+from datetime import datetime, timedelta
+from itertools import chain
+from statistics import NormalDist
+from typing import Optional
+import math
+import os
+import threading
+import time
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Product, ReorderSuggestion
+from utils.partitions import transaction_sources
+
+FORECAST_METHODS = ("ses", "ma")
+FORECAST_METHOD = os.getenv("FORECAST_METHOD", "ses")
+FORECAST_HISTORY_DAYS = int(os.getenv("FORECAST_HISTORY_DAYS", "730"))
+FORECAST_ALPHA = float(os.getenv("FORECAST_ALPHA", "0.1"))  # Smoothing factor for ses
+FORECAST_WINDOW_DAYS = int(os.getenv("FORECAST_WINDOW_DAYS", "28"))  # Moving-average window
+FORECAST_STD_DAYS = int(os.getenv("FORECAST_STD_DAYS", "56"))  # Window for demand variability
+REORDER_LEAD_DAYS = float(os.getenv("REORDER_LEAD_DAYS", "3"))
+REORDER_REVIEW_DAYS = float(os.getenv("REORDER_REVIEW_DAYS", "7"))
+REORDER_SERVICE_LEVEL = float(os.getenv("REORDER_SERVICE_LEVEL", "0.95"))
+# Local hour after which the nightly run starts
+FORECAST_HOUR = int(os.getenv("FORECAST_HOUR", "2"))
+FORECAST_CHECK_SECONDS = 600
+
+# Julian day number of 0001-01-01 00:00, offset between date.toordinal() and SQLite julianday()
+_JULIAN_OFFSET = 1721424.5
+
+
+def load_daily_sales(db: Session, start: datetime, days: int):
+    """
+    Units sold per (product, day) in [start, start + days) as three aligned
+    arrays: product ids, day index (0 = start) and quantity.
+    """
+    end = start + timedelta(days=days)
+    base = start.toordinal() + _JULIAN_OFFSET
+    product_ids, day_index, quantity = [], [], []
+    # Core execution on the session's connection: no ORM row processing for ~1M rows
+    connection = db.connection()
+    for tx, item in transaction_sources(db, start, end):
+        day = cast(func.julianday(tx.created_at) - base, Integer)
+        rows = connection.execute(
+            select(item.product_id, day, func.sum(item.quantity)).join(
+                tx, tx.id == item.transaction_id
+            ).where(
+                tx.created_at >= start,
+                tx.created_at < end,
+                item.product_id.isnot(None)
+            ).group_by(item.product_id, day)
+        ).all()
+        if rows:
+            # fromiter over the flattened rows; np.array() on Row objects is very slow
+            array = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+            product_ids.append(array[:, 0])
+            day_index.append(array[:, 1])
+            quantity.append(array[:, 2])
+    if not product_ids:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(product_ids), np.concatenate(day_index), np.concatenate(quantity)
+
+
+def compute_forecast(
+    positions: np.ndarray,
+    day_index: np.ndarray,
+    quantity: np.ndarray,
+    history_days: np.ndarray,
+    stock: np.ndarray,
+    days: int,
+    method: str = FORECAST_METHOD
+) -> dict:
+    """
+    Vectorized forecast for every product at once.
+
+    positions/day_index/quantity are the sparse daily sales (row position of
+    the product, day 0..days-1); history_days is how many days each product
+    has existed inside the window. Returns arrays aligned with stock.
+    """
+    count = len(stock)
+    weights = quantity.astype(np.float64)
+    history = np.clip(history_days, 1, days).astype(np.float64)
+    age = days - 1 - day_index  # 0 = yesterday
+
+    total = np.bincount(positions, weights=weights, minlength=count)
+    mean = total / history
+
+    if method == "ma":
+        recent = age < FORECAST_WINDOW_DAYS
+        window = np.minimum(history, FORECAST_WINDOW_DAYS)
+        forecast = np.bincount(positions[recent], weights=weights[recent], minlength=count) / window
+    else:
+        # Exponential smoothing unrolled: level = sum alpha(1-alpha)^age * y + (1-alpha)^history * mean
+        decay = 1.0 - FORECAST_ALPHA
+        smoothed = np.bincount(positions, weights=weights * FORECAST_ALPHA * decay ** age, minlength=count)
+        forecast = smoothed + decay ** history * mean
+
+    recent = age < FORECAST_STD_DAYS
+    n = np.minimum(history, FORECAST_STD_DAYS)
+    s1 = np.bincount(positions[recent], weights=weights[recent], minlength=count)
+    s2 = np.bincount(positions[recent], weights=weights[recent] ** 2, minlength=count)
+    variance = np.where(n > 1, (s2 - s1 * s1 / n) / np.maximum(n - 1, 1), 0.0)
+    demand_std = np.sqrt(np.maximum(variance, 0.0))
+
+    z = NormalDist().inv_cdf(REORDER_SERVICE_LEVEL)
+    safety_stock = z * demand_std * math.sqrt(REORDER_LEAD_DAYS)
+    reorder_point = forecast * REORDER_LEAD_DAYS + safety_stock
+    order_up_to = forecast * (REORDER_LEAD_DAYS + REORDER_REVIEW_DAYS) + safety_stock
+    due = (forecast > 0) & (stock <= reorder_point)
+    suggested = np.where(due, np.ceil(np.maximum(order_up_to - stock, 0)), 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cover = np.where(forecast > 0, stock / forecast, np.nan)
+
+    return {
+        "forecast_daily": forecast,
+        "demand_std": demand_std,
+        "safety_stock": np.ceil(safety_stock).astype(np.int64),
+        "reorder_point": np.ceil(reorder_point).astype(np.int64),
+        "order_up_to": np.ceil(order_up_to).astype(np.int64),
+        "suggested_qty": suggested.astype(np.int64),
+        "days_of_cover": cover
+    }
+
+
+def run_forecast(db: Session, method: Optional[str] = None, now: Optional[datetime] = None) -> dict:
+    """Recompute reorder_suggestions for every active product; returns a summary"""
+    started = time.perf_counter()
+    method = method or FORECAST_METHOD
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"Metode forecast harus salah satu dari: {', '.join(FORECAST_METHODS)}")
+    now = now or datetime.utcnow()
+    # Whole days only: today is still selling
+    end = datetime.combine(now.date(), datetime.min.time())
+    days = FORECAST_HISTORY_DAYS
+    start = end - timedelta(days=days)
+
+    products = db.query(Product.id, Product.stock, Product.created_at).filter(
+        Product.is_active == True
+    ).order_by(Product.id).all()
+    ids = np.array([p.id for p in products], dtype=np.int64)
+    stock = np.array([p.stock or 0 for p in products], dtype=np.float64)
+    created = np.array([
+        (p.created_at.date().toordinal() if p.created_at else 0) for p in products
+    ], dtype=np.int64)
+    history_days = end.toordinal() - np.maximum(created, start.toordinal())
+
+    product_ids, day_index, quantity = load_daily_sales(db, start, days)
+    # Map product ids to row positions; sales of inactive products are dropped
+    positions = np.minimum(np.searchsorted(ids, product_ids), max(len(ids) - 1, 0))
+    known = ids[positions] == product_ids if len(ids) else np.zeros(len(product_ids), dtype=bool)
+    result = compute_forecast(positions[known], day_index[known], quantity[known], history_days, stock, days, method)
+
+    computed_at = datetime.utcnow()
+    forecast = result["forecast_daily"]
+    cover = np.where(np.isnan(result["days_of_cover"]), None, result["days_of_cover"])
+    columns = zip(
+        ids.tolist(), forecast.tolist(), result["demand_std"].tolist(), result["safety_stock"].tolist(),
+        result["reorder_point"].tolist(), result["order_up_to"].tolist(), stock.astype(np.int64).tolist(),
+        result["suggested_qty"].tolist(), cover.tolist()
+    )
+    rows = [
+        {
+            "product_id": product_id,
+            "method": method,
+            "forecast_daily": forecast_daily,
+            "demand_std": demand_std,
+            "safety_stock": safety_stock,
+            "reorder_point": reorder_point,
+            "order_up_to": order_up_to,
+            "stock": on_hand,
+            "suggested_qty": suggested_qty,
+            "days_of_cover": days_of_cover,
+            "computed_at": computed_at
+        }
+        for (
+            product_id, forecast_daily, demand_std, safety_stock, reorder_point,
+            order_up_to, on_hand, suggested_qty, days_of_cover
+        ) in columns
+    ]
+    db.query(ReorderSuggestion).delete(synchronize_session=False)
+    if rows:
+        db.execute(ReorderSuggestion.__table__.insert(), rows)
+    db.commit()
+
+    return {
+        "method": method,
+        "products": len(rows),
+        "with_sales": int(np.count_nonzero(forecast > 0)),
+        "to_reorder": int(np.count_nonzero(result["suggested_qty"])),
+        "history_days": days,
+        "sales_rows": int(known.sum()),
+        "computed_at": computed_at.isoformat(),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+class ForecastJob:
+    """Background thread that runs the forecast once a night"""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # One run at a time
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Optional[dict] = None
+
+    def run(self, method: Optional[str] = None) -> dict:
+        with self._lock:
+            db = SessionLocal()
+            try:
+                self.last_run = run_forecast(db, method)
+            finally:
+                db.close()
+            return self.last_run
+
+    def _due(self) -> bool:
+        now = datetime.now()
+        if now.hour < FORECAST_HOUR:
+            return False
+        db = SessionLocal()
+        try:
+            last = db.query(func.max(ReorderSuggestion.computed_at)).scalar()
+        finally:
+            db.close()
+        # computed_at is UTC; compare against the start of today's run window in UTC
+        window_start = datetime.utcnow() - (now - now.replace(hour=FORECAST_HOUR, minute=0, second=0, microsecond=0))
+        return last is None or last < window_start
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                if self._due():
+                    result = self.run()
+                    print(f"✅ Forecast stok: {result['products']} produk, {result['to_reorder']} perlu dipesan ({result['seconds']} s)")
+            except Exception as exc:
+                print(f"⚠️ Forecast stok gagal: {exc}")
+            self._stop.wait(FORECAST_CHECK_SECONDS)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="reorder-forecast", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+forecast_job = ForecastJob()
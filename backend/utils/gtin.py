@@ -0,0 +1,126 @@
+"""
+Normalisasi barcode ke GTIN-14 kanonik.
+
+Barang yang sama bisa tercetak sebagai UPC-A (12 digit) atau EAN-13 dengan
+nol di depan, dan sebagian scanner membuang atau menambah check digit.
+Barcode numerik dengan panjang GTIN (8/12/13/14) dan check digit yang benar
+disimpan juga dalam bentuk 14 digit berawalan nol di kolom gtin (unik per
+tabel), sehingga semua varian scan cukup dicari dengan satu probe indeks.
+Barcode lain (kode internal, Code128) tetap dicocokkan persis.
+"""
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import literal, select, union_all
+from sqlalchemy.orm import Session
+
+from models import Product, ProductBarcode
+
+GTIN_LENGTHS = (8, 12, 13, 14)
+
+
+def check_digit(body: str) -> int:
+    """GS1 mod-10 check digit for the digits before it"""
+    digits = body[::-1]
+    total = 3 * sum(map(int, digits[0::2])) + sum(map(int, digits[1::2]))
+    return (10 - total % 10) % 10
+
+
+def canonical_gtin(code: Optional[str]) -> Optional[str]:
+    """14-digit GTIN for a valid EAN-8/UPC-A/EAN-13/GTIN-14, else None"""
+    code = (code or "").strip()
+    if not code.isdigit() or len(code) not in GTIN_LENGTHS:
+        return None
+    if check_digit(code[:-1]) != int(code[-1]):
+        return None
+    return code.zfill(14)
+
+
+def scan_candidates(code: str) -> List[str]:
+    """
+    Canonical GTINs a scanned code may stand for: the code itself when it is
+    a valid GTIN, and the code with its check digit restored when the scanner
+    stripped it (7, 11, 12 or 13 digits).
+    """
+    code = code.strip()
+    if not code.isdigit():
+        return []
+    candidates = []
+    gtin = canonical_gtin(code)
+    if gtin:
+        candidates.append(gtin)
+    if len(code) + 1 in GTIN_LENGTHS:
+        restored = (code + str(check_digit(code))).zfill(14)
+        if restored not in candidates:
+            candidates.append(restored)
+    return candidates
+
+
+def gtin_owner(db: Session, gtin: Optional[str]) -> Optional[int]:
+    """Product id already holding this GTIN as main or alternative barcode"""
+    if not gtin:
+        return None
+    owner = db.query(Product.id).filter(Product.gtin == gtin).first()
+    if owner is None:
+        owner = db.query(ProductBarcode.product_id).filter(ProductBarcode.gtin == gtin).first()
+    return owner[0] if owner else None
+
+
+def resolve_codes(db: Session, codes: Iterable[str], active_only: bool = True) -> Dict[str, int]:
+    """
+    code -> product id in one query. Exact main barcode wins over exact
+    alternative barcode, which wins over a GTIN-equivalent match.
+    """
+    codes = list(dict.fromkeys(codes))
+    if not codes:
+        return {}
+    by_gtin: Dict[str, List[str]] = {}
+    for code in codes:
+        for gtin in scan_candidates(code):
+            by_gtin.setdefault(gtin, []).append(code)
+
+    branches = [
+        select(Product.barcode.label("key"), Product.id.label("product_id"), literal(0).label("rank")).where(
+            Product.barcode.in_(codes)
+        ),
+        select(ProductBarcode.barcode, ProductBarcode.product_id, literal(1)).where(
+            ProductBarcode.barcode.in_(codes)
+        ),
+    ]
+    if by_gtin:
+        branches += [
+            select(Product.gtin, Product.id, literal(2)).where(Product.gtin.in_(list(by_gtin))),
+            select(ProductBarcode.gtin, ProductBarcode.product_id, literal(3)).where(
+                ProductBarcode.gtin.in_(list(by_gtin))
+            ),
+        ]
+    matches = union_all(*branches).subquery()
+    query = db.query(matches.c.key, matches.c.product_id, matches.c.rank)
+    if active_only:
+        query = query.join(Product, Product.id == matches.c.product_id).filter(Product.is_active == True)
+
+    best: Dict[str, tuple] = {}
+    for key, product_id, rank in query:
+        for code in ([key] if rank < 2 else by_gtin.get(key, [])):
+            if code not in best or rank < best[code][0]:
+                best[code] = (rank, product_id)
+    return {code: product_id for code, (_, product_id) in best.items()}
+
+
+def backfill_gtins(db: Session) -> int:
+    """
+    Fill gtin for barcodes stored before the column existed. When two
+    products share a GTIN the older one keeps it; the other stays NULL and is
+    still found by exact match.
+    """
+    taken = {gtin for (gtin,) in db.query(Product.gtin).filter(Product.gtin.isnot(None))}
+    taken.update(gtin for (gtin,) in db.query(ProductBarcode.gtin).filter(ProductBarcode.gtin.isnot(None)))
+    filled = 0
+    for model in (Product, ProductBarcode):
+        for row in db.query(model).filter(model.gtin.is_(None), model.barcode.isnot(None)).order_by(model.id):
+            gtin = canonical_gtin(row.barcode)
+            if gtin and gtin not in taken:
+                row.gtin = gtin
+                taken.add(gtin)
+                filled += 1
+    db.commit()
+    return filled
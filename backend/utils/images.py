@@ -0,0 +1,114 @@
+"""
+Pipeline gambar produk: varian ukuran, WebP + JPEG, nama berbasis hash isi.
+
+Setiap upload di-decode sekali lalu disimpan dalam tiga ukuran (thumb, grid,
+full), masing-masing WebP dan JPEG, dengan nama file {hash}-{ukuran}.{ext}.
+Hash diambil dari isi file upload, jadi gambar yang sama persis hanya
+diproses dan disimpan sekali meski dipakai beberapa produk. Karena isi file
+tidak pernah berubah untuk nama yang sama, file bisa di-cache browser
+selamanya (immutable).
+"""
+from typing import Dict, Optional
+import hashlib
+import io
+import os
+import re
+import tempfile
+from pathlib import Path
+
+from PIL import Image, ImageOps
+from starlette.staticfiles import StaticFiles
+
+UPLOAD_URL = "/uploads/products"
+
+# Longest side in pixels
+IMAGE_SIZES = {"thumb": 96, "grid": 320, "full": 1024}
+IMAGE_FORMATS = {"webp": ("WEBP", {"quality": 80, "method": 4}), "jpeg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True})}
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+IMMUTABLE_NAME = re.compile(r"^[0-9a-f]{32}-(thumb|grid|full)\.(webp|jpg)$")
+
+
+def image_key(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:32]
+
+
+def variant_name(key: str, size: str, fmt: str) -> str:
+    return f"{key}-{size}.{EXTENSIONS[fmt]}"
+
+
+def image_variants(key: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    """Per-size URLs for a stored image key, e.g. variants["grid"]["webp"]"""
+    if not key:
+        return None
+    return {
+        size: {fmt: f"{UPLOAD_URL}/{variant_name(key, size, fmt)}" for fmt in IMAGE_FORMATS}
+        for size in IMAGE_SIZES
+    }
+
+
+def store_image(content: bytes, directory: Path) -> str:
+    """
+    Decode an upload and write every variant (skipped when the same image is
+    already stored). Returns the image key; raises ValueError if the file is
+    not a readable image. CPU-bound: call it off the event loop.
+    """
+    key = image_key(content)
+    if all((directory / variant_name(key, size, fmt)).exists() for size in IMAGE_SIZES for fmt in IMAGE_FORMATS):
+        return key
+
+    try:
+        with Image.open(io.BytesIO(content)) as source:
+            source.seek(0)  # First frame of animated GIF/WebP
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValueError("File bukan gambar yang valid")
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Largest first so each smaller size is resampled from the previous one
+    for size, longest in sorted(IMAGE_SIZES.items(), key=lambda item: -item[1]):
+        if max(image.size) > longest:
+            image.thumbnail((longest, longest), Image.LANCZOS)
+        for fmt, (pil_format, options) in IMAGE_FORMATS.items():
+            variant = image
+            if pil_format == "JPEG" and has_alpha:
+                # JPEG has no alpha: flatten onto white like the product cards
+                variant = Image.new("RGB", image.size, (255, 255, 255))
+                variant.paste(image, mask=image.getchannel("A"))
+            path = directory / variant_name(key, size, fmt)
+            # Unique temp file per call: concurrent uploads of the same image
+            # each publish a complete file
+            with tempfile.NamedTemporaryFile(dir=directory, prefix=f".{path.name}.", suffix=".tmp", delete=False) as tmp:
+                try:
+                    variant.save(tmp, pil_format, **options)
+                except Exception:
+                    tmp.close()
+                    os.unlink(tmp.name)
+                    raise
+            os.replace(tmp.name, path)
+    return key
+
+
+def delete_image(key: str, directory: Path):
+    for size in IMAGE_SIZES:
+        for fmt in IMAGE_FORMATS:
+            path = directory / variant_name(key, size, fmt)
+            if path.exists():
+                path.unlink()
+
+
+class UploadFiles(StaticFiles):
+    """StaticFiles with long-lived caching for content-addressed images"""
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if IMMUTABLE_NAME.match(os.path.basename(full_path)):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            # Legacy uploads: revalidate with the ETag StaticFiles already sends
+            response.headers["Cache-Control"] = "public, no-cache"
+        return response
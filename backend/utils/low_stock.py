@@ -0,0 +1,110 @@
+"""
+Status stok rendah yang dipelihara per produk (Product.is_low_stock).
+
+Setiap jalur yang mengubah stok atau min_stock (checkout, void, penyesuaian,
+edit produk, stock opname, import) memanggil refresh_low_stock() untuk produk
+yang disentuh saja, sebelum commit. Kolom ber-index sehingga daftar dan
+jumlah stok rendah sebanding dengan jumlah hasil, bukan ukuran katalog.
+
+Produk yang melewati ambang (masuk atau keluar dari stok rendah) menghasilkan
+event di antrean notifikasi lokal. Event baru dipublikasikan setelah transaksi
+DB berhasil di-commit, dan dibuang jika transaksi di-rollback.
+"""
+from collections import deque
+from datetime import datetime
+from typing import Iterable, List
+import os
+import threading
+
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from models import Product
+
+LOW_STOCK_EVENTS = int(os.getenv("LOW_STOCK_EVENTS", "1000"))
+
+_PENDING = "low_stock_events"
+
+
+class LowStockEvents:
+    """Bounded in-process queue of threshold crossings, read by sequence number"""
+
+    def __init__(self, max_size: int = LOW_STOCK_EVENTS):
+        self._events = deque(maxlen=max_size)
+        self._lock = threading.Lock()
+        self._seq = 0
+
+    def publish(self, events: List[dict]):
+        with self._lock:
+            for item in events:
+                self._seq += 1
+                self._events.append({"seq": self._seq, **item})
+
+    def since(self, after: int = 0, limit: int = 100) -> List[dict]:
+        """Events with seq > after, oldest first"""
+        with self._lock:
+            return [e for e in self._events if e["seq"] > after][:limit]
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+
+low_stock_events = LowStockEvents()
+
+
+def refresh_low_stock(db: Session, product_ids: Iterable[int]):
+    """
+    Recompute is_low_stock for the given products inside the caller's DB
+    transaction and stage an event for each one that crossed the threshold.
+    Nothing is committed here.
+    """
+    product_ids = list(set(product_ids))
+    if not product_ids:
+        return
+    db.flush()  # Pending ORM stock edits must be in the DB before comparing
+    low = Product.stock <= Product.min_stock
+    crossed = db.execute(
+        update(Product)
+        .where(Product.id.in_(product_ids), Product.is_low_stock.is_not(low))
+        .values(is_low_stock=low)
+        .returning(Product.id, Product.name, Product.stock, Product.min_stock, Product.is_low_stock, Product.is_active),
+        execution_options={"synchronize_session": "fetch"}
+    ).all()
+    now = datetime.utcnow().isoformat()
+    db.info.setdefault(_PENDING, []).extend(
+        {
+            "product_id": row.id,
+            "name": row.name,
+            "stock": row.stock,
+            "min_stock": row.min_stock,
+            "low_stock": bool(row.is_low_stock),
+            "at": now
+        }
+        for row in crossed
+        if row.is_active
+    )
+
+
+def backfill_low_stock(db: Session) -> int:
+    """Recompute the flag for every product (startup); no events"""
+    low = Product.stock <= Product.min_stock
+    changed = db.execute(
+        update(Product).where(Product.is_low_stock.is_not(low)).values(is_low_stock=low),
+        execution_options={"synchronize_session": False}
+    ).rowcount
+    db.commit()
+    return changed
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_after_commit(session: Session):
+    events = session.info.pop(_PENDING, None)
+    if events:
+        low_stock_events.publish(events)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_after_rollback(session: Session, previous_transaction):
+    session.info.pop(_PENDING, None)
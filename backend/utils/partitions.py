@@ -0,0 +1,265 @@
+"""
+Partisi hot/cold untuk transaksi.
+
+Bulan yang sudah tutup dan berada di luar TRANSACTION_HOT_MONTHS dipindahkan
+dari transactions/transaction_items ke tabel arsip per bulan
+(transactions_YYYY_MM dan transaction_items_YYYY_MM) dengan ID yang sama.
+Daftar bulan yang diarsip disimpan di tabel transaction_partitions. Tabel hot
+memakai AUTOINCREMENT, jadi ID yang sudah diarsip tidak pernah dipakai lagi
+meskipun tabel hot kosong.
+
+Tabel arsip dibaca lewat aliased() dari model Transaction/TransactionItem,
+sehingga kode laporan dan ekspor tetap bekerja dengan objek Transaction biasa.
+transaction_sources() hanya mengembalikan sumber yang beririsan dengan rentang
+tanggal, jadi query hari ini hanya menyentuh tabel hot.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+
+from sqlalchemy import Column, Index, MetaData, Table, func, insert, select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database import reserve_ids
+from models import Transaction, TransactionItem, TransactionPartition
+
+# Jumlah bulan (termasuk bulan berjalan) yang tetap di tabel hot
+TRANSACTION_HOT_MONTHS = max(int(os.getenv("TRANSACTION_HOT_MONTHS", "3")), 1)
+
+_metadata = MetaData()
+_entities: Dict[str, tuple] = {}
+_months: Optional[List[str]] = None  # Daftar bulan arsip, dimuat sekali per proses
+_lock = threading.Lock()
+
+
+def month_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m")
+
+
+def month_range(month: str) -> Tuple[datetime, datetime]:
+    """[start, end) of a YYYY-MM month"""
+    year, mon = int(month[:4]), int(month[5:7])
+    start = datetime(year, mon, 1)
+    end = datetime(year + 1, 1, 1) if mon == 12 else datetime(year, mon + 1, 1)
+    return start, end
+
+
+def hot_cutoff(now: Optional[datetime] = None) -> datetime:
+    """First day of the oldest month that stays in the hot tables"""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + (now.month - 1) - (TRANSACTION_HOT_MONTHS - 1)
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _copy_table(source: Table, name: str) -> Table:
+    # Same columns without foreign keys; archived rows are read-only history
+    return Table(name, _metadata, *[
+        Column(c.name, c.type, primary_key=c.primary_key, nullable=c.nullable)
+        for c in source.columns
+    ])
+
+
+def partition_entities(month: str):
+    """(Transaction, TransactionItem) aliases mapped onto a month's archive tables"""
+    with _lock:
+        if month not in _entities:
+            suffix = month.replace("-", "_")
+            tx_table = _copy_table(Transaction.__table__, f"transactions_{suffix}")
+            item_table = _copy_table(TransactionItem.__table__, f"transaction_items_{suffix}")
+            Index(f"ix_transactions_{suffix}_created_at", tx_table.c.created_at)
+            Index(f"ix_transaction_items_{suffix}_transaction_id", item_table.c.transaction_id)
+            _entities[month] = (
+                tx_table,
+                item_table,
+                aliased(Transaction, tx_table, adapt_on_names=True),
+                aliased(TransactionItem, item_table, adapt_on_names=True)
+            )
+        return _entities[month]
+
+
+def archived_months(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+    """Archived months overlapping [start, end], oldest first"""
+    global _months
+    if _months is None:
+        _months = [row.month for row in db.query(TransactionPartition.month).order_by(TransactionPartition.month)]
+    months = _months
+    if start:
+        months = [m for m in months if month_range(m)[1] > start]
+    if end:
+        months = [m for m in months if month_range(m)[0] <= end]
+    return months
+
+
+def transaction_sources(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None) -> list:
+    """
+    (transaction entity, item entity) pairs that can hold rows in [start, end],
+    newest first. The hot tables are skipped when the range lies entirely
+    inside archived months.
+    """
+    months = archived_months(db, start, end)
+    sources = []
+    if not (start and end and _covered(months, start, end)):
+        sources.append((Transaction, TransactionItem))
+    for month in reversed(months):
+        _, _, tx, item = partition_entities(month)
+        sources.append((tx, item))
+    return sources
+
+
+def _covered(months: List[str], start: datetime, end: datetime) -> bool:
+    # Every month touched by the range is archived
+    cursor = start
+    archived = set(months)
+    while cursor <= end:
+        month = month_key(cursor)
+        if month not in archived:
+            return False
+        cursor = month_range(month)[1]
+    return True
+
+
+def _attach_items(db: Session, transactions: list, item_entity):
+    """Load items for archived transactions (lazy loads would hit the hot table)"""
+    if not transactions:
+        return
+    by_transaction = {}
+    for item in db.query(item_entity).filter(
+        item_entity.transaction_id.in_([t.id for t in transactions])
+    ).order_by(item_entity.id):
+        by_transaction.setdefault(item.transaction_id, []).append(item)
+    for t in transactions:
+        set_committed_value(t, "items", by_transaction.get(t.id, []))
+
+
+def load_transactions(
+    db: Session,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    payment_method: Optional[str] = None,
+    limit: Optional[int] = None
+) -> List[Transaction]:
+    """Transactions in [date_from, date_to] across hot and cold tables, newest first"""
+    results = []
+    for tx, item in transaction_sources(db, date_from, date_to):
+        query = db.query(tx)
+        if date_from:
+            query = query.filter(tx.created_at >= date_from)
+        if date_to:
+            query = query.filter(tx.created_at <= date_to)
+        if payment_method:
+            query = query.filter(tx.payment_method == payment_method)
+        query = query.order_by(tx.created_at.desc())
+        if limit is not None:
+            query = query.limit(limit - len(results))
+        rows = query.all()
+        if tx is not Transaction:
+            _attach_items(db, rows, item)
+        results.extend(rows)
+        if limit is not None and len(results) >= limit:
+            break
+    return results
+
+
+def find_archived_transaction(db: Session, transaction_id: int) -> Optional[Transaction]:
+    """Look up a transaction id in the archive tables"""
+    partitions = db.query(TransactionPartition).filter(
+        TransactionPartition.min_id <= transaction_id,
+        TransactionPartition.max_id >= transaction_id
+    ).all()
+    for p in partitions:
+        _, _, tx, item = partition_entities(p.month)
+        transaction = db.query(tx).filter(tx.id == transaction_id).first()
+        if transaction:
+            _attach_items(db, [transaction], item)
+            return transaction
+    return None
+
+
+# ============ ARCHIVING ============
+
+def reset_partition_cache():
+    global _months
+    _months = None
+
+
+def archive_month(db: Session, month: str) -> dict:
+    """Move one closed month from the hot tables into its archive tables"""
+    start, end = month_range(month)
+    if end > hot_cutoff():
+        raise ValueError(f"Bulan {month} masih dalam jendela hot")
+
+    hot_tx = Transaction.__table__
+    hot_items = TransactionItem.__table__
+    in_month = (hot_tx.c.created_at >= start) & (hot_tx.c.created_at < end)
+    month_ids = select(hot_tx.c.id).where(in_month)
+
+    stats = db.execute(
+        select(func.count(), func.coalesce(func.sum(hot_tx.c.total), 0), func.min(hot_tx.c.id), func.max(hot_tx.c.id)).where(in_month)
+    ).one()
+    count, total, min_id, max_id = stats
+    if not count:
+        return {"month": month, "transactions": 0}
+
+    # Only months that actually have rows get archive tables; created on the
+    # session's connection so the DDL shares the move's DB transaction
+    tx_table, item_table, _, _ = partition_entities(month)
+    _metadata.create_all(bind=db.connection(), tables=[tx_table, item_table])
+
+    db.execute(insert(tx_table).from_select(
+        [c.name for c in hot_tx.columns], select(*hot_tx.columns).where(in_month)
+    ))
+    db.execute(insert(item_table).from_select(
+        [c.name for c in hot_items.columns],
+        select(*hot_items.columns).where(hot_items.c.transaction_id.in_(month_ids))
+    ))
+    db.execute(hot_items.delete().where(hot_items.c.transaction_id.in_(month_ids)))
+    db.execute(hot_tx.delete().where(in_month))
+
+    partition = db.query(TransactionPartition).filter(TransactionPartition.month == month).first()
+    if partition:
+        # Late rows for a month that was already archived
+        partition.transaction_count += count
+        partition.total += total
+        partition.min_id = min(partition.min_id, min_id)
+        partition.max_id = max(partition.max_id, max_id)
+        partition.archived_at = datetime.utcnow()
+    else:
+        db.add(TransactionPartition(
+            month=month, transaction_count=count, total=total, min_id=min_id, max_id=max_id
+        ))
+    db.commit()
+    reset_partition_cache()
+    return {"month": month, "transactions": count, "total": total}
+
+
+def reserve_archived_ids(db: Session):
+    """
+    Keep new hot ids above every archived id. Needed once for databases that
+    archived months before the hot tables used AUTOINCREMENT.
+    """
+    months = archived_months(db)
+    if not months:
+        return
+    connection = db.connection()
+    max_tx = db.query(func.max(TransactionPartition.max_id)).scalar()
+    max_item = max(
+        connection.execute(select(func.max(partition_entities(month)[1].c.id))).scalar() or 0
+        for month in months
+    )
+    reserve_ids(connection, Transaction.__tablename__, max_tx)
+    reserve_ids(connection, TransactionItem.__tablename__, max_item)
+    db.commit()
+
+
+def archive_closed_months(db: Session) -> List[dict]:
+    """Archive every month older than the hot window that still has hot rows"""
+    cutoff = hot_cutoff()
+    oldest = db.query(func.min(Transaction.created_at)).filter(Transaction.created_at < cutoff).scalar()
+    results = []
+    while oldest and oldest < cutoff:
+        month = month_key(oldest)
+        results.append(archive_month(db, month))
+        oldest = month_range(month)[1]
+    return [r for r in results if r["transactions"]]
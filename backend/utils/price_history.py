@@ -0,0 +1,219 @@
+"""
+Riwayat harga (PriceHistory) dan repricing massal berbasis SQL.
+
+Setiap perubahan harga jual / modal menulis satu baris PriceHistory berisi
+harga yang berlaku mulai effective_at, sehingga harga pada waktu tertentu
+cukup dicari dengan satu probe indeks (product_id, effective_at).
+
+Aturan repricing (mis. kategori Minuman +5% dibulatkan ke Rp 500) diterjemahkan
+menjadi ekspresi SQL integer, lalu diterapkan dengan satu UPDATE per aturan dan
+satu INSERT ... SELECT ke price_history. Preview menjalankan statement yang
+sama lalu di-rollback, jadi hasil preview persis sama dengan hasil apply.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import bindparam, case, literal, select
+from sqlalchemy.orm import Session
+
+from models import PriceHistory, Product
+
+PRICE_FIELDS = ("price", "cost_price")
+ROUNDING_MODES = ("nearest", "up", "down")
+
+
+def record_prices(
+    db: Session,
+    prices: Iterable[tuple],
+    source: str,
+    user_id: Optional[int] = None,
+    notes: Optional[str] = None,
+    effective_at: Optional[datetime] = None
+):
+    """Insert (product_id, price, cost_price) rows into the caller's DB transaction"""
+    effective_at = effective_at or datetime.utcnow()
+    rows = [
+        {
+            "product_id": product_id,
+            "price": price,
+            "cost_price": cost_price or 0,
+            "source": source,
+            "user_id": user_id,
+            "notes": notes,
+            "effective_at": effective_at
+        }
+        for product_id, price, cost_price in prices
+    ]
+    if rows:
+        db.execute(PriceHistory.__table__.insert(), rows)
+
+
+def price_at(db: Session, product_id: int, moment: datetime) -> Optional[PriceHistory]:
+    """Price row in effect at `moment` (one indexed probe)"""
+    return db.query(PriceHistory).filter(
+        PriceHistory.product_id == product_id,
+        PriceHistory.effective_at <= moment
+    ).order_by(PriceHistory.effective_at.desc(), PriceHistory.id.desc()).first()
+
+
+def open_price_history(db: Session):
+    """Seed one opening row per product, effective from its creation time"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "product_id": p.id,
+            "price": p.price,
+            "cost_price": p.cost_price or 0,
+            "source": "opening",
+            "effective_at": p.created_at or now
+        }
+        for p in db.query(Product.id, Product.price, Product.cost_price, Product.created_at)
+    ]
+    if rows:
+        db.execute(PriceHistory.__table__.insert(), rows)
+    db.commit()
+
+
+# ============ BULK REPRICING ============
+
+def rule_expression(column, percent: float = 0, amount: int = 0, round_to: int = 1, rounding: str = "nearest"):
+    """
+    New value as integer SQL: (column * (1 + percent%) + amount) rounded to a
+    multiple of round_to. Percent is kept in basis points so the maths stays
+    in integers on every database.
+    """
+    basis_points = int(round(percent * 100))
+    scale = 10000 * round_to
+    raw = column * (10000 + basis_points) + amount * 10000
+    if rounding == "up":
+        value = (raw + scale - 1) // scale * round_to
+    elif rounding == "down":
+        value = raw // scale * round_to
+    else:
+        value = (raw + scale // 2) // scale * round_to
+    return case((raw < 0, 0), else_=value)
+
+
+def rule_filter(rule: dict):
+    conditions = [Product.is_active == True]
+    if rule.get("category"):
+        conditions.append(Product.category == rule["category"])
+    if rule.get("product_ids"):
+        conditions.append(Product.id.in_(rule["product_ids"]))
+    return conditions
+
+
+def apply_price_changes(
+    db: Session,
+    rules: List[dict],
+    items: List[dict],
+    user_id: Optional[int] = None,
+    notes: Optional[str] = None,
+    dry_run: bool = False
+) -> dict:
+    """
+    Apply repricing rules (one UPDATE each, in order) and explicit prices
+    (one executemany), recording history set-based. With dry_run everything
+    runs and is then rolled back.
+    """
+    now = datetime.utcnow()
+    table = Product.__table__
+    history = PriceHistory.__table__
+
+    # Products that may change, with their current prices
+    affected = set(item["product_id"] for item in items)
+    for rule in rules:
+        affected.update(pid for (pid,) in db.query(Product.id).filter(*rule_filter(rule)))
+    before = {
+        row.id: row for row in db.query(
+            Product.id, Product.name, Product.category, Product.price, Product.cost_price
+        ).filter(Product.id.in_(affected))
+    } if affected else {}
+
+    for rule in rules:
+        field = rule.get("field", "price")
+        column = table.c[field]
+        new_value = rule_expression(
+            column, rule.get("percent", 0), rule.get("amount", 0),
+            rule.get("round_to", 1), rule.get("rounding", "nearest")
+        )
+        where = rule_filter(rule) + [new_value != column]
+        # History first: the same expression, evaluated against the old row
+        history_price = new_value if field == "price" else table.c.price
+        history_cost = new_value if field == "cost_price" else table.c.cost_price
+        db.execute(history.insert().from_select(
+            ["product_id", "price", "cost_price", "source", "user_id", "notes", "effective_at"],
+            select(
+                table.c.id, history_price, history_cost, literal("bulk"),
+                literal(user_id), literal(notes), literal(now)
+            ).where(*where)
+        ))
+        db.execute(table.update().where(*where).values({field: new_value, "updated_at": now}))
+
+    if items:
+        params = [
+            {
+                "pid": item["product_id"],
+                "new_price": item.get("price"),
+                "new_cost": item.get("cost_price"),
+                "now": now
+            }
+            for item in items
+        ]
+        db.execute(
+            table.update().where(table.c.id == bindparam("pid")).values(
+                price=case((bindparam("new_price").is_(None), table.c.price), else_=bindparam("new_price")),
+                cost_price=case((bindparam("new_cost").is_(None), table.c.cost_price), else_=bindparam("new_cost")),
+                updated_at=bindparam("now")
+            ),
+            params
+        )
+
+    after = {
+        row.id: row for row in db.query(Product.id, Product.price, Product.cost_price).filter(
+            Product.id.in_(affected)
+        )
+    } if affected else {}
+
+    changes = []
+    for product_id, old in before.items():
+        new = after.get(product_id)
+        if new is None or (new.price, new.cost_price) == (old.price, old.cost_price):
+            continue
+        changes.append({
+            "product_id": product_id,
+            "name": old.name,
+            "category": old.category,
+            "old_price": old.price,
+            "new_price": new.price,
+            "old_cost_price": old.cost_price,
+            "new_cost_price": new.cost_price,
+            "old_margin": old.price - (old.cost_price or 0),
+            "new_margin": new.price - (new.cost_price or 0)
+        })
+
+    # Explicit items: history rows for the ones that actually changed
+    explicit = set(item["product_id"] for item in items)
+    record_prices(
+        db,
+        [
+            (c["product_id"], c["new_price"], c["new_cost_price"])
+            for c in changes if c["product_id"] in explicit
+        ],
+        "bulk", user_id, notes, now
+    )
+
+    missing = sorted(explicit - set(before))
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    changes.sort(key=lambda c: c["product_id"])
+    return {
+        "dry_run": dry_run,
+        "applied": not dry_run and bool(changes),
+        "changed": len(changes),
+        "missing_product_ids": missing,
+        "effective_at": now.isoformat(),
+        "items": changes
+    }
@@ -0,0 +1,158 @@
+"""
+Perhitungan harga keranjang yang dipakai bersama oleh checkout dan cart quote.
+
+Urutan: harga produk -> promo otomatis -> kode promo -> penukaran poin.
+Quote dapat disertai token bertanda tangan berumur pendek; checkout yang
+membawa token dengan isi keranjang dan versi harga yang sama bisa melewati
+perhitungan ulang.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from jose import JWTError, jwt
+
+from auth import SECRET_KEY, ALGORITHM
+from routes.customers import POINT_VALUE
+from utils.catalog import catalog_cache
+from utils.discount_registry import discount_registry, LOOKUP_ERRORS
+from utils.promotions import promotion_engine
+
+QUOTE_TOKEN_TTL_SECONDS = 120
+
+
+def cart_lines(items: Iterable[Tuple[int, int]]) -> Tuple[List[dict], Dict[int, object]]:
+    """
+    Pricing lines for (product_id, quantity) pairs from the catalog snapshot,
+    plus the products by id. Raises HTTPException(400) for unknown products.
+    """
+    items = list(items)
+    products = catalog_cache.get_many(product_id for product_id, _ in items)
+    lines = []
+    for product_id, quantity in items:
+        product = products.get(product_id)
+        if not product or not product.is_active:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Produk dengan ID {product_id} tidak ditemukan"
+            )
+        if quantity <= 0:
+            raise HTTPException(status_code=400, detail="Jumlah produk harus lebih dari 0")
+        lines.append({
+            "product_id": product.id,
+            "category": product.category,
+            "price": product.price,
+            "quantity": quantity
+        })
+    return lines, products
+
+
+def price_cart(lines: List[dict], discount_code: Optional[str] = None, redeem_points: int = 0) -> dict:
+    """
+    Price a cart. Each line is a dict with product_id, category, price and quantity.
+    Raises HTTPException(400) with the same messages as checkout.
+    """
+    subtotal = sum(line["price"] * line["quantity"] for line in lines)
+    
+    # Automatic promotions
+    promo = promotion_engine.quote(lines)
+    promo_amount = promo["promo_amount"]
+    after_promo = subtotal - promo_amount
+    
+    # Discount code on top of promotions
+    discount = None
+    code_discount = 0
+    if discount_code:
+        discount, error = discount_registry.lookup(discount_code)
+        if error:
+            raise HTTPException(status_code=400, detail=LOOKUP_ERRORS[error])
+        
+        if after_promo < discount.min_purchase:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Minimum pembelian Rp {discount.min_purchase:,} untuk promo ini"
+            )
+        
+        code_discount = discount.calculate_discount(after_promo)
+    
+    discount_amount = promo_amount + code_discount
+    total = subtotal - discount_amount
+    
+    # Points are a payment component: they reduce the amount due, not the sale total
+    if redeem_points < 0:
+        raise HTTPException(status_code=400, detail="Jumlah poin tidak valid")
+    points_value = redeem_points * POINT_VALUE
+    if points_value > total:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Penukaran poin melebihi total belanja (maks {total // POINT_VALUE} poin)"
+        )
+    
+    return {
+        "lines": promo["lines"],
+        "subtotal": subtotal,
+        "promo_amount": promo_amount,
+        "discount": discount,
+        "code_discount": code_discount,
+        "discount_amount": discount_amount,
+        "total": total,
+        "points_value": points_value,
+        "amount_due": total - points_value
+    }
+
+
+# ============ QUOTE TOKENS ============
+
+def pricing_versions() -> list:
+    """Versions of every input that can change a price"""
+    return [catalog_cache.version, discount_registry.version, promotion_engine.version]
+
+
+def _cart_key(items) -> list:
+    return sorted([int(pid), int(qty)] for pid, qty in items)
+
+
+def sign_quote(items, discount_code: Optional[str], redeem_points: int, customer_id: Optional[int], priced: dict) -> str:
+    """Sign a short-lived token describing a priced cart"""
+    now = datetime.utcnow()
+    expire = now + timedelta(seconds=QUOTE_TOKEN_TTL_SECONDS)
+    # Happy-hour windows and code expiry don't bump a version, so never outlive them
+    expire = min(expire, now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1))
+    discount = priced["discount"]
+    if discount is not None and discount.valid_until:
+        expire = min(expire, discount.valid_until)
+    
+    payload = {
+        "typ": "quote",
+        "items": _cart_key(items),
+        "code": discount_code.upper() if discount_code else None,
+        "pts": redeem_points,
+        "cid": customer_id,
+        "prices": {str(line["product_id"]): line["price"] for line in priced["lines"]},
+        "promo": priced["promo_amount"],
+        "disc": priced["discount_amount"],
+        "total": priced["total"],
+        "ver": pricing_versions(),
+        "exp": expire
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def verify_quote(token: str, items, discount_code: Optional[str], redeem_points: int, customer_id: Optional[int]) -> Optional[dict]:
+    """Return the quote payload if the token is valid and still matches the cart"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    
+    if payload.get("typ") != "quote":
+        return None
+    if payload.get("ver") != pricing_versions():
+        return None
+    if payload.get("items") != _cart_key(items):
+        return None
+    if payload.get("code") != (discount_code.upper() if discount_code else None):
+        return None
+    if payload.get("pts") != redeem_points or payload.get("cid") != customer_id:
+        return None
+    return payload
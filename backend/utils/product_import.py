@@ -0,0 +1,220 @@
+"""
+Import produk massal (upsert) dari CSV / XLSX.
+
+File dibaca per potongan IMPORT_BATCH_SIZE baris. Untuk setiap potongan,
+barcode dicocokkan ke Product dan ProductBarcode (persis atau setara GTIN)
+dengan satu query IN; baris tanpa barcode dicocokkan berdasarkan nama persis. Produk baru
+di-insert dengan satu INSERT ... RETURNING, produk lama di-update dengan satu
+executemany. Baris yang tidak valid dilewati dan dilaporkan per nomor baris.
+"""
+from typing import Dict, List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from models import Product
+from utils.gtin import canonical_gtin, resolve_codes
+from utils.stock_ledger import record_movements
+from utils.low_stock import refresh_low_stock
+from utils.price_history import record_prices
+from utils.tabular import as_barcode, as_int, iter_table_chunks
+
+IMPORT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 500
+
+# Kolom file -> field Product (header dinormalisasi oleh utils.tabular)
+COLUMN_ALIASES = {
+    "barcode": ("barcode", "kode"),
+    "name": ("name", "nama", "nama_produk"),
+    "price": ("price", "harga", "harga_jual"),
+    "cost_price": ("cost_price", "harga_modal", "modal"),
+    "stock": ("stock", "stok"),
+    "min_stock": ("min_stock", "stok_minimum", "stok_min"),
+    "category": ("category", "kategori"),
+    "emoji": ("emoji",),
+}
+INT_FIELDS = ("price", "cost_price", "stock", "min_stock")
+
+
+def _parse_row(raw: dict) -> dict:
+    """Map a raw row to Product fields; raises ValueError with an Indonesian message"""
+    row = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        for alias in aliases:
+            value = raw.get(alias)
+            if value not in (None, ""):
+                row[field] = value
+                break
+    for field in INT_FIELDS:
+        if field in row:
+            number = as_int(row[field])
+            if number is None or number < 0:
+                raise ValueError(f"Kolom {field} harus angka bulat >= 0")
+            row[field] = number
+    if "barcode" in row:
+        row["barcode"] = as_barcode(row["barcode"])
+    for field in ("name", "category", "emoji"):
+        if field in row:
+            row[field] = str(row[field]).strip()
+    return row
+
+
+class ProductImporter:
+    """Upsert products batch by batch and collect a per-row report"""
+
+    def __init__(self, db: Session, user_id: Optional[int] = None, update_existing: bool = True, dry_run: bool = False):
+        self.db = db
+        self.user_id = user_id
+        self.update_existing = update_existing
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors: List[dict] = []
+        self.error_count = 0
+        self._seen_barcodes: Dict[str, int] = {}
+        self._seen_names: Dict[str, int] = {}
+
+    def _error(self, line: int, message: str, barcode: Optional[str] = None):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            entry = {"line": line, "error": message}
+            if barcode:
+                entry["barcode"] = barcode
+            self.errors.append(entry)
+
+    def run(self, content: bytes, filename: str) -> dict:
+        line = 1  # Baris 1 adalah header
+        for chunk in iter_table_chunks(content, filename, IMPORT_BATCH_SIZE):
+            parsed = []
+            for raw in chunk:
+                line += 1
+                try:
+                    parsed.append((line, _parse_row(raw)))
+                except ValueError as exc:
+                    self._error(line, str(exc))
+            self.rows += len(chunk)
+            self._apply_batch(parsed)
+        if not self.dry_run:
+            self.db.commit()
+        return self.report()
+
+    def _apply_batch(self, parsed: List[tuple]):
+        db = self.db
+
+        # One set-based barcode lookup against both barcode tables, GTIN-equivalents included
+        codes = [row["barcode"] for _, row in parsed if row.get("barcode")]
+        by_barcode = resolve_codes(db, codes, active_only=False)
+        names = list({row["name"] for _, row in parsed if row.get("name") and not row.get("barcode")})
+        by_name = dict(db.query(Product.name, Product.id).filter(
+            Product.name.in_(names), Product.is_active == True
+        ).all()) if names else {}
+
+        matched_ids = set(by_barcode.values()) | set(by_name.values())
+        current = {
+            row.id: row for row in db.query(
+                Product.id, Product.stock, Product.price, Product.cost_price
+            ).filter(Product.id.in_(matched_ids))
+        } if matched_ids else {}
+
+        inserts, updates = [], {}
+        for line, row in parsed:
+            barcode = row.get("barcode")
+            if barcode:
+                # UPC-A and EAN-13 forms of the same item count as duplicates
+                row["gtin"] = canonical_gtin(barcode)
+                seen_key = row["gtin"] or barcode
+                if seen_key in self._seen_barcodes:
+                    self._error(line, f"Barcode duplikat dengan baris {self._seen_barcodes[seen_key]}", barcode)
+                    continue
+                self._seen_barcodes[seen_key] = line
+                product_id = by_barcode.get(barcode)
+            else:
+                name = row.get("name")
+                if name in self._seen_names:
+                    self._error(line, f"Nama duplikat dengan baris {self._seen_names[name]}")
+                    continue
+                if name:
+                    self._seen_names[name] = line
+                product_id = by_name.get(name)
+
+            if product_id is None:
+                if not row.get("name") or "price" not in row:
+                    self._error(line, "Produk baru wajib punya nama dan harga", barcode)
+                    continue
+                inserts.append(row)
+            elif not self.update_existing:
+                self.skipped += 1
+            else:
+                # Later rows for the same product win
+                updates.setdefault(product_id, {}).update(row)
+
+        if self.dry_run:
+            self.created += len(inserts)
+            self.updated += len(updates)
+            return
+
+        if inserts:
+            defaults = {"cost_price": 0, "stock": 0, "min_stock": 5, "category": "Makanan", "emoji": "🍽️", "barcode": None}
+            defaults["gtin"] = None
+            rows = [{**defaults, **row} for row in inserts]
+            for row in rows:
+                row["is_low_stock"] = row["stock"] <= row["min_stock"]
+            table = Product.__table__
+            new_ids = db.execute(
+                table.insert().returning(table.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            record_movements(
+                db, [(pid, row["stock"]) for pid, row in zip(new_ids, rows)], "opening",
+                user_id=self.user_id, notes="Import produk"
+            )
+            record_prices(
+                db, [(pid, row["price"], row["cost_price"]) for pid, row in zip(new_ids, rows)], "import",
+                user_id=self.user_id, notes="Import produk"
+            )
+            self.created += len(new_ids)
+
+        if updates:
+            # Group by column set so each group is one executemany UPDATE
+            groups: Dict[tuple, list] = {}
+            for product_id, row in updates.items():
+                # The barcode is only the match key; it may be one of the extra barcodes
+                row = {k: v for k, v in row.items() if k not in ("barcode", "gtin")}
+                if not row:
+                    continue
+                groups.setdefault(tuple(sorted(row)), []).append({"id": product_id, **row})
+            for params in groups.values():
+                db.execute(update(Product), params)
+            record_movements(
+                db,
+                [
+                    (product_id, row["stock"] - current[product_id].stock)
+                    for product_id, row in updates.items() if "stock" in row
+                ],
+                "adjustment", user_id=self.user_id, notes="Import produk"
+            )
+            refresh_low_stock(
+                db, [product_id for product_id, row in updates.items() if "stock" in row or "min_stock" in row]
+            )
+            repriced = []
+            for product_id, row in updates.items():
+                old = current[product_id]
+                price = row.get("price", old.price)
+                cost_price = row.get("cost_price", old.cost_price)
+                if (price, cost_price) != (old.price, old.cost_price):
+                    repriced.append((product_id, price, cost_price))
+            record_prices(db, repriced, "import", user_id=self.user_id, notes="Import produk")
+            self.updated += len(updates)
+        db.flush()
+
+    def report(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "error_count": self.error_count,
+            "errors": self.errors
+        }
@@ -0,0 +1,210 @@
+"""
+Promotion engine untuk promo otomatis (tanpa kode).
+
+Promo diindeks per jam (happy hour), lalu per produk, kategori, atau global.
+Untuk setiap indeks hanya disimpan kandidat yang bisa menang: persentase
+terbesar, potongan tetap terbesar, dan satu promo per pasangan (beli, gratis).
+Karena setiap baris keranjang hanya boleh memakai satu promo, memilih promo
+terbaik per baris sudah merupakan kombinasi terbaik yang tidak bentrok, dan
+biaya quote tidak bertambah seiring jumlah promo.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+import threading
+
+from database import SessionLocal
+from models import Promotion
+
+# Jam happy hour dihitung dalam waktu lokal toko (WIB)
+LOCAL_UTC_OFFSET = timedelta(hours=7)
+
+
+PERCENTAGE, FIXED, BUY_X_GET_Y = 0, 1, 2
+
+
+class _Rule:
+    """Salinan ringan sebuah Promotion untuk evaluasi cepat (tanpa atribut ORM)"""
+    __slots__ = ("id", "name", "kind", "value", "group", "free")
+
+    def __init__(self, promo: Promotion):
+        self.id = promo.id
+        self.name = promo.name
+        self.value = promo.value or 0
+        if promo.promo_type == "buy_x_get_y":
+            self.kind = BUY_X_GET_Y
+            self.group = (promo.buy_quantity or 0) + (promo.get_quantity or 0)
+            self.free = promo.get_quantity or 0
+        else:
+            self.kind = PERCENTAGE if promo.promo_type == "percentage" else FIXED
+            self.group = self.free = 0
+
+
+class _Candidates:
+    """Promo yang mungkin menang untuk satu scope, sebagai tuple yang sudah jadi"""
+    __slots__ = ("percentage", "fixed", "buy_x_get_y")
+
+    def __init__(self):
+        self.percentage = None
+        self.fixed = None
+        self.buy_x_get_y = {}
+
+    def add(self, rule: _Rule):
+        if rule.kind == BUY_X_GET_Y:
+            if rule.group > 0 and rule.free > 0:
+                self.buy_x_get_y.setdefault((rule.group, rule.free), rule)
+        elif rule.kind == PERCENTAGE:
+            if self.percentage is None or rule.value > self.percentage.value:
+                self.percentage = rule
+        elif self.fixed is None or rule.value > self.fixed.value:
+            self.fixed = rule
+
+    def rules(self) -> tuple:
+        return tuple(
+            r for r in (self.percentage, self.fixed) if r is not None
+        ) + tuple(self.buy_x_get_y.values())
+
+
+def _new_index() -> dict:
+    return {"product": {}, "category": {}, "all": _Candidates()}
+
+
+def _finalize(index: dict) -> tuple:
+    """Ubah indeks menjadi (per produk, per kategori, global) berisi tuple kandidat"""
+    return (
+        {key: c.rules() for key, c in index["product"].items()},
+        {key: c.rules() for key, c in index["category"].items()},
+        index["all"].rules()
+    )
+
+
+def _active_hours(promo: Promotion) -> Iterable[int]:
+    if promo.start_hour <= promo.end_hour:
+        return range(promo.start_hour, promo.end_hour)
+    # Window melewati tengah malam, mis. 22-2
+    return list(range(promo.start_hour, 24)) + list(range(0, promo.end_hour))
+
+
+class PromotionEngine:
+    """Indeks promo aktif per jam, produk, dan kategori"""
+
+    def __init__(self):
+        self._promotions: List[Promotion] = []
+        self._always: tuple = ({}, {}, ())
+        self._hours: List[tuple] = []
+        self._next_boundary: Optional[datetime] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def load(self):
+        """(Re)load active promotions from the database"""
+        db = SessionLocal()
+        try:
+            promotions = db.query(Promotion).filter(Promotion.is_active == True).all()
+            db.expunge_all()
+        finally:
+            db.close()
+        self.build(promotions)
+
+    def build(self, promotions: List[Promotion], now: Optional[datetime] = None):
+        """Build the hour/product/category index for promos valid at `now`"""
+        now = now or datetime.utcnow()
+        # Promo sepanjang hari disimpan sekali; hanya promo happy hour yang diindeks per jam
+        always = _new_index()
+        hours = [_new_index() for _ in range(24)]
+        next_boundary = None
+
+        for promo in promotions:
+            # Batas validitas berikutnya memicu rebuild dari daftar di memori
+            for boundary in (promo.valid_from, promo.valid_until):
+                if boundary and boundary > now and (next_boundary is None or boundary < next_boundary):
+                    next_boundary = boundary
+            if promo.valid_from and promo.valid_from > now:
+                continue
+            if promo.valid_until and promo.valid_until < now:
+                continue
+
+            rule = _Rule(promo)
+            if promo.start_hour is None and promo.end_hour is None:
+                targets = [always]
+            elif promo.start_hour is None or promo.end_hour is None:
+                # Half-set window (rejected by the API): never applies rather than all day
+                continue
+            else:
+                targets = [hours[hour] for hour in _active_hours(promo)]
+            for index in targets:
+                if promo.product_id:
+                    index["product"].setdefault(promo.product_id, _Candidates()).add(rule)
+                elif promo.category:
+                    index["category"].setdefault(promo.category, _Candidates()).add(rule)
+                else:
+                    index["all"].add(rule)
+
+        with self._lock:
+            self._promotions = list(promotions)
+            self._always = _finalize(always)
+            self._hours = [_finalize(index) for index in hours]
+            self._next_boundary = next_boundary
+            self._loaded = True
+            self.version += 1
+
+    def quote(self, lines: List[dict], now: Optional[datetime] = None) -> dict:
+        """
+        Pick the best promotion for every cart line.
+        Each line is a dict with product_id, category, price and quantity.
+        """
+        if not self._loaded:
+            self.load()
+        now = now or datetime.utcnow()
+        if self._next_boundary and now >= self._next_boundary:
+            self.build(self._promotions, now)
+
+        always_product, always_category, always_global = self._always
+        hour_product, hour_category, hour_global = self._hours[(now + LOCAL_UTC_OFFSET).hour]
+        empty = ()
+        result_lines = []
+        promo_amount = 0
+
+        for line in lines:
+            price = line["price"]
+            quantity = line["quantity"]
+            line_total = price * quantity
+            best = None
+            best_amount = 0
+            product_id = line["product_id"]
+            category = line.get("category")
+            for rules in (
+                always_product.get(product_id, empty),
+                always_category.get(category, empty),
+                always_global,
+                hour_product.get(product_id, empty),
+                hour_category.get(category, empty),
+                hour_global
+            ):
+                for rule in rules:
+                    # Sama dengan Promotion.line_discount, di-inline untuk kecepatan
+                    if rule.kind == PERCENTAGE:
+                        amount = int(line_total * rule.value / 100)
+                    elif rule.kind == FIXED:
+                        amount = min(rule.value, price) * quantity
+                    else:
+                        amount = (quantity // rule.group) * rule.free * price
+                    if amount > best_amount:
+                        best, best_amount = rule, amount
+
+            best_amount = min(best_amount, line_total)
+            promo_amount += best_amount
+            result_lines.append({
+                "product_id": product_id,
+                "quantity": quantity,
+                "price": price,
+                "subtotal": line_total,
+                "promotion_id": best.id if best else None,
+                "promotion_name": best.name if best else None,
+                "promo_discount": best_amount
+            })
+
+        return {"lines": result_lines, "promo_amount": promo_amount}
+
+
+promotion_engine = PromotionEngine()
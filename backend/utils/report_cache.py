@@ -0,0 +1,266 @@
+"""
+Report result cache dengan invalidasi berbasis versi data per hari.
+
+Setiap hari (tanggal UTC dari Transaction.created_at) punya nomor versi yang
+dinaikkan oleh create_transaction / void_transaction. Kunci cache memuat versi
+semua hari yang dicakup laporan, sehingga hasil untuk hari yang sudah tutup
+praktis permanen, sedangkan bucket hari ini dihitung ulang setelah ada
+penjualan baru.
+"""
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+import json
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from utils.partitions import transaction_sources
+
+# Batas memori cache (perkiraan ukuran JSON dari nilai yang disimpan)
+REPORT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+
+
+class ReportCache:
+    """LRU cache dengan batas memori dan metrik hit/miss"""
+
+    def __init__(self, max_bytes: int = REPORT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._keys_by_day: Dict[date, set] = {}
+        self._versions: Dict[date, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ---------- versi data ----------
+
+    def data_version(self, day: date) -> int:
+        with self._lock:
+            return self._versions.get(day, 0)
+
+    def bump(self, day: date):
+        """Naikkan versi data sebuah hari dan buang entri yang bergantung padanya"""
+        with self._lock:
+            self._versions[day] = self._versions.get(day, 0) + 1
+            for key in self._keys_by_day.pop(day, set()):
+                if self._remove(key):
+                    self.invalidations += 1
+
+    # ---------- operasi cache ----------
+
+    def get_or_compute(self, endpoint: str, params: tuple, days: Iterable[date], compute: Callable):
+        """Ambil hasil dari cache atau hitung dan simpan"""
+        days = tuple(days)
+        with self._lock:
+            key = (endpoint, params, tuple((d, self._versions.get(d, 0)) for d in days))
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        value = compute()
+        size = len(json.dumps(value, default=str))
+
+        with self._lock:
+            # Versi bisa berubah selama compute berjalan - jangan simpan hasil basi
+            if any(self._versions.get(d, 0) != v for d, v in key[2]):
+                return value
+            if size > self.max_bytes:
+                return value
+            self._remove(key)
+            self._entries[key] = (value, size, days)
+            self._bytes += size
+            for d in days:
+                self._keys_by_day.setdefault(d, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+        return value
+
+    def _remove(self, key) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry[1]
+        for d in entry[2]:
+            keys = self._keys_by_day.get(d)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_day[d]
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_day.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups * 100, 1) if lookups > 0 else 0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+report_cache = ReportCache()
+
+
+def bump_data_version(moment: Optional[datetime]):
+    """Dipanggil setelah transaksi dibuat/dibatalkan pada waktu `moment`"""
+    report_cache.bump((moment or datetime.utcnow()).date())
+
+
+# ============ SALES BUCKETS ============
+
+def day_range(day: date):
+    """Awal hari dan awal hari berikutnya"""
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def compute_bucket(db: Session, start: datetime, end: datetime) -> dict:
+    """Agregasi penjualan untuk rentang [start, end), dua query per partisi"""
+    return merge_buckets([
+        _compute_source_bucket(db, tx, item, start, end)
+        for tx, item in transaction_sources(db, start, end)
+    ])
+
+
+def _compute_source_bucket(db: Session, tx, item, start: datetime, end: datetime) -> dict:
+    rows = db.query(
+        tx.total,
+        tx.discount_amount,
+        tx.cost_total,
+        tx.payment_method,
+        tx.created_at
+    ).filter(
+        tx.created_at >= start,
+        tx.created_at < end
+    ).all()
+
+    bucket = {
+        "count": 0,
+        "total": 0,
+        "discount": 0,
+        "cost": 0,
+        "items": 0,
+        "payment_methods": {},
+        "hourly": {},
+        "daily": {},
+        "products": []
+    }
+    for r in rows:
+        total = r.total or 0
+        cost = r.cost_total or 0
+        bucket["count"] += 1
+        bucket["total"] += total
+        bucket["discount"] += r.discount_amount or 0
+        bucket["cost"] += cost
+
+        method = bucket["payment_methods"].setdefault(r.payment_method, {"count": 0, "total": 0, "profit": 0})
+        method["count"] += 1
+        method["total"] += total
+        method["profit"] += total - cost
+
+        hour = bucket["hourly"].setdefault(r.created_at.hour, {"count": 0, "total": 0})
+        hour["count"] += 1
+        hour["total"] += total
+
+        day = bucket["daily"].setdefault(r.created_at.date().isoformat(), {"count": 0, "total": 0})
+        day["count"] += 1
+        day["total"] += total
+
+    if rows:
+        products = db.query(
+            item.product_id,
+            item.product_name,
+            func.sum(item.quantity).label('quantity'),
+            func.sum(item.quantity * item.price_at_sale).label('revenue')
+        ).join(tx, item.transaction_id == tx.id).filter(
+            tx.created_at >= start,
+            tx.created_at < end
+        ).group_by(
+            item.product_id,
+            item.product_name
+        ).all()
+        bucket["products"] = [[p.product_id, p.product_name, p.quantity, p.revenue] for p in products]
+        bucket["items"] = sum(p.quantity for p in products)
+
+    return bucket
+
+
+def day_bucket(db: Session, day: date) -> dict:
+    """Bucket satu hari penuh, di-cache berdasarkan versi data hari itu"""
+    start, end = day_range(day)
+    return report_cache.get_or_compute(
+        "day_bucket", (), [day],
+        lambda: compute_bucket(db, start, end)
+    )
+
+
+def merge_buckets(buckets: List[dict]) -> dict:
+    """Gabungkan beberapa bucket menjadi satu"""
+    merged = {
+        "count": 0,
+        "total": 0,
+        "discount": 0,
+        "cost": 0,
+        "items": 0,
+        "payment_methods": {},
+        "hourly": {},
+        "daily": {},
+        "products": []
+    }
+    products = {}
+    for b in buckets:
+        for field in ("count", "total", "discount", "cost", "items"):
+            merged[field] += b[field]
+        for group in ("payment_methods", "hourly", "daily"):
+            for key, values in b[group].items():
+                target = merged[group].setdefault(key, dict.fromkeys(values, 0))
+                for name, value in values.items():
+                    target[name] += value
+        for product_id, product_name, quantity, revenue in b["products"]:
+            entry = products.setdefault((product_id, product_name), [product_id, product_name, 0, 0])
+            entry[2] += quantity
+            entry[3] += revenue
+    merged["products"] = list(products.values())
+    return merged
+
+
+def range_bucket(db: Session, start: datetime, end: Optional[datetime] = None) -> dict:
+    """
+    Agregasi untuk rentang [start, end). Hari penuh diambil dari cache per hari;
+    hanya potongan hari yang tidak penuh yang dihitung langsung.
+    """
+    end = end or datetime.utcnow()
+    today = datetime.utcnow().date()
+    buckets = []
+    cursor = start
+    while cursor < end:
+        day_start, day_end = day_range(cursor.date())
+        chunk_end = min(day_end, end)
+        if cursor == day_start and (chunk_end == day_end or cursor.date() == today):
+            # Hari penuh (atau hari ini sampai sekarang - belum ada data masa depan)
+            buckets.append(day_bucket(db, cursor.date()))
+        else:
+            buckets.append(compute_bucket(db, cursor, chunk_end))
+        cursor = chunk_end
+    return merge_buckets(buckets)
@@ -0,0 +1,56 @@
+"""
+Job periodik sederhana di background thread (snapshot saldo, dll.).
+
+Setiap job memanggil fungsi func(db) dengan session baru setiap
+interval_seconds. Error dicetak lalu job dicoba lagi di putaran berikutnya,
+jadi satu kegagalan tidak menghentikan jadwal.
+"""
+from typing import Callable, Optional
+import threading
+
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+
+
+class PeriodicJob:
+    """Run func(db) every interval_seconds in a daemon thread"""
+
+    def __init__(self, name: str, func: Callable[[Session], object], interval_seconds: float):
+        self.name = name
+        self.func = func
+        self.interval_seconds = interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.runs = 0
+        self.last_result = None
+
+    def run(self):
+        db = SessionLocal()
+        try:
+            self.last_result = self.func(db)
+            self.runs += 1
+            return self.last_result
+        finally:
+            db.close()
+
+    def _loop(self):
+        # Startup already ran the job once; wait a full interval first
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run()
+            except Exception as exc:
+                print(f"⚠️ Job {self.name} gagal: {exc}")
+
+    def start(self):
+        if self._thread is not None or self.interval_seconds <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
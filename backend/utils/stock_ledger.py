@@ -0,0 +1,119 @@
+"""
+Ledger pergerakan stok (StockMovement) dan snapshot saldo per produk.
+
+Setiap perubahan Product.stock menulis baris ledger di transaksi DB yang sama
+lewat record_movements() (bulk insert). Stok pada waktu tertentu dihitung dari
+snapshot terakhir sebelum waktu itu ditambah pergerakan setelahnya, sehingga
+query tidak perlu memutar ulang seluruh riwayat.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+import os
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Product, StockMovement, StockSnapshot
+from utils.scheduler import PeriodicJob
+
+# Snapshot interval; keeps the movement scan in stock_at bounded to this much history
+STOCK_SNAPSHOT_HOURS = float(os.getenv("STOCK_SNAPSHOT_HOURS", "6"))
+
+MOVEMENT_TYPES = ["opening", "sale", "void", "adjustment", "receipt", "opname"]
+
+
+def record_movements(
+    db: Session,
+    movements: Iterable[tuple],
+    movement_type: str,
+    transaction_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    notes: Optional[str] = None
+):
+    """
+    Bulk-insert (product_id, change) movements into the caller's DB transaction.
+    Nothing is committed here.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "product_id": product_id,
+            "movement_type": movement_type,
+            "change": change,
+            "transaction_id": transaction_id,
+            "user_id": user_id,
+            "notes": notes,
+            "created_at": now
+        }
+        for product_id, change in movements
+        if change
+    ]
+    if rows:
+        db.execute(StockMovement.__table__.insert(), rows)
+
+
+def stock_at(db: Session, product_id: int, moment: datetime) -> int:
+    """Stock of a product at `moment`: latest snapshot before it plus later movements"""
+    snapshot = db.query(StockSnapshot).filter(
+        StockSnapshot.product_id == product_id,
+        StockSnapshot.created_at <= moment
+    ).order_by(StockSnapshot.created_at.desc(), StockSnapshot.id.desc()).first()
+
+    base = snapshot.balance if snapshot else 0
+    last_id = snapshot.last_movement_id if snapshot else 0
+    delta = db.query(func.coalesce(func.sum(StockMovement.change), 0)).filter(
+        StockMovement.product_id == product_id,
+        StockMovement.id > last_id,
+        StockMovement.created_at <= moment
+    ).scalar()
+    return base + delta
+
+
+def snapshot_stock(db: Session) -> int:
+    """Write a snapshot for every product with movements since its last snapshot"""
+    latest = db.query(
+        StockSnapshot.product_id,
+        func.max(StockSnapshot.last_movement_id).label("last_id")
+    ).group_by(StockSnapshot.product_id).subquery()
+
+    balances = dict(
+        db.query(StockSnapshot.product_id, StockSnapshot.balance).join(
+            latest,
+            (StockSnapshot.product_id == latest.c.product_id) &
+            (StockSnapshot.last_movement_id == latest.c.last_id)
+        ).all()
+    )
+
+    # Movements newer than each product's snapshot, grouped per product
+    rows = db.query(
+        StockMovement.product_id,
+        func.sum(StockMovement.change),
+        func.max(StockMovement.id)
+    ).outerjoin(
+        latest, latest.c.product_id == StockMovement.product_id
+    ).filter(
+        StockMovement.id > func.coalesce(latest.c.last_id, 0)
+    ).group_by(StockMovement.product_id).all()
+
+    now = datetime.utcnow()
+    db.bulk_insert_mappings(StockSnapshot, [
+        {
+            "product_id": product_id,
+            "balance": balances.get(product_id, 0) + change,
+            "last_movement_id": last_movement_id,
+            "created_at": now
+        }
+        for product_id, change, last_movement_id in rows
+    ])
+    db.commit()
+    return len(rows)
+
+
+def open_stock_ledger(db: Session):
+    """Seed opening movements for stock that predates the ledger"""
+    products = db.query(Product.id, Product.stock).filter(Product.stock != 0).all()
+    record_movements(db, products, "opening")
+    db.commit()
+
+
+stock_snapshot_job = PeriodicJob("stock-snapshot", snapshot_stock, STOCK_SNAPSHOT_HOURS * 3600)
@@ -0,0 +1,138 @@
+"""
+Stock opname massal: hitung selisih stok fisik vs sistem dan terapkan sekaligus.
+
+Baris hasil hitung dapat merujuk produk dengan product_id atau barcode
+(barcode utama, barcode tambahan, atau bentuk GTIN yang setara). Satu produk yang dihitung di beberapa
+baris (mis. beberapa rak) dijumlahkan. Semua baris divalidasi dulu; jika ada
+yang salah tidak ada yang diterapkan. Perubahan ditulis dengan satu UPDATE
+executemany dan satu bulk insert ledger dalam satu transaksi DB.
+"""
+from typing import List, Optional
+
+from sqlalchemy import bindparam
+from sqlalchemy.orm import Session
+
+from models import Product
+from utils.gtin import resolve_codes
+from utils.stock_ledger import record_movements
+from utils.low_stock import refresh_low_stock
+from utils.tabular import as_barcode, as_int
+
+# Nama kolom yang diterima dari JSON / CSV / XLSX
+ID_KEYS = ("product_id", "id")
+BARCODE_KEYS = ("barcode", "kode")
+COUNT_KEYS = ("counted", "quantity", "qty", "stok", "stock", "jumlah")
+
+
+def _pick(line: dict, keys):
+    for key in keys:
+        value = line.get(key)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def parse_count_lines(lines: List[dict]):
+    """Split raw lines into (by_id, by_barcode, errors); counts are summed per key"""
+    by_id, by_barcode, errors = {}, {}, []
+    for number, line in enumerate(lines, start=1):
+        counted = as_int(_pick(line, COUNT_KEYS))
+        if counted is None or counted < 0:
+            errors.append({"line": number, "error": "Jumlah hitung tidak valid"})
+            continue
+        product_id = as_int(_pick(line, ID_KEYS))
+        barcode = _pick(line, BARCODE_KEYS)
+        if product_id is not None:
+            by_id[product_id] = by_id.get(product_id, 0) + counted
+        elif barcode is not None:
+            key = as_barcode(barcode)
+            entry = by_barcode.setdefault(key, [0, number])
+            entry[0] += counted
+        else:
+            errors.append({"line": number, "error": "product_id atau barcode wajib diisi"})
+    return by_id, by_barcode, errors
+
+
+def apply_stock_count(
+    db: Session,
+    lines: List[dict],
+    user_id: Optional[int] = None,
+    dry_run: bool = False,
+    notes: Optional[str] = None
+) -> dict:
+    """
+    Compute variances for counted stock and (unless dry_run) apply them.
+    Returns a variance report; report["errors"] is non-empty when nothing
+    was applied because some lines were invalid.
+    """
+    by_id, by_barcode, errors = parse_count_lines(lines)
+
+    # Resolve barcodes (main, then extra, then GTIN-equivalent) in one query
+    if by_barcode:
+        resolved = resolve_codes(db, by_barcode, active_only=False)
+        for code, (counted, number) in by_barcode.items():
+            product_id = resolved.get(code)
+            if product_id is None:
+                errors.append({"line": number, "barcode": code, "error": "Barcode tidak ditemukan"})
+            else:
+                by_id[product_id] = by_id.get(product_id, 0) + counted
+
+    products = {
+        row.id: row for row in db.query(
+            Product.id, Product.barcode, Product.name, Product.stock, Product.cost_price
+        ).filter(Product.id.in_(list(by_id)), Product.is_active == True).all()
+    } if by_id else {}
+    for product_id in by_id:
+        if product_id not in products:
+            errors.append({"product_id": product_id, "error": "Produk tidak ditemukan"})
+
+    items = []
+    for product_id, counted in by_id.items():
+        product = products.get(product_id)
+        if product is None:
+            continue
+        variance = counted - product.stock
+        items.append({
+            "product_id": product_id,
+            "barcode": product.barcode,
+            "name": product.name,
+            "system_stock": product.stock,
+            "counted": counted,
+            "variance": variance,
+            "variance_value": variance * (product.cost_price or 0)
+        })
+    items.sort(key=lambda item: abs(item["variance_value"]), reverse=True)
+    changed = [item for item in items if item["variance"]]
+
+    report = {
+        "dry_run": dry_run,
+        "applied": False,
+        "lines": len(lines),
+        "products": len(items),
+        "changed": len(changed),
+        "surplus": sum(item["variance"] for item in changed if item["variance"] > 0),
+        "shortage": -sum(item["variance"] for item in changed if item["variance"] < 0),
+        "variance_value": sum(item["variance_value"] for item in changed),
+        "errors": errors,
+        "items": items
+    }
+    if dry_run or errors or not changed:
+        return report
+
+    # Relative updates (one executemany) keep the ledger exact even if a sale lands mid-count
+    table = Product.__table__
+    db.execute(
+        table.update().where(table.c.id == bindparam("pid")).values(
+            stock=table.c.stock + bindparam("variance")
+        ),
+        [{"pid": item["product_id"], "variance": item["variance"]} for item in changed]
+    )
+    record_movements(
+        db, [(item["product_id"], item["variance"]) for item in changed], "opname",
+        user_id=user_id, notes=notes
+    )
+    refresh_low_stock(db, [item["product_id"] for item in changed])
+    db.commit()
+    report["applied"] = True
+    return report
+
@@ -0,0 +1,167 @@
+"""
+Baca file CSV / XLSX hasil upload menjadi list dict per baris.
+
+Header dinormalisasi ke huruf kecil tanpa spasi di tepi, sehingga kolom
+"Barcode" dan "barcode " dianggap sama. Baris yang seluruhnya kosong dilewati.
+iter_table_chunks() membaca file besar per potongan (pandas untuk CSV,
+openpyxl read-only untuk XLSX) tanpa membangun seluruh isi file di memori.
+"""
+from typing import Iterator, List, Optional
+import csv
+import io
+import re
+
+import pandas as pd
+from fastapi import HTTPException
+from openpyxl import load_workbook
+
+_THOUSANDS = re.compile(r"-?\d{1,3}([.,]\d{3})+")
+
+
+def as_int(value) -> Optional[int]:
+    """Cell value as an int, or None if it is not a whole number"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    text = str(value).strip().replace("Rp", "").replace(" ", "")
+    # Thousands separators as written in Indonesia ("15.000") or Excel ("15,000")
+    if _THOUSANDS.fullmatch(text):
+        text = text.replace(".", "").replace(",", "")
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return int(number) if number.is_integer() else None
+
+
+def as_barcode(value) -> str:
+    """Cell value as a barcode string"""
+    # Excel keeps long numeric barcodes as numbers
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _normalize(header) -> str:
+    return str(header or "").strip().lower().replace(" ", "_")
+
+
+def read_table(content: bytes, filename: str = "") -> List[dict]:
+    """Parse an uploaded CSV or XLSX file (decided by extension) into row dicts"""
+    name = (filename or "").lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        return _read_xlsx(content)
+    if name.endswith(".csv") or name.endswith(".txt") or not name:
+        return _read_csv(content)
+    raise HTTPException(status_code=400, detail="Format file tidak didukung. Gunakan CSV atau XLSX")
+
+
+def iter_table_chunks(content: bytes, filename: str = "", chunk_size: int = 1000) -> Iterator[List[dict]]:
+    """Yield row dicts in chunks; values are strings (CSV) or cell values (XLSX)"""
+    name = (filename or "").lower()
+    if name.endswith((".xlsx", ".xlsm")):
+        yield from _iter_xlsx_chunks(content, chunk_size)
+    elif name.endswith(".csv") or name.endswith(".txt") or not name:
+        yield from _iter_csv_chunks(content, chunk_size)
+    else:
+        raise HTTPException(status_code=400, detail="Format file tidak didukung. Gunakan CSV atau XLSX")
+
+
+def _iter_csv_chunks(content: bytes, chunk_size: int) -> Iterator[List[dict]]:
+    head = content[:4096].decode("utf-8-sig", errors="ignore")
+    try:
+        delimiter = csv.Sniffer().sniff(head, delimiters=",;\t").delimiter
+    except csv.Error:
+        delimiter = ","
+    try:
+        reader = pd.read_csv(
+            io.BytesIO(content), sep=delimiter, dtype=str, keep_default_na=False,
+            encoding="utf-8-sig", chunksize=chunk_size, skip_blank_lines=True
+        )
+        for frame in reader:
+            keys = [_normalize(c) for c in frame.columns]
+            yield [
+                dict(zip(keys, (value.strip() for value in values)))
+                for values in frame.itertuples(index=False, name=None)
+            ]
+    except (pd.errors.ParserError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="File CSV tidak valid")
+    except pd.errors.EmptyDataError:
+        return
+
+
+def _iter_xlsx_chunks(content: bytes, chunk_size: int) -> Iterator[List[dict]]:
+    try:
+        wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="File Excel tidak valid")
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            return
+        keys = [_normalize(h) for h in header]
+        chunk = []
+        for row in rows:
+            if not any(value not in (None, "") for value in row):
+                continue
+            chunk.append({
+                key: (value.strip() if isinstance(value, str) else value)
+                for key, value in zip(keys, row)
+            })
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        wb.close()
+
+
+def _read_csv(content: bytes) -> List[dict]:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = content.decode("latin-1")
+    # Excel in Indonesian locale saves CSV with ';'
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.reader(io.StringIO(text), dialect)
+    header = next(reader, None)
+    if not header:
+        return []
+    keys = [_normalize(h) for h in header]
+    return [
+        dict(zip(keys, (value.strip() for value in row)))
+        for row in reader
+        if any(value.strip() for value in row)
+    ]
+
+
+def _read_xlsx(content: bytes) -> List[dict]:
+    try:
+        wb = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+    except Exception:
+        raise HTTPException(status_code=400, detail="File Excel tidak valid")
+    ws = wb.active
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if not header:
+        wb.close()
+        return []
+    keys = [_normalize(h) for h in header]
+    result = [
+        {
+            key: (value.strip() if isinstance(value, str) else value)
+            for key, value in zip(keys, row)
+        }
+        for row in rows
+        if any(value not in (None, "") for value in row)
+    ]
+    wb.close()
+    return result
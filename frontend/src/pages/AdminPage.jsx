@@ -508,7 +508,7 @@ function AdminPage({ products, onProductsChange }) {
                                 border: '1px solid var(--border)'
                             }}>
                                 {product.image_url ? (
-                                    <img src={product.image_url} alt={product.name} style={{ width: '48px', height: '48px', objectFit: 'cover', borderRadius: '6px' }} />
+                                    <img src={product.images?.thumb.webp || product.image_url} alt={product.name} style={{ width: '48px', height: '48px', objectFit: 'cover', borderRadius: '6px' }} />
                                 ) : (
                                     <span style={{ fontSize: '1.8rem' }}>{product.emoji}</span>
                                 )}
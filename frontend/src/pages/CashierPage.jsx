@@ -11,9 +11,24 @@ function CashierPage({ products, cart, cartTotal, cartCount, addToCart, updateQu
     const [showCheckout, setShowCheckout] = useState(false)
     const [searchQuery, setSearchQuery] = useState('')
     const [activeCategory, setActiveCategory] = useState('Semua')
+    const [facets, setFacets] = useState(null)
 
-    // Get unique categories
-    const categories = ['Semua', ...new Set(products.map(p => p.category))]
+    // Category tabs with counts from the cached facets endpoint
+    useEffect(() => {
+        fetch('/api/products/categories/facets')
+            .then(response => response.ok ? response.json() : null)
+            .then(setFacets)
+            .catch(() => setFacets(null))
+    }, [products])
+
+    const counts = {}
+    if (facets) {
+        counts['Semua'] = facets.total.products
+        facets.categories.forEach(f => { counts[f.category] = f.products })
+    }
+    const categories = facets
+        ? ['Semua', ...facets.categories.map(f => f.category)]
+        : ['Semua', ...new Set(products.map(p => p.category))]
 
     // Filter products
     const filteredProducts = products.filter(p => {
@@ -105,6 +120,7 @@ function CashierPage({ products, cart, cartTotal, cartCount, addToCart, updateQu
                             onClick={() => setActiveCategory(cat)}
                         >
                             {cat}
+                            {counts[cat] !== undefined && <span className="category-count">{counts[cat]}</span>}
                         </button>
                     ))}
                 </div>
@@ -120,7 +136,7 @@ function CashierPage({ products, cart, cartTotal, cartCount, addToCart, updateQu
                             {/* Product Image or Emoji */}
                             <div className="product-card-image">
                                 {product.image_url ? (
-                                    <img src={product.image_url} alt={product.name} />
+                                    <img src={product.images?.grid.webp || product.image_url} alt={product.name} loading="lazy" />
                                 ) : (
                                     <span className="product-emoji">{product.emoji}</span>
                                 )}